@@ -0,0 +1,40 @@
+"""Shared route dependencies."""
+from typing import Optional
+import re
+from fastapi import Header, HTTPException
+from app.core.config import get_settings
+from app.db.models import DEFAULT_HOME_ID
+
+_HOME_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def get_home_id(home_id: str = DEFAULT_HOME_ID) -> str:
+    """
+    Resolve the home (tenant) a request is scoped to.
+    
+    Routes mounted under /homes/{home_id} take it from the path; the
+    unprefixed routes accept an optional ?home_id= query parameter and
+    fall back to the default home used by single-household clients.
+    
+    Usage:
+        @router.get("/items")
+        def read_items(home_id: str = Depends(get_home_id)):
+            ...
+    """
+    if not _HOME_ID_PATTERN.match(home_id):
+        raise HTTPException(status_code=400, detail="Invalid home_id")
+    return home_id
+
+
+def require_profiling(x_profile_token: Optional[str] = Header(default=None)) -> None:
+    """
+    Guard the profiling endpoints.
+    
+    They only exist when PROFILING_ENABLED is set, and require the
+    X-Profile-Token header when PROFILING_TOKEN is configured.
+    """
+    settings = get_settings()
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.PROFILING_TOKEN and x_profile_token != settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
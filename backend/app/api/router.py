@@ -1,25 +1,46 @@
 from fastapi import APIRouter
-from app.api.routes import health, calibration, centroids, infer, events, insights, suggest
+from app.api.routes import health, calibration, centroids, infer, events, insights, suggest, profiling, jobs, models, shadow
 
-api_router = APIRouter()
-
-# Include health check route
-api_router.include_router(health.router, tags=["health"])
+# Routes scoped to a single home (tenant)
+home_router = APIRouter()
 
 # Include calibration routes
-api_router.include_router(calibration.router, prefix="/calibration", tags=["calibration"])
+home_router.include_router(calibration.router, prefix="/calibration", tags=["calibration"])
 
 # Include centroids routes
-api_router.include_router(centroids.router, prefix="/centroids", tags=["centroids"])
+home_router.include_router(centroids.router, prefix="/centroids", tags=["centroids"])
 
 # Include inference routes
-api_router.include_router(infer.router, prefix="/infer", tags=["inference"])
+home_router.include_router(infer.router, prefix="/infer", tags=["inference"])
 
 # Include suggestions routes
-api_router.include_router(suggest.router, prefix="/suggest", tags=["suggestions"])
+home_router.include_router(suggest.router, prefix="/suggest", tags=["suggestions"])
 
 # Include events routes
-api_router.include_router(events.router, prefix="/events", tags=["events"])
+home_router.include_router(events.router, prefix="/events", tags=["events"])
 
 # Include insights routes
-api_router.include_router(insights.router, prefix="/insights", tags=["insights"])
+home_router.include_router(insights.router, prefix="/insights", tags=["insights"])
+
+# Include saved model version routes
+home_router.include_router(models.router, prefix="/models", tags=["models"])
+
+# Include shadow classifier evaluation routes
+home_router.include_router(shadow.router, prefix="/shadow", tags=["shadow"])
+
+# Include background job routes
+home_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+
+api_router = APIRouter()
+
+# Include health check route
+api_router.include_router(health.router, tags=["health"])
+
+# Include request profile routes (404 unless PROFILING_ENABLED)
+api_router.include_router(profiling.router, prefix="/debug/profiles", tags=["profiling"])
+
+# Unprefixed routes serve the default home (or ?home_id=)
+api_router.include_router(home_router)
+
+# Tenant-scoped routes: /homes/{home_id}/...
+api_router.include_router(home_router, prefix="/homes/{home_id}")
@@ -1,25 +1,46 @@
 """Calibration endpoints for uploading training data and fitting centroids."""
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.schemas.calibration import CalibrationWindow, CalibrationUploadResponse
+from app.schemas.calibration import (
+    AdaptationState, CalibrationAnalysis, CalibrationBatch, CalibrationBatchResponse, CalibrationSessionClosed,
+    CalibrationSessionOpen, CalibrationSessionOut, CalibrationWindow, CalibrationUploadResponse
+)
 from app.db.session import get_db
 from app.db import crud
-from app.services.centroid import fit_centroids
+from app.api.deps import get_home_id
+from app.api.routes.jobs import submit_job
+from app.api.wire import WireResponse, WireRoute
+from app.core.config import get_settings
+from app.core.metrics import STAGE_SECONDS
+from app.services.centroid import CalibrationRejected, fit_centroids
+from app.services.snapshot import publish_model_change
 
-router = APIRouter()
+settings = get_settings()
 
+router = APIRouter(route_class=WireRoute)
 
-@router.post("/upload", response_model=CalibrationUploadResponse)
-async def upload_calibration(window: CalibrationWindow, db: Session = Depends(get_db)):
+
+@router.post("/upload", response_model=CalibrationUploadResponse, response_class=WireResponse)
+async def upload_calibration(
+    window: CalibrationWindow,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
     """
     Upload calibration data for a single beacon.
     
     This will overwrite any existing calibration data for the beacon.
     The backend calculates statistics from the raw RSSI samples.
     
+    The body may also be MessagePack or CBOR, with the samples as a float32
+    blob, and the response follows Accept (see app/api/wire.py).
+    
     Args:
         window: Calibration window with raw RSSI samples
         db: Database session
+        home_id: Home the calibration belongs to
         
     Returns:
         CalibrationUploadResponse with status, beacon_id, and room name
@@ -28,14 +49,15 @@ async def upload_calibration(window: CalibrationWindow, db: Session = Depends(ge
         raise HTTPException(status_code=400, detail="No RSSI samples provided")
     
     # Delete any existing calibration windows for this beacon (overwrite)
-    deleted_count = crud.delete_calibration_windows_by_beacon(db, window.beacon_id)
+    deleted_count = crud.delete_calibration_windows_by_beacon(db, home_id, window.beacon_id)
     
     # Get or create room with beacon_id
-    room = crud.get_or_create_room(db, window.room, window.beacon_id)
+    room = crud.get_or_create_room(db, home_id, window.room, window.beacon_id)
     
     # Create calibration window in database
     crud.create_calibration_window(
         db=db,
+        home_id=home_id,
         room_id=room.id,
         window_start=window.window_start,
         window_end=window.window_end,
@@ -43,6 +65,9 @@ async def upload_calibration(window: CalibrationWindow, db: Session = Depends(ge
         rssi_samples=window.rssi_samples
     )
     
+    # Room names may have changed (in every worker)
+    publish_model_change(db, home_id)
+    
     return CalibrationUploadResponse(
         ok=True,
         beacon_id=window.beacon_id,
@@ -50,26 +75,409 @@ async def upload_calibration(window: CalibrationWindow, db: Session = Depends(ge
     )
 
 
+@router.post("/batch", response_model=CalibrationBatchResponse, response_class=WireResponse)
+async def upload_calibration_batch(
+    batch: CalibrationBatch,
+    fit: bool = Query(False, description="Refit the uploaded beacons afterwards"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Upload calibration data for many beacons at once.
+    
+    Takes single-beacon windows and multi-beacon scans (one window per
+    beacon). The previous windows of every uploaded beacon are replaced and
+    the new ones stored in one transaction: either all of the batch is
+    stored or none of it. Room assignments apply together, so a batch may
+    swap rooms between beacons (b1 Kitchen -> Bed with b2 Bed -> Kitchen).
+    Like /upload, it also takes MessagePack or CBOR.
+    
+    Args:
+        batch: Windows and scans with raw RSSI samples
+        fit: Refit the uploaded beacons (the others keep their means)
+        db: Database session
+        home_id: Home the calibration belongs to
+        
+    Returns:
+        CalibrationBatchResponse with counts, the rooms and, with ?fit=true, the new means
+        
+    Raises:
+        HTTPException: 400 for empty or contradictory windows, 409 if a room or
+            beacon is assigned to a beacon or room outside the batch, 422 as
+            for /fit (the windows stay stored)
+    """
+    windows = [
+        (window.room, window.beacon_id, window.window_start, window.window_end, window.rssi_samples)
+        for window in batch.windows
+    ] + [
+        (beacon.room, beacon.beacon_id, scan.window_start, scan.window_end, beacon.rssi_samples)
+        for scan in batch.scans
+        for beacon in scan.beacons
+    ]
+    if not windows:
+        raise HTTPException(status_code=400, detail="No calibration windows provided")
+    
+    # One room per beacon and one beacon per room
+    room_of: Dict[str, str] = {}
+    beacon_of: Dict[str, str] = {}
+    for room, beacon_id, _, _, rssi_samples in windows:
+        if not rssi_samples:
+            raise HTTPException(status_code=400, detail=f"No RSSI samples provided for beacon '{beacon_id}'")
+        if room_of.setdefault(beacon_id, room) != room:
+            raise HTTPException(status_code=400, detail=f"Beacon '{beacon_id}' is assigned to several rooms")
+        if beacon_of.setdefault(room, beacon_id) != beacon_id:
+            raise HTTPException(status_code=400, detail=f"Room '{room}' is assigned several beacons")
+    
+    try:
+        rooms, replaced = crud.replace_calibration_windows(db, home_id, windows)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=409,
+            detail="A room or beacon in the batch is assigned to a room or beacon outside the batch"
+        )
+    
+    centroids_dict = None
+    if fit:
+        try:
+            with STAGE_SECONDS.labels("fit_centroids").time():
+                centroids_dict = fit_centroids(db, home_id, beacon_ids=set(rooms))
+        except CalibrationRejected as e:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": str(e), "issues": e.analysis["issues"]}
+            )
+    else:
+        # Room names may have changed (in every worker)
+        publish_model_change(db, home_id)
+    
+    return CalibrationBatchResponse(
+        ok=True,
+        windows=len(windows),
+        replaced=replaced,
+        rooms={beacon_id: room.name for beacon_id, room in rooms.items()},
+        centroids=centroids_dict
+    )
+
+
+def get_session(db: Session, home_id: str, session_id: str):
+    """
+    Get one of a home's open calibration sessions.
+    
+    Raises:
+        HTTPException: 404 if there is no such session (closed, discarded or expired)
+    """
+    session = crud.get_calibration_session(db, home_id, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Calibration session '{session_id}' not found")
+    return session
+
+
+async def read_chunk(request: Request) -> bytes:
+    """
+    Read a request body of at most CALIBRATION_CHUNK_MAX_BYTES.
+    
+    Raises:
+        HTTPException: 413 if the body is larger
+    """
+    limit = settings.CALIBRATION_CHUNK_MAX_BYTES
+    too_large = HTTPException(status_code=413, detail=f"Chunks are limited to {limit} bytes")
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise too_large
+    body = bytearray()
+    async for part in request.stream():
+        body += part
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+
+@router.post("/sessions", response_model=CalibrationSessionOut, status_code=201)
+async def open_calibration_session(
+    request: CalibrationSessionOpen,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Open a session to upload a long calibration recording of one beacon in chunks.
+    
+    Append chunks with POST /calibration/sessions/{id}/chunks and store them
+    with POST /calibration/sessions/{id}/close (see Chunked Calibration).
+    
+    Args:
+        request: Beacon, room and start of the recording
+        db: Database session
+        home_id: Home the calibration belongs to
+        
+    Returns:
+        The new session
+    """
+    from app.services.calibration_stream import open_session, session_out
+    return session_out(open_session(db, home_id, request.beacon_id, request.room, request.window_start))
+
+
+@router.get("/sessions/{session_id}", response_model=CalibrationSessionOut)
+async def get_calibration_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Get an open calibration session and the statistics of its samples so far.
+    
+    Raises:
+        HTTPException: 404 if there is no such session
+    """
+    from app.services.calibration_stream import session_out
+    return session_out(get_session(db, home_id, session_id))
+
+
+@router.post("/sessions/{session_id}/chunks", response_model=CalibrationSessionOut)
+async def append_calibration_chunk(
+    session_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Append a chunk of samples to a calibration session.
+    
+    The body is float32 (application/octet-stream), int8
+    (application/x-int8) or NDJSON (application/x-ndjson) samples.
+    
+    Args:
+        session_id: Session identifier
+        request: Request with the chunk as body
+        db: Database session
+        home_id: Home identifier
+        
+    Returns:
+        The session with its updated statistics
+        
+    Raises:
+        HTTPException: 404 if there is no such session, 413 if the chunk is
+            too large, 400 if it is malformed or empty
+    """
+    from app.services.calibration_stream import append_chunk, session_out
+    session = get_session(db, home_id, session_id)
+    body = await read_chunk(request)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        return session_out(append_chunk(db, session, body, content_type))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/sessions/{session_id}/close", response_model=CalibrationSessionClosed)
+async def close_calibration_session(
+    session_id: str,
+    window_end: Optional[int] = Query(None, description="End of the recording (default: now)"),
+    fit: bool = Query(False, description="Refit the session's beacon afterwards"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Store a session's samples as the beacon's calibration (replacing the previous one).
+    
+    Args:
+        session_id: Session identifier
+        window_end: End of the recording
+        fit: Refit the beacon (the others keep their means)
+        db: Database session
+        home_id: Home identifier
+        
+    Returns:
+        The session's final statistics, the windows stored and, with ?fit=true, the new means
+        
+    Raises:
+        HTTPException: 404 if there is no such session, 400 if it has no
+            samples, 409 if its room is assigned another beacon, 422 as for /fit
+    """
+    from app.services.calibration_stream import close_session, session_out
+    session = get_session(db, home_id, session_id)
+    stats = session_out(session)
+    try:
+        room, replaced, created = close_session(db, session, window_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Room '{stats['room']}' is assigned another beacon in the home"
+        )
+    
+    centroids_dict = None
+    if fit:
+        try:
+            with STAGE_SECONDS.labels("fit_centroids").time():
+                centroids_dict = fit_centroids(db, home_id, beacon_ids={stats["beacon_id"]})
+        except CalibrationRejected as e:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": str(e), "issues": e.analysis["issues"]}
+            )
+    else:
+        # Room names may have changed (in every worker)
+        publish_model_change(db, home_id)
+    
+    return CalibrationSessionClosed(
+        **{**stats, "room": room.name},
+        ok=True,
+        windows=created,
+        replaced=replaced,
+        centroids=centroids_dict
+    )
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def discard_calibration_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Discard a calibration session and its chunks.
+    
+    Raises:
+        HTTPException: 404 if there is no such session
+    """
+    crud.delete_calibration_session(db, get_session(db, home_id, session_id).id)
+
+
 @router.post("/fit")
-async def fit_centroids_endpoint(db: Session = Depends(get_db)):
+async def fit_centroids_endpoint(
+    run_async: bool = Query(False, alias="async", description="Fit in the background and return a job"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
     """
-    Calculate centroids (mean RSSI) for each beacon.
+    Calculate centroids (mean RSSI) for each beacon in a home.
+    
+    With ?async=true the fit runs as a background job: the response is
+    202 with the job, to be polled at GET /jobs/{id}.
     
     Args:
+        run_async: Run the fit as a background job
         db: Database session
+        home_id: Home to fit
         
     Returns:
-        Dictionary mapping beacon_id to mean RSSI value
+        Dictionary mapping beacon_id to mean RSSI value (or the job, with ?async=true)
+        
+    Raises:
+        HTTPException: 422 with the calibration issues if CALIBRATION_STRICT
+            rejected the fit
     """
     # Check if we have calibration data
-    windows = crud.get_all_calibration_windows(db)
-    if not windows:
+    if not crud.has_calibration_windows(db, home_id):
         raise HTTPException(
             status_code=400, 
             detail="No calibration data available. Upload calibration data first."
         )
     
+    if run_async:
+        return submit_job("fit", home_id)
+    
     # Fit centroids using service
-    centroids_dict = fit_centroids(db)
+    try:
+        with STAGE_SECONDS.labels("fit_centroids").time():
+            centroids_dict = fit_centroids(db, home_id)
+    except CalibrationRejected as e:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": str(e), "issues": e.analysis["issues"]}
+        )
     
     return centroids_dict
+
+
+@router.get("/analysis", response_model=CalibrationAnalysis)
+async def get_calibration_analysis(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Analyze the quality of the home's calibration data.
+    
+    Per beacon: sample count, spread, sample rate, drift, bimodality and a
+    histogram; per room pair: separability and histogram overlap; and the
+    issues found against the CALIBRATION_* limits (fits run the same check).
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+        
+    Returns:
+        CalibrationAnalysis
+    """
+    from app.services.calibration_analysis import analyze_calibration
+    with STAGE_SECONDS.labels("calibration_analysis").time():
+        return analyze_calibration(db, home_id)
+
+
+@router.get("/adaptation", response_model=List[AdaptationState])
+async def get_adaptation_state(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Show how far online adaptation moved each beacon's mean from the last fit.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+        
+    Returns:
+        List of adaptation states, one per fitted beacon
+    """
+    from app.services.adaptation import get_adaptation
+    pending = get_adaptation().pending(home_id)
+    return [
+        AdaptationState(
+            beacon_id=beacon_id,
+            room=room,
+            mean_rssi=mean_rssi,
+            fitted_mean_rssi=fitted_mean,
+            drift_db=round(mean_rssi - fitted_mean, 2),
+            adapted_at=adapted_at,
+            pending_dwells=pending.get(beacon_id, 0),
+        )
+        for beacon_id, room, mean_rssi, fitted_mean, adapted_at in crud.get_adaptation_rows(db, home_id)
+    ]
+
+
+@router.post("/adaptation/flush")
+async def flush_adaptation(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+) -> Dict[str, float]:
+    """
+    Apply this worker's pending adaptation observations now instead of after ADAPT_INTERVAL_S.
+    
+    Args:
+        db: Database session
+        home_id: Home to update
+        
+    Returns:
+        Dictionary mapping beacon_id to its new mean (beacons that moved)
+    """
+    from app.services.adaptation import get_adaptation
+    return get_adaptation().flush(db, home_id)
+
+
+@router.post("/adaptation/rollback")
+async def rollback_adaptation(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Restore the means of the last fit, undoing all online adaptation since.
+    
+    Args:
+        db: Database session
+        home_id: Home to restore
+        
+    Returns:
+        Number of beacons whose mean was restored
+    """
+    from app.services.adaptation import get_adaptation
+    return {"restored": get_adaptation().rollback(db, home_id)}
@@ -1,24 +1,47 @@
 """Centroids endpoint for retrieving fitted room fingerprints."""
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app.schemas.centroids import CentroidOut
+from app.core.http_cache import cached_json, make_etag
+from app.db import crud
 from app.db.session import get_db
+from app.api.deps import get_home_id
 from app.services.centroid import get_centroids_list
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[CentroidOut])
-async def get_centroids(db: Session = Depends(get_db)):
+async def get_centroids(
+    request: Request,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
     """
-    Get all fitted centroids (room fingerprints).
+    Get all fitted centroids (room fingerprints) for a home.
+    
+    The ETag and Last-Modified follow the home's model version, so clients
+    sending If-None-Match get 304 until the next upload or fit.
     
     Args:
+        request: Incoming request (conditional headers)
         db: Database session
+        home_id: Home identifier
         
     Returns:
         List of centroids with room name, vector, and timestamp
     """
-    centroids = get_centroids_list(db)
-    return [CentroidOut(**c) for c in centroids]
+    model_version = crud.get_model_version(db, home_id)
+    version = model_version.version if model_version else 0
+    
+    async def build():
+        return [CentroidOut(**c).model_dump() for c in get_centroids_list(db, home_id)]
+    
+    return await cached_json(
+        request,
+        ("centroids", home_id),
+        make_etag("centroids", home_id, version),
+        build,
+        last_modified=model_version.updated_at if model_version else None,
+    )
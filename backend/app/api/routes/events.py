@@ -1,27 +1,101 @@
-"""Events endpoint for storing location events."""
-from fastapi import APIRouter, Depends, HTTPException
+"""Events endpoints for storing and listing location events."""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Iterator, Optional, Tuple
+from app.api.wire import WireResponse, WireRoute
 from app.schemas.events import LocationEventIn, LocationEventOut
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.db import crud
+from app.api.deps import get_home_id
+from app.core.config import get_settings
+import orjson
 
-router = APIRouter()
+router = APIRouter(route_class=WireRoute)
+settings = get_settings()
 
+# Rows fetched from the cursor and written to the socket at a time
+STREAM_CHUNK_SIZE = 1000
 
-@router.post("/location", response_model=LocationEventOut)
-async def create_location_event(event: LocationEventIn, db: Session = Depends(get_db)):
+EVENT_FIELDS = ("id", "device_id", "room", "beacon_id", "start_ts", "end_ts", "confidence")
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse a "<start_ts>:<id>" keyset cursor."""
+    if cursor is None:
+        return None
+    try:
+        start_ts, event_id = cursor.split(":")
+        return int(start_ts), int(event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor. Use <start_ts>:<id> of the last event received")
+
+
+def _stream_events(
+    home_id: str,
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+    device_id: Optional[str],
+    after: Optional[Tuple[int, int]],
+    limit: Optional[int],
+    columnar: bool
+) -> Iterator[bytes]:
+    """
+    Encode events as NDJSON while reading them from a server-side cursor.
+    
+    Runs in the threadpool after the response has started, so it owns its
+    database session instead of using the request-scoped one.
+    """
+    db = SessionLocal()
+    try:
+        rows = crud.iter_event_rows(
+            db, home_id, start_ts, end_ts, STREAM_CHUNK_SIZE,
+            device_id=device_id, after=after, limit=limit
+        )
+        chunk = []
+        for event_id, _, event_device, room, beacon_id, ev_start, ev_end, confidence in rows:
+            chunk.append((event_id, event_device, room, beacon_id, ev_start, ev_end, confidence))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield _encode_chunk(chunk, columnar)
+                chunk = []
+        if chunk:
+            yield _encode_chunk(chunk, columnar)
+    finally:
+        db.close()
+
+
+def _encode_chunk(chunk, columnar: bool) -> bytes:
+    """Encode rows as one NDJSON line per event, or one line of columns per chunk."""
+    if columnar:
+        return orjson.dumps(dict(zip(EVENT_FIELDS, map(list, zip(*chunk))))) + b"\n"
+    return b"".join(orjson.dumps(dict(zip(EVENT_FIELDS, row))) + b"\n" for row in chunk)
+
+
+@router.post("/location", response_model=LocationEventOut, response_class=WireResponse)
+async def create_location_event(
+    event: LocationEventIn,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
     """
     Store a confirmed location event.
     
+    The body may also be MessagePack or CBOR, and the response follows
+    Accept (see app/api/wire.py).
+    
+    With ADAPTATION_ENABLED, a long and confident event also confirms the
+    device's readings in the room for online adaptation of its beacon mean.
+    
     Args:
         event: Location event with room, timestamps, and confidence
         db: Database session
+        home_id: Home the event belongs to
         
     Returns:
         LocationEventOut with assigned event ID
     """
     # Find room by name (must exist from calibration)
-    room = crud.get_room_by_name(db, event.room)
+    room = crud.get_room_by_name(db, home_id, event.room)
     
     if not room:
         raise HTTPException(
@@ -32,10 +106,59 @@ async def create_location_event(event: LocationEventIn, db: Session = Depends(ge
     # Create location event
     db_event = crud.create_location_event(
         db=db,
+        home_id=home_id,
         room_id=room.id,
         start_ts=event.start_ts,
         end_ts=event.end_ts,
-        confidence=event.confidence
+        confidence=event.confidence,
+        device_id=event.device_id
     )
     
+    if settings.ADAPTATION_ENABLED and event.device_id:
+        from app.services.adaptation import get_adaptation
+        get_adaptation().confirm(
+            db, home_id, event.device_id, room.beacon_id, event.start_ts, event.end_ts, event.confidence
+        )
+    
     return LocationEventOut(id=db_event.id)
+
+
+@router.get("")
+async def list_events(
+    start_ts: Optional[int] = Query(None, description="Only events starting at or after this Unix timestamp"),
+    end_ts: Optional[int] = Query(None, description="Only events starting before this Unix timestamp"),
+    device_id: Optional[str] = Query(None, description="Only events from this device"),
+    cursor: Optional[str] = Query(None, description="Resume after this <start_ts>:<id> cursor"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of events (all if omitted)"),
+    format: str = Query("ndjson", pattern="^(ndjson|columnar)$", description="ndjson or columnar"),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Stream raw location events as newline-delimited JSON.
+    
+    Events are read with a server-side cursor and written in chunks, so
+    memory stays flat regardless of how many events match. Results are
+    ordered by (start_ts, id); to fetch the next page, pass the last
+    event's `<start_ts>:<id>` as `cursor`.
+    
+    Formats:
+    - ndjson: one event object per line
+    - columnar: one object of column arrays per chunk of up to 1000 events
+    
+    Args:
+        start_ts: Lower bound on event start (inclusive)
+        end_ts: Upper bound on event start (exclusive)
+        device_id: Optional device filter
+        cursor: Keyset cursor from a previous page
+        limit: Page size
+        format: Output format
+        home_id: Home to list
+        
+    Returns:
+        StreamingResponse with application/x-ndjson content
+    """
+    after = _parse_cursor(cursor)
+    return StreamingResponse(
+        _stream_events(home_id, start_ts, end_ts, device_id, after, limit, format == "columnar"),
+        media_type="application/x-ndjson"
+    )
@@ -1,53 +1,321 @@
 """Inference endpoint for room classification."""
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, Dict, List, Optional, Type
+import math
+import struct
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.orm import Session
+from app.api.wire import JSON, WireResponse, WireRoute, body_format, openapi_body, read_body
 from app.schemas.common import FeatureVector
-from app.schemas.infer import InferenceResult
-from app.services.classifier import infer_room
-from app.services.centroid import get_centroids
+from app.schemas.infer import InferenceBatch, InferenceBatchResult, InferenceResult, InferenceSlots
+from app.services.classifier import infer_room_detailed
+from app.services.inference_log import get_inference_log
+from app.services.snapshot import ModelSnapshot, get_snapshot
 from app.db.session import get_db
-from app.db import crud
+from app.api.deps import get_home_id
+from app.core.config import get_settings
+from app.core.metrics import STAGE_SECONDS
+import time
 
-router = APIRouter()
+router = APIRouter(route_class=WireRoute)
+settings = get_settings()
 
 
-@router.post("", response_model=InferenceResult)
-async def infer(feature_vector: FeatureVector, db: Session = Depends(get_db)):
+def _invalid(loc: tuple, msg: str, value: Any) -> RequestValidationError:
+    """A 422 error in the shape FastAPI reports body validation errors."""
+    return RequestValidationError([{"type": "value_error", "loc": ("body", *loc), "msg": msg, "input": value}])
+
+
+def _pair_readings(pairs: List[Any], loc: tuple) -> List[Dict[str, Any]]:
+    """Readings sent as [beacon_id, rssi] pairs, as BeaconReading fields."""
+    readings = []
+    for i, pair in enumerate(pairs):
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            raise _invalid((*loc, "readings", i), "Expected a [beacon_id, rssi] pair", pair)
+        readings.append({"beacon_id": pair[0], "rssi": pair[1]})
+    return readings
+
+
+def _slot_readings(slots: Any, snapshot: ModelSnapshot, loc: tuple) -> List[Dict[str, Any]]:
     """
-    Classify beacon readings to predict the current room.
+    Readings sent as one RSSI per beacon of the model (GET /infer/slots order), as BeaconReading fields.
     
-    Finds the beacon closest to its calibrated mean RSSI and returns
-    the associated room.
+    The slots are a list of numbers (null: not heard) or a little-endian
+    float32 blob (NaN: not heard).
+    """
+    if isinstance(slots, (bytes, bytearray)):
+        if len(slots) % 4:
+            raise _invalid((*loc, "slots"), "float32 slots length is not a multiple of 4 bytes", None)
+        slots = struct.unpack(f"<{len(slots) // 4}f", slots)
+    elif not isinstance(slots, list):
+        raise _invalid((*loc, "slots"), "Expected a list of RSSI values or a float32 blob", slots)
+    if len(slots) != len(snapshot.beacons):
+        raise _invalid((*loc, "slots"), f"Expected {len(snapshot.beacons)} slots", len(slots))
+    readings = []
+    for beacon_id, rssi in zip(snapshot.beacons, slots):
+        if rssi is None or (isinstance(rssi, float) and math.isnan(rssi)):
+            continue
+        if not isinstance(rssi, (int, float)) or isinstance(rssi, bool):
+            raise _invalid((*loc, "slots"), "Slots must be numbers or null", rssi)
+        readings.append({"beacon_id": beacon_id, "rssi": rssi})
+    return readings
+
+
+def parse_scan(
+    scan: Any,
+    snapshot: ModelSnapshot,
+    loc: tuple = (),
+    version: Optional[str] = None
+) -> FeatureVector:
+    """
+    Parse a decoded scan in any of the /infer body forms.
+    
+    Readings may be {beacon_id, rssi} objects, [beacon_id, rssi] pairs or
+    slots; either way the scan is validated as a FeatureVector in one call.
     
     Args:
-        feature_vector: Feature vector with beacon readings
-        db: Database session
-        
-    Returns:
-        InferenceResult with predicted room and confidence score
+        scan: Decoded request body (or one scan of a batch)
+        snapshot: Model the slots refer to
+        loc: Location of the scan in the body, for error messages
+        version: Model version of the slots, if not given in the scan
         
     Raises:
-        HTTPException: If no centroids exist
+        RequestValidationError: If the scan is invalid (422)
+        HTTPException: 409 if slots were sent for another model version
+    """
+    if not isinstance(scan, dict):
+        raise _invalid(loc, "Expected an object", scan)
+    readings = scan.get("readings")
+    if "slots" in scan:
+        if scan.get("version", version) != snapshot.version:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Slots are for another model version; the current one is {snapshot.version} (GET /infer/slots)"
+            )
+        scan = {**scan, "readings": _slot_readings(scan["slots"], snapshot, loc)}
+    elif isinstance(readings, list) and readings and isinstance(readings[0], (list, tuple)):
+        scan = {**scan, "readings": _pair_readings(readings, loc)}
+    try:
+        return FeatureVector.model_validate(scan)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *loc, *error["loc"])} for error in e.errors()])
+
+
+async def read_scans(request: Request, model: Type[BaseModel]) -> Optional[BaseModel]:
     """
-    # Get centroids from database (beacon_id -> mean_rssi)
-    centroids_dict = get_centroids(db)
+    Parse a JSON body of plain {beacon_id, rssi} readings in one pass (pydantic's JSON parser).
     
-    if not centroids_dict:
+    Returns:
+        The validated body, or None if it's in another encoding or form (or
+        invalid) and must go through read_body and parse_scan
+    """
+    if body_format(request) != JSON:
+        return None
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError:
+        return None
+
+
+def classify_scan(
+    db: Session,
+    snapshot: ModelSnapshot,
+    home_id: str,
+    feature_vector: FeatureVector,
+    track: bool
+) -> InferenceResult:
+    """
+    Classify one scan with a home's model (see infer() for the steps).
+    
+    Raises:
+        HTTPException: 400 if the scan has no readings
+    """
+    if not snapshot.centroids:
         return InferenceResult(room="unknown", confidence=0.0)
     
     if not feature_vector.readings:
         raise HTTPException(status_code=400, detail="No beacon readings provided")
     
-    # Perform inference - returns beacon_id and confidence
-    best_beacon_id, confidence = infer_room(feature_vector.readings, centroids_dict)
+    readings = feature_vector.readings
+    if settings.RSSI_FILTER != "none" and feature_vector.device_id:
+        from app.services.rssi_filter import get_rssi_filter
+        readings = get_rssi_filter().apply(snapshot, feature_vector.device_id, readings, feature_vector.ts)
     
-    if best_beacon_id == "unknown":
-        return InferenceResult(room="unknown", confidence=0.0)
+    # The classifier and its parameters are those the model was saved with
+    index = None
+    if snapshot.params.get("classifier") == "knn":
+        from app.services.fingerprint import get_index
+        index = get_index(snapshot)
+    
+    # Perform inference - returns beacon_id, confidence and the runner-up margin
+    start = time.perf_counter()
+    if index is not None:
+        best_beacon_id, confidence, runner_up, margin = index.classify(
+            readings, snapshot.params.get("knn_k"), snapshot.params.get("knn_max_distance_db")
+        )
+    else:
+        best_beacon_id, confidence, runner_up, margin = infer_room_detailed(readings, snapshot.centroids)
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.labels("infer_room_knn" if index is not None else "infer_room").observe(elapsed)
     
     # Look up room name from beacon_id
-    room = crud.get_room_by_beacon_id(db, best_beacon_id)
+    room_name = snapshot.room_for(best_beacon_id) if best_beacon_id != "unknown" else None
+    if not room_name:
+        room_name, confidence = "unknown", 0.0
     
-    if not room:
-        return InferenceResult(room="unknown", confidence=0.0)
+    if settings.INFERENCE_LOG_ENABLED:
+        get_inference_log().record(
+            snapshot, readings, best_beacon_id, room_name, confidence,
+            runner_up, margin, elapsed, device_id=feature_vector.device_id
+        )
+    
+    if settings.SHADOW_CLASSIFIERS:
+        from app.services.shadow import get_shadow_evaluator
+        get_shadow_evaluator().submit(snapshot, readings, room_name, confidence, elapsed)
+    
+    if settings.ADAPTATION_ENABLED and feature_vector.device_id and index is None and room_name != "unknown":
+        from app.services.adaptation import get_adaptation
+        get_adaptation().observe(
+            home_id, feature_vector.device_id, best_beacon_id, feature_vector.readings, feature_vector.ts
+        )
     
-    return InferenceResult(room=room.name, confidence=confidence)
+    if track and feature_vector.device_id:
+        from app.services.tracker import get_tracker
+        tracked_beacon_id, probability = get_tracker().update(
+            snapshot, feature_vector.device_id, readings, feature_vector.ts
+        )
+        return InferenceResult(
+            room=snapshot.room_for(tracked_beacon_id) or "unknown", confidence=probability, raw_room=room_name
+        )
+    
+    return InferenceResult(room=room_name, confidence=confidence)
+
+
+@router.post(
+    "", response_model=InferenceResult, response_model_exclude_none=True, response_class=WireResponse,
+    openapi_extra=openapi_body(FeatureVector)
+)
+async def infer(
+    request: Request,
+    track: Optional[bool] = Query(None, description="Smooth over the device's scans (default: TRACKER_ENABLED)"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Classify beacon readings to predict the current room.
+    
+    Finds the beacon closest to its calibrated mean RSSI (or, for models
+    fitted with CLASSIFIER=knn, the room voted for by the nearest calibration
+    samples, see services/fingerprint.py) and returns the associated room.
+    Uses the home's cached snapshot of its active model version, so a warm
+    request doesn't query the database. With INFERENCE_LOG_ENABLED,
+    the decision is queued to the inference log.
+    
+    With RSSI_FILTER and a device_id, the readings are first smoothed per
+    device and beacon (see services/rssi_filter.py), so clients can send
+    single raw scans; the inference log records the smoothed readings the
+    decision was made from.
+    
+    With SHADOW_CLASSIFIERS, the candidate classifiers are run on a copy of
+    the request in the background and compared with this decision (see
+    services/shadow.py).
+    
+    With ADAPTATION_ENABLED, a device's decisions are kept to adapt the
+    beacon means once its location events confirm them (see
+    services/adaptation.py).
+    
+    With tracking (and a device_id), the scan instead updates the device's
+    belief over rooms (see services/tracker.py): the most likely room and its
+    probability are returned, with the per-scan decision as raw_room. The
+    inference log keeps recording the per-scan decision.
+    
+    The request body is a FeatureVector, in JSON, MessagePack or CBOR (see
+    app/api/wire.py); the response follows Accept. Readings may also be sent
+    as [beacon_id, rssi] pairs, or as `slots`: one RSSI per beacon in the
+    order of GET /infer/slots, with the model `version` it returned.
+    
+    Args:
+        request: Request with the scan as body
+        track: Use the temporal tracker (requires device_id)
+        db: Database session
+        home_id: Home whose model is used
+        
+    Returns:
+        InferenceResult with predicted room and confidence score
+        
+    Raises:
+        HTTPException: 400 if no readings were sent, 409 if slots were sent
+            for another model version
+    """
+    snapshot = get_snapshot(db, home_id)
+    feature_vector = await read_scans(request, FeatureVector) or parse_scan(await read_body(request), snapshot)
+    return classify_scan(db, snapshot, home_id, feature_vector, settings.TRACKER_ENABLED if track is None else track)
+
+
+@router.post(
+    "/batch", response_model=InferenceBatchResult, response_model_exclude_none=True, response_class=WireResponse,
+    openapi_extra=openapi_body(InferenceBatch)
+)
+async def infer_batch(
+    request: Request,
+    track: Optional[bool] = Query(None, description="Smooth over the devices' scans (default: TRACKER_ENABLED)"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Classify several scans in one request, in order.
+    
+    Each scan is classified as by POST /infer, so a device's scans update its
+    tracked belief one after another (send them in time order, with `ts`).
+    Slot scans may take the model `version` from the batch.
+    
+    Args:
+        request: Request with {scans: [...], version?} as body
+        track: Use the temporal tracker (scans with a device_id)
+        db: Database session
+        home_id: Home whose model is used
+        
+    Returns:
+        InferenceBatchResult with one result per scan
+        
+    Raises:
+        HTTPException: 400 if a scan has no readings, 409 as for /infer,
+            413 if there are more than INFER_BATCH_MAX_SCANS scans
+    """
+    snapshot = get_snapshot(db, home_id)
+    parsed = await read_scans(request, InferenceBatch)
+    if parsed is not None:
+        feature_vectors = parsed.scans
+    else:
+        batch = await read_body(request)
+        scans = batch.get("scans") if isinstance(batch, dict) else None
+        if not isinstance(scans, list):
+            raise _invalid(("scans",), "Expected a list of scans", scans)
+        feature_vectors = [
+            parse_scan(scan, snapshot, ("scans", i), batch.get("version")) for i, scan in enumerate(scans)
+        ]
+    if len(feature_vectors) > settings.INFER_BATCH_MAX_SCANS:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {settings.INFER_BATCH_MAX_SCANS} scans")
+    track = settings.TRACKER_ENABLED if track is None else track
+    return InferenceBatchResult(
+        results=[classify_scan(db, snapshot, home_id, feature_vector, track) for feature_vector in feature_vectors]
+    )
+
+
+@router.get("/slots", response_model=InferenceSlots, response_class=WireResponse)
+async def get_slots(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Get the beacon order of slot-array /infer requests for the home's current model.
+    
+    Refetch it when /infer answers 409 (the model changed).
+    """
+    snapshot = get_snapshot(db, home_id)
+    return {
+        "version": snapshot.version,
+        "beacons": snapshot.beacons,
+        "rooms": [snapshot.room_for(beacon_id) for beacon_id in snapshot.beacons],
+    }
@@ -1,20 +1,29 @@
 """Insights endpoint for daily summaries and analytics."""
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.core.http_cache import cached_json, make_etag
+from app.db import crud
 from app.schemas.insights import DailySummary
-from app.services.insights import daily_summary
-from app.services.llm import generate_insight_summary
+from app.services.insights import add_llm_summary, day_bounds, summarize_day
 from app.db.session import get_db
-from app.db import crud
-from datetime import datetime
+from app.api.deps import get_home_id
+from app.api.routes.jobs import submit_job
+from typing import Optional
+
+settings = get_settings()
 
 router = APIRouter()
 
 
 @router.get("/daily", response_model=DailySummary)
 async def get_daily_summary(
+    request: Request,
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
-    db: Session = Depends(get_db)
+    device_id: Optional[str] = Query(None, description="Only include events from this device"),
+    run_async: bool = Query(False, alias="async", description="Build the summary in the background and return a job"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
 ):
     """
     Get daily summary of location activity.
@@ -25,49 +34,50 @@ async def get_daily_summary(
     - LLM-generated insight summary (if LLM is configured)
     - Accuracy metrics (placeholder for now)
     
+    With ?async=true the summary (including the LLM call) is built by a
+    background job: the response is 202 with the job, whose result is the
+    DailySummary once GET /jobs/{id} reports it succeeded.
+    
+    The ETag follows the day's event/rollup watermark and the home's model
+    version (room names): repeat requests get 304 (with If-None-Match) or
+    the cached bytes, without re-querying events or calling the LLM again.
+    
     Args:
+        request: Incoming request (conditional headers)
         date: Date string in YYYY-MM-DD format (e.g., "2025-11-10")
+        device_id: Optional device/person to summarize; all devices if omitted
+        run_async: Build the summary as a background job
         db: Database session
+        home_id: Home to summarize
         
     Returns:
         DailySummary with dwell times, transitions, and optional LLM summary
     """
-    # Parse date to get start/end timestamps
     try:
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-        start_ts = int(date_obj.timestamp())
-        end_ts = start_ts + 86400  # Add 24 hours
+        start_ts, end_ts = day_bounds(date)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
-    # Get events for this date from database
-    db_events = crud.get_events_by_date_range(db, start_ts, end_ts)
-    
-    # Convert to dict format for service
-    events = [
-        {
-            "room": event.room.name,
-            "start_ts": event.start_ts,
-            "end_ts": event.end_ts,
-            "confidence": event.confidence
-        }
-        for event in db_events
-    ]
+    if run_async:
+        return submit_job("insights", home_id, {"date": date, "device_id": device_id})
     
-    # Generate summary
-    summary = daily_summary(events, date)
+    model_version = crud.get_model_version(db, home_id)
+    watermark = crud.get_day_watermark(db, home_id, date, start_ts, end_ts)
     
-    # Generate LLM insight summary if there's data
-    llm_summary = None
-    if summary["total_duration"] > 0:
-        llm_summary = await generate_insight_summary(
-            room_durations=summary["room_durations"],
-            transitions=summary["transitions"],
-            total_duration=summary["total_duration"],
-            most_visited_room=summary["summary"].get("most_visited_room"),
-            date_str=date
-        )
+    async def build():
+        summary = summarize_day(db, home_id, date, device_id)
+        # Generate LLM insight summary if there's data
+        summary = await add_llm_summary(summary)
+        return DailySummary(**summary).model_dump()
     
-    summary["llm_summary"] = llm_summary
+    def cacheable(summary):
+        # Don't pin a summary whose LLM text failed; the next request retries it
+        return not (settings.LLM_API_KEY and summary["total_duration"] > 0 and summary["llm_summary"] is None)
     
-    return DailySummary(**summary)
+    return await cached_json(
+        request,
+        ("insights", home_id, date, device_id),
+        make_etag("insights", home_id, date, device_id, model_version.version if model_version else 0, watermark),
+        build,
+        cacheable=cacheable,
+    )
@@ -0,0 +1,89 @@
+"""Endpoints for submitting background jobs and polling their status."""
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from app.api.deps import get_home_id
+from app.db.session import get_db
+from app.schemas.jobs import JobOut, ExportJobIn
+from app.services.jobs import JobQueueFull, get_job_manager
+
+router = APIRouter()
+
+
+def submit_job(kind: str, home_id: str, params: Optional[Dict[str, Any]] = None) -> ORJSONResponse:
+    """
+    Submit a background job and answer 202 Accepted with the job.
+    
+    Raises:
+        HTTPException: 503 if too many jobs are already pending
+    """
+    try:
+        job = get_job_manager().submit(kind, home_id, params)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many background jobs pending. Retry later.")
+    return ORJSONResponse(status_code=202, content=job.to_dict())
+
+
+@router.get("", response_model=List[JobOut])
+async def list_jobs(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    List the home's recent background jobs, newest first.
+    
+    Returns:
+        List of jobs with status and, once finished, result or error
+    """
+    return get_job_manager().list(db, home_id)
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Poll a background job (submitted to any worker).
+    
+    Raises:
+        HTTPException: 404 if the job doesn't exist, belongs to another home or was pruned
+    """
+    job = get_job_manager().get(db, job_id)
+    if job is None or job["home_id"] != home_id:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@router.post("/retention", status_code=202, response_model=JobOut)
+async def start_retention(home_id: str = Depends(get_home_id)):
+    """
+    Run a retention pass (merge, roll up and expire events) over the home in the background.
+    
+    The pass keeps RETENTION_DAYS and only vacuums incrementally; other
+    retention periods, all homes at once and full VACUUMs are left to the
+    operator's CLI (python -m app.services.retention).
+    """
+    return submit_job("retention", home_id)
+
+
+@router.post("/export", status_code=202, response_model=JobOut)
+async def start_export(request: ExportJobIn, home_id: str = Depends(get_home_id)):
+    """
+    Export the home's events and calibration samples in the background.
+    
+    Files are written to EXPORT_DIR/<job id>; the finished job lists them.
+    
+    Raises:
+        HTTPException: 400 if a date isn't in YYYY-MM-DD format
+    """
+    for value in (request.since, request.until):
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    return submit_job("export", home_id, request.model_dump())
@@ -0,0 +1,146 @@
+"""Endpoints for listing, comparing, activating and rolling back saved model versions."""
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from app.api.deps import get_home_id
+from app.db import crud
+from app.db.session import get_db
+from app.schemas.models import ModelDiff, ModelVersionDetail, ModelVersionOut
+
+router = APIRouter()
+
+
+def version_out(record, active) -> dict:
+    """A model version record as ModelVersionOut fields."""
+    return {
+        "version": record.version,
+        "source": record.source,
+        "parent_version": record.parent_version,
+        "beacons": record.beacons,
+        "created_at": record.created_at,
+        "active": active is not None and record.version == active.version,
+        "previous": active is not None and record.version == active.previous_version,
+    }
+
+
+def load_saved_model(db: Session, home_id: str, version: str):
+    """
+    Get a home's saved model version and its files.
+    
+    Raises:
+        HTTPException: 404 if the version isn't saved (or its files are missing)
+    """
+    from app.services.model_store import load_model
+    record = crud.get_model_snapshot(db, home_id, version)
+    saved = load_model(home_id, version) if record is not None else None
+    if saved is None:
+        raise HTTPException(status_code=404, detail=f"Model version '{version}' not found")
+    return record, saved
+
+
+@router.get("", response_model=List[ModelVersionOut])
+async def list_models(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    List the home's saved model versions, newest first.
+    
+    Returns:
+        List of versions, flagging the active one and the rollback target
+    """
+    active = crud.get_active_model(db, home_id)
+    return [version_out(record, active) for record in crud.get_model_snapshots(db, home_id)]
+
+
+@router.post("/rollback", response_model=ModelVersionOut)
+async def rollback(
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Serve the previously active model version again.
+    
+    The version rolled back from becomes the previous one, so rolling back
+    twice undoes the rollback.
+    
+    Raises:
+        HTTPException: 409 if there is no previous version
+    """
+    from app.services.model_store import rollback_model
+    active = rollback_model(db, home_id)
+    if active is None:
+        raise HTTPException(status_code=409, detail="No previous model version to roll back to")
+    return version_out(crud.get_model_snapshot(db, home_id, active.version), active)
+
+
+@router.get("/{version}", response_model=ModelVersionDetail)
+async def get_model(
+    version: str,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Get a saved model version with its centroids and parameters.
+    
+    Raises:
+        HTTPException: 404 if the version isn't saved
+    """
+    record, saved = load_saved_model(db, home_id, version)
+    fitted = saved.fitted_means()
+    return {
+        **version_out(record, crud.get_active_model(db, home_id)),
+        "params": saved.params,
+        "centroids": [
+            {
+                "beacon_id": beacon_id,
+                "room": saved.rooms[beacon_id],
+                "mean_rssi": mean_rssi,
+                "fitted_mean_rssi": fitted[beacon_id],
+            }
+            for beacon_id, mean_rssi in saved.centroids().items()
+        ],
+    }
+
+
+@router.get("/{version}/diff", response_model=ModelDiff)
+async def diff(
+    version: str,
+    against: Optional[str] = Query(None, description="Version to compare with (default: the active one)"),
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Compare a saved model version with another one.
+    
+    Raises:
+        HTTPException: 404 if either version isn't saved (or no version is active)
+    """
+    from app.services.model_store import diff_models
+    if against is None:
+        active = crud.get_active_model(db, home_id)
+        if active is None:
+            raise HTTPException(status_code=404, detail="No active model version")
+        against = active.version
+    _, saved = load_saved_model(db, home_id, version)
+    _, other = load_saved_model(db, home_id, against)
+    return diff_models(saved, other)
+
+
+@router.post("/{version}/activate", response_model=ModelVersionOut)
+async def activate(
+    version: str,
+    db: Session = Depends(get_db),
+    home_id: str = Depends(get_home_id)
+):
+    """
+    Serve a saved model version (every worker switches within SNAPSHOT_SYNC_INTERVAL_S).
+    
+    Raises:
+        HTTPException: 404 if the version isn't saved
+    """
+    from app.services.model_store import activate_model
+    active = activate_model(db, home_id, version)
+    if active is None:
+        raise HTTPException(status_code=404, detail=f"Model version '{version}' not found")
+    return version_out(crud.get_model_snapshot(db, home_id, version), active)
@@ -0,0 +1,67 @@
+"""Endpoints for listing and downloading request profiles."""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from typing import Dict, List
+from app.api.deps import require_profiling
+from app.core.profiling import get_profile_store
+
+router = APIRouter(dependencies=[Depends(require_profiling)])
+
+
+@router.get("")
+async def list_profiles() -> List[Dict]:
+    """
+    List captured request profiles, newest first.
+    
+    Returns:
+        Profile summaries (method, path, route, status, duration, SQL count and time,
+        download formats)
+    """
+    return get_profile_store().list()
+
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str):
+    """
+    Get one profile: its summary, the top of the call profile and every SQL statement.
+    
+    Raises:
+        404: If the profile doesn't exist (or was evicted)
+    """
+    entry = get_profile_store().get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    
+    info, capture = entry
+    return {**info, "stacks": capture.summary()}
+
+
+@router.get("/{profile_id}/download")
+async def download_profile(
+    profile_id: str,
+    format: str = Query("txt", description="One of the profile's formats (prof, txt, html, speedscope)")
+):
+    """
+    Download a profile's stacks as a file.
+    
+    Raises:
+        404: If the profile doesn't exist
+        400: If the format isn't available for the profile's engine
+    """
+    entry = get_profile_store().get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    
+    info, capture = entry
+    if format not in capture.formats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format '{format}' not available. Use one of: {', '.join(info['formats'])}"
+        )
+    
+    extension = "json" if format == "speedscope" else format
+    return Response(
+        content=capture.render(format),
+        media_type=capture.formats[format],
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.{extension}"'},
+    )
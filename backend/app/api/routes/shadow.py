@@ -0,0 +1,26 @@
+"""Endpoints reporting shadow evaluation of candidate classifiers."""
+from fastapi import APIRouter, Depends
+from app.api.deps import get_home_id
+from app.schemas.shadow import ShadowReport
+
+router = APIRouter()
+
+
+@router.get("", response_model=ShadowReport)
+async def get_shadow_report(home_id: str = Depends(get_home_id)):
+    """
+    Compare the candidate classifiers with the served one on this home's traffic.
+    
+    Returns:
+        Agreement, confidence and latency of the served classifier and each
+        candidate (empty unless SHADOW_CLASSIFIERS is set)
+    """
+    from app.services.shadow import get_shadow_evaluator
+    return get_shadow_evaluator().report(home_id)
+
+
+@router.delete("", status_code=204)
+async def reset_shadow_report(home_id: str = Depends(get_home_id)):
+    """Start this home's shadow statistics over."""
+    from app.services.shadow import get_shadow_evaluator
+    get_shadow_evaluator().reset(home_id)
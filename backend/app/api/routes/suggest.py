@@ -1,7 +1,6 @@
 """Suggestions endpoint for contextual recommendations."""
 from fastapi import APIRouter
 from app.schemas.suggest import SuggestIn, Suggestion
-from app.services.llm import generate_suggestion
 
 router = APIRouter()
 
@@ -20,6 +19,8 @@ async def get_suggestion(request: SuggestIn):
     Returns:
         Suggestion with likely activity, message, and quick actions
     """
+    from app.services.llm import generate_suggestion
+    
     suggestion = await generate_suggestion(
         room=request.room,
         local_time=request.local_time,
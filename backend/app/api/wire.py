@@ -0,0 +1,203 @@
+"""Content negotiation between JSON and compact binary encodings.
+
+Routes of a router created with `route_class=WireRoute` accept request bodies
+encoded as MessagePack or CBOR as well as JSON, chosen by Content-Type:
+
+- application/json (default)
+- application/msgpack (also application/x-msgpack, application/vnd.msgpack)
+- application/cbor
+
+Binary bodies are decoded before FastAPI validates them, so routes keep their
+pydantic body parameters (and their OpenAPI schema) unchanged. Routes that
+also declare `response_class=WireResponse` answer in the encoding asked for
+by Accept, or else in the request's encoding; errors stay JSON.
+
+msgpack and cbor2 are optional: install them with `pip install -e ".[wire]"`.
+Without them, requests in their encoding are refused with 415.
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Type
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+import orjson
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Media types accepted for each encoding
+ALIASES = {
+    JSON: JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    CBOR: CBOR,
+}
+
+# Encoding of the response being rendered (set per request by WireRoute)
+_response_format: ContextVar[str] = ContextVar("wire_response_format", default=JSON)
+
+
+def _require(module: str):
+    """Import an optional encoding package, refusing the request if it's missing."""
+    try:
+        return __import__(module)
+    except ImportError:
+        raise HTTPException(
+            status_code=415,
+            detail=f"This server can't decode {module} bodies. Install it with: pip install -e \".[wire]\""
+        )
+
+
+def media_type(value: Optional[str]) -> str:
+    """The bare, lower-case media type of a Content-Type or Accept entry."""
+    return (value or "").split(";")[0].strip().lower()
+
+
+def request_format(request: Request) -> Optional[str]:
+    """Encoding of the request body: JSON if unspecified, None if not one of ours."""
+    content_type = media_type(request.headers.get("content-type"))
+    return ALIASES.get(content_type) if content_type else JSON
+
+
+def body_format(request: Request) -> Optional[str]:
+    """Encoding of a WireRoute request's body (request_format before decoding)."""
+    return getattr(request, "wire_format", None) or request_format(request)
+
+
+def response_format(request: Request, default: str = JSON) -> str:
+    """The first supported encoding in Accept, else `default`."""
+    for entry in request.headers.get("accept", "").split(","):
+        encoding = ALIASES.get(media_type(entry))
+        if encoding is not None:
+            return encoding
+    return default
+
+
+def loads(body: bytes, encoding: str) -> Any:
+    """
+    Decode a body.
+    
+    Raises:
+        ValueError: If the body is malformed
+        HTTPException: 415 if the encoding's package isn't installed
+    """
+    if encoding == MSGPACK:
+        msgpack = _require("msgpack")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (msgpack.UnpackException, ValueError) as e:
+            raise ValueError(f"Invalid MessagePack body: {e or type(e).__name__}")
+    if encoding == CBOR:
+        cbor2 = _require("cbor2")
+        try:
+            return cbor2.loads(body)
+        except (cbor2.CBORDecodeError, ValueError) as e:
+            raise ValueError(f"Invalid CBOR body: {e or type(e).__name__}")
+    return orjson.loads(body)
+
+
+def dumps(content: Any, encoding: str) -> bytes:
+    """Encode a JSON-compatible value (JSON as ORJSONResponse renders it)."""
+    if encoding == MSGPACK:
+        return _require("msgpack").packb(content, use_bin_type=True)
+    if encoding == CBOR:
+        return _require("cbor2").dumps(content)
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class _DecodedRequest(Request):
+    """A request whose body FastAPI reads as JSON, decoded from another encoding."""
+    
+    def __init__(self, request: Request, encoding: str):
+        scope = dict(request.scope)
+        scope["headers"] = [(name, value) for name, value in scope["headers"] if name != b"content-type"]
+        scope["headers"].append((b"content-type", JSON.encode()))
+        super().__init__(scope, request.receive)
+        self.wire_format = encoding
+    
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body(), self.wire_format)
+        return self._json
+
+
+async def read_body(request: Request) -> Any:
+    """
+    Decode the body of a WireRoute request in any encoding (for routes parsing it themselves).
+    
+    Raises:
+        RequestValidationError: If the body is malformed (422, like FastAPI's own parsing)
+        HTTPException: 415 if the body's encoding isn't supported
+    """
+    encoding = body_format(request)
+    if encoding is None:
+        raise HTTPException(status_code=415, detail=f"Unsupported body type (use one of {', '.join(ALIASES)})")
+    try:
+        return loads(await request.body(), encoding)
+    except ValueError as e:
+        raise RequestValidationError(
+            [{"type": "json_invalid", "loc": ("body",), "msg": "Body decode error", "input": {}, "ctx": {"error": str(e)}}]
+        )
+
+
+def openapi_body(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    OpenAPI request body of a model in every encoding, for routes parsing it themselves.
+    
+    Pass as the route's `openapi_extra`.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+    
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+    
+    schema = inline(schema)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {media: {"schema": schema} for media in (JSON, MSGPACK, CBOR)},
+        }
+    }
+
+
+class WireRoute(APIRoute):
+    """APIRoute decoding MessagePack and CBOR bodies and choosing the response encoding."""
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        
+        async def wire_handler(request: Request) -> Response:
+            encoding = request_format(request)
+            if encoding is not None and encoding != JSON:
+                request = _DecodedRequest(request, encoding)
+            token = _response_format.set(response_format(request, encoding or JSON))
+            try:
+                return await handler(request)
+            finally:
+                _response_format.reset(token)
+        
+        return wire_handler
+
+
+class WireResponse(Response):
+    """Response rendered in the encoding WireRoute negotiated (JSON outside of one)."""
+    
+    media_type = JSON
+    
+    def __init__(self, content: Any = None, status_code: int = 200, headers: Optional[Dict[str, str]] = None,
+                 media_type: Optional[str] = None, background=None):
+        self.media_type = _response_format.get()
+        super().__init__(content, status_code, headers, media_type, background)
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content, self.media_type)
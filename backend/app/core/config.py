@@ -18,6 +18,171 @@ class Settings(BaseSettings):
     
     # Server
     PORT: int = 8000
+    # Worker processes for `python -m app.main` (each has its own caches; see services/snapshot.py)
+    WORKERS: int = 1
+    # Warm caches in the background once the server accepts requests
+    FAST_START: bool = True
+    # Homes (most recently changed first) whose model snapshots are warmed after startup
+    WARMUP_HOMES: int = 100
+    
+    # Schema migrations (app/db/migrations)
+    # Apply pending migrations at startup (otherwise startup fails until they're applied)
+    MIGRATE_ON_STARTUP: bool = True
+    # Rows per transaction when migrations backfill large tables
+    MIGRATION_BATCH_SIZE: int = 5000
+    
+    # Multi-home
+    # Maximum number of per-home model snapshots kept in memory for inference
+    SNAPSHOT_CACHE_SIZE: int = 1024
+    # Seconds between checks for model changes made by other workers
+    SNAPSHOT_SYNC_INTERVAL_S: float = 1.0
+    
+    # Serialized GET /centroids and /insights/daily responses kept per process (0 disables;
+    # ETags and 304s work either way)
+    RESPONSE_CACHE_SIZE: int = 256
+    
+    # Metrics (Prometheus text format at GET /metrics)
+    METRICS_ENABLED: bool = True
+    
+    # Background jobs (fit, insights, retention and export off the request path)
+    JOBS_THREAD_WORKERS: int = 4
+    # Processes for CPU-heavy job steps (0 runs them in the job's thread)
+    JOBS_PROCESS_WORKERS: int = 2
+    # Queued + running jobs accepted before new submissions get a 503
+    JOBS_MAX_PENDING: int = 100
+    # Finished jobs kept per home for status polling
+    JOBS_HISTORY_SIZE: int = 1000
+    # Output directory of export jobs (one subdirectory per job)
+    EXPORT_DIR: str = "./export"
+    
+    # Inference log (NDJSON decisions for accuracy measurement and replay)
+    INFERENCE_LOG_ENABLED: bool = False
+    INFERENCE_LOG_DIR: str = "./inference_logs"
+    # Records per write and maximum seconds a record waits in the buffer
+    INFERENCE_LOG_BATCH_SIZE: int = 500
+    INFERENCE_LOG_FLUSH_S: float = 1.0
+    # Records buffered before new ones are dropped
+    INFERENCE_LOG_QUEUE_SIZE: int = 10000
+    
+    # Shadow evaluation of candidate classifiers on live /infer traffic (app/services/shadow.py)
+    # Comma-separated candidates: registered names ("nearest_mean", "knn") or module:function
+    SHADOW_CLASSIFIERS: str = ""
+    # Fraction of /infer requests the candidates are run on
+    SHADOW_SAMPLE_RATE: float = 1.0
+    # Requests waiting for evaluation before new ones are dropped
+    SHADOW_QUEUE_SIZE: int = 10000
+    # Recent decisions per home and candidate that latency percentiles are computed over
+    SHADOW_WINDOW: int = 1000
+    
+    # Profiling (per-request profiles downloadable from /debug/profiles)
+    # Honour X-Profile: 1 / ?profile=1 and serve the /debug/profiles endpoints
+    PROFILING_ENABLED: bool = False
+    # Shared secret required in X-Profile-Token for flagged requests and downloads (empty: none)
+    PROFILING_TOKEN: str = ""
+    # Fraction of all requests profiled automatically (0 disables sampling)
+    PROFILING_SAMPLE_RATE: float = 0.0
+    # "cprofile" or "pyinstrument" (optional dependency, adds HTML flamegraphs)
+    PROFILING_ENGINE: str = "cprofile"
+    # Most recent profiles kept in memory
+    PROFILING_MAX_PROFILES: int = 50
+    
+    # Classification
+    # "nearest_mean" (closest calibrated mean) or "knn" (vote among raw calibration
+    # samples, see app/services/fingerprint.py; homes need a refit after switching)
+    CLASSIFIER: str = "nearest_mean"
+    # kNN: voting neighbours, and the distance (dB) beyond which a neighbour abstains
+    KNN_K: int = 15
+    KNN_MAX_DISTANCE_DB: float = 10.0
+    # Most scans accepted by one POST /infer/batch (413 above)
+    INFER_BATCH_MAX_SCANS: int = 1000
+    
+    # Saved model snapshots (app/services/model_store.py)
+    # Directory of the per-home model versions (memory-mapped by every worker)
+    MODEL_DIR: str = "./models"
+    # Versions kept per home besides the active and previous ones
+    MODEL_HISTORY_SIZE: int = 20
+    
+    # Calibration analysis (app/services/calibration_analysis.py), run by every fit
+    # Errors: fewer samples per beacon
+    CALIBRATION_MIN_SAMPLES: int = 30
+    # Warnings: rooms whose beacons read closer than this many spreads apart (d'), slower sampling,
+    # wider spread (dB) or a mean moving further (dB) during calibration
+    CALIBRATION_MIN_SEPARATION: float = 1.0
+    CALIBRATION_MIN_SAMPLE_RATE_HZ: float = 0.2
+    CALIBRATION_MAX_STD_DB: float = 8.0
+    CALIBRATION_MAX_DRIFT_DB: float = 3.0
+    # Refuse fits whose calibration has errors (the active model stays)
+    CALIBRATION_STRICT: bool = False
+    
+    # Chunked calibration sessions (app/services/calibration_stream.py)
+    # Largest chunk body accepted (413 above)
+    CALIBRATION_CHUNK_MAX_BYTES: int = 1048576
+    # Sessions not updated for this long are deleted by the retention job
+    CALIBRATION_SESSION_TTL_S: int = 3600
+    
+    # Online adaptation of beacon means from confirmed dwells (app/services/adaptation.py)
+    ADAPTATION_ENABLED: bool = False
+    # Minimum confidence of the location events that confirm a dwell
+    ADAPT_MIN_CONFIDENCE: float = 0.8
+    # Minimum event duration (seconds) and confident readings inside it
+    ADAPT_MIN_DWELL_S: int = 300
+    ADAPT_MIN_READINGS: int = 20
+    # Fraction of the way one confirmed dwell moves a mean towards what it observed
+    ADAPT_RATE: float = 0.05
+    # Largest change of a mean per update, and largest distance from the fitted mean (dB)
+    ADAPT_MAX_STEP_DB: float = 1.0
+    ADAPT_MAX_DRIFT_DB: float = 6.0
+    # Seconds between updates of a home's means (each one is a model change)
+    ADAPT_INTERVAL_S: float = 3600.0
+    # Devices whose recent readings are kept
+    ADAPT_MAX_DEVICES: int = 10000
+    
+    # RSSI smoothing per device and beacon (app/services/rssi_filter.py; /infer with a device_id)
+    # "none", "kalman" or "ema"
+    RSSI_FILTER: str = "none"
+    # Kalman: variance (dB²) the estimate gains per second, and variance of a single reading
+    RSSI_FILTER_PROCESS_NOISE: float = 0.5
+    RSSI_FILTER_MEASUREMENT_NOISE: float = 16.0
+    # EMA: weight of each new reading
+    RSSI_FILTER_EMA_ALPHA: float = 0.3
+    # Readings further than this many standard deviations from the estimate are ignored (0 disables)
+    RSSI_FILTER_GATE_SIGMA: float = 3.0
+    # ...unless this many in a row were: the filter then restarts from the reading
+    RSSI_FILTER_MAX_REJECTS: int = 3
+    # Seconds without a beacon after which its filter restarts
+    RSSI_FILTER_RESET_S: float = 30.0
+    # Seconds without scans after which a device's state is dropped, and devices kept
+    RSSI_FILTER_IDLE_S: float = 600.0
+    RSSI_FILTER_MAX_DEVICES: int = 10000
+    
+    # Temporal room tracking (app/services/tracker.py; /infer with a device_id)
+    # Track devices by default (overridable per request with ?track=)
+    TRACKER_ENABLED: bool = False
+    # RSSI deviation (dB) from a beacon's mean that makes a room e^-0.5 times less likely
+    TRACKER_EMISSION_SCALE_DB: float = 6.0
+    # Deviation assumed for a room whose beacon wasn't heard in a scan
+    TRACKER_MISSING_DB: float = 25.0
+    # Prior mean dwell per room in seconds (blended with the home's events)
+    TRACKER_MEAN_DWELL_S: float = 600.0
+    # Days of location events transitions are learned from, and seconds before relearning
+    TRACKER_HISTORY_DAYS: int = 30
+    TRACKER_REFRESH_S: float = 3600.0
+    # Threads learning transitions (each scans a home's history; failed models retry after TRACKER_REFRESH_S)
+    TRACKER_LEARN_WORKERS: int = 1
+    # Seconds without scans after which a device's belief starts over
+    TRACKER_RESET_S: float = 600.0
+    # Devices whose beliefs are kept in memory (least recently seen are dropped)
+    TRACKER_MAX_DEVICES: int = 10000
+    
+    # Retention
+    # Raw location events older than this many days are folded into daily rollups (0 keeps them forever)
+    RETENTION_DAYS: int = 90
+    # Adjacent same-room events at most this many seconds apart are merged into one
+    RETENTION_MERGE_GAP_S: int = 60
+    # Rows handled per transaction
+    RETENTION_BATCH_SIZE: int = 1000
+    # Run the retention job in-process every N seconds (0 disables; run the CLI from cron instead)
+    RETENTION_INTERVAL_S: int = 0
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,140 @@
+"""Conditional GETs and a server-side cache of serialized responses.
+
+Read-mostly endpoints derive an ETag from the version of the data they
+depend on (a home's model version, a day's event watermark), which is much
+cheaper to read than the payload is to build:
+
+- If the request's If-None-Match holds the ETag (or, without one, its
+  If-Modified-Since is not older than Last-Modified), the answer is 304
+  Not Modified and the payload isn't built at all.
+- Otherwise the serialized JSON is looked up in an LRU keyed by (cache key,
+  ETag), so only the first request after a data change builds and
+  serializes it.
+
+Entries of superseded versions are never served (the ETag is part of the
+key); they simply age out of the LRU.
+"""
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from threading import Lock
+from typing import Any, Awaitable, Callable, Hashable, Optional
+import hashlib
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+from app.core.metrics import CACHE_REQUESTS
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from JSON-serializable version parts."""
+    return '"' + hashlib.sha1(orjson.dumps(parts)).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 prescribes for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: Optional[int]) -> bool:
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        return last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class ResponseCache:
+    """LRU of serialized response bodies."""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = Lock()
+    
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+    
+    def put(self, key: Hashable, body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache."""
+    global _cache
+    if _cache is None:
+        from app.core.config import get_settings
+        _cache = ResponseCache(get_settings().RESPONSE_CACHE_SIZE)
+    return _cache
+
+
+async def cached_json(
+    request: Request,
+    key: Hashable,
+    etag: str,
+    build: Callable[[], Awaitable[Any]],
+    last_modified: Optional[int] = None,
+    cacheable: Optional[Callable[[Any], bool]] = None
+) -> Response:
+    """
+    Answer a GET from its data version: 304, cached bytes, or a freshly built payload.
+    
+    Args:
+        request: Incoming request (for If-None-Match / If-Modified-Since)
+        key: Identifies the resource (endpoint and parameters)
+        etag: Version of the data the payload is built from (see make_etag)
+        build: Coroutine function returning the JSON-serializable payload
+        last_modified: Unix timestamp of the last data change, if known
+        cacheable: Decides whether a freshly built payload may be cached and
+                   revalidated (e.g. not when an optional part failed); default yes
+    
+    Returns:
+        Response with ETag (and Last-Modified) headers
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        if_none_match is None and _not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    ):
+        CACHE_REQUESTS.labels("response", "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    
+    cache = get_response_cache()
+    body = cache.get((key, etag))
+    if body is not None:
+        CACHE_REQUESTS.labels("response", "hit").inc()
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    CACHE_REQUESTS.labels("response", "miss").inc()
+    payload = await build()
+    body = orjson.dumps(payload)
+    if cacheable is not None and not cacheable(payload):
+        # Served once without validators so clients don't revalidate against it
+        return Response(content=body, media_type="application/json")
+    
+    cache.put((key, etag), body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,328 @@
+"""Prometheus-style metrics.
+
+A small in-process registry (counters, gauges, histograms) rendered in the
+Prometheus text exposition format at GET /metrics, plus the hooks that feed
+it: an ASGI middleware for per-route latency and SQLAlchemy cursor events
+for query counts and durations. Recording a sample is a dict lookup, a
+lock and a bisect, so it's cheap enough to leave on in production.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, List, Sequence, Tuple
+import time
+
+# Latency buckets in seconds, from sub-millisecond inference to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """Format a label set as {a="x",b="y"}."""
+    pairs = [
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class: a named metric family with one child per label combination."""
+    
+    type = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = Lock()
+        _REGISTRY.append(self)
+    
+    def labels(self, *labelvalues: str):
+        """Get the child metric for a label combination, creating it on first use."""
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def _samples(self, labelvalues: Tuple[str, ...], child) -> Iterator[str]:
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        """Render the family in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labelvalues, child in list(self._children.items()):
+            lines.extend(self._samples(labelvalues, child))
+        return "\n".join(lines)
+
+
+class _Value:
+    """A single float guarded by a lock (counter/gauge child)."""
+    
+    __slots__ = ("value", "_lock")
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+    
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+    
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    
+    type = "counter"
+    
+    def _new_child(self):
+        return _Value()
+    
+    def _samples(self, labelvalues, child):
+        yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {child.value}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    
+    type = "gauge"
+    
+    def _new_child(self):
+        return _Value()
+    
+    def _samples(self, labelvalues, child):
+        yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {child.value}"
+
+
+class _HistogramChild:
+    """Bucketed observations for one label combination."""
+    
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+    
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+    
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    @contextmanager
+    def time(self):
+        """Observe the duration of a with-block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Distribution of observations (latencies) in cumulative buckets."""
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+    
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+    
+    def _samples(self, labelvalues, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(bound))
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+        labels = _format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}_sum{labels} {child.sum}"
+        yield f"{self.name}_count{labels} {child.count}"
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+# ============================================================================
+# Metric definitions
+# ============================================================================
+
+HTTP_REQUESTS = Counter(
+    "homesense_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "homesense_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge(
+    "homesense_http_requests_in_flight", "HTTP requests currently being served"
+)
+HTTP_EXCEPTIONS = Counter(
+    "homesense_http_exceptions_total", "Unhandled exceptions by route", ("route",)
+)
+
+DB_QUERIES = Counter(
+    "homesense_db_queries_total", "SQL statements executed by kind", ("statement",)
+)
+DB_QUERY_SECONDS = Histogram(
+    "homesense_db_query_duration_seconds", "SQL statement latency by kind", ("statement",)
+)
+
+STAGE_SECONDS = Histogram(
+    "homesense_stage_duration_seconds", "Latency of internal processing stages", ("stage",)
+)
+
+LLM_REQUESTS = Counter(
+    "homesense_llm_requests_total", "LLM API calls by purpose and outcome", ("purpose", "outcome")
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "homesense_llm_request_duration_seconds", "LLM API call latency by purpose", ("purpose",)
+)
+SUGGESTION_FALLBACKS = Counter(
+    "homesense_suggestion_fallbacks_total", "Suggestions answered by the rule-based fallback", ("reason",)
+)
+
+CACHE_REQUESTS = Counter(
+    "homesense_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+)
+
+JOBS = Counter(
+    "homesense_jobs_total", "Background jobs by kind and outcome", ("kind", "outcome")
+)
+JOB_SECONDS = Histogram(
+    "homesense_job_duration_seconds", "Background job run time by kind", ("kind",)
+)
+JOBS_PENDING = Gauge(
+    "homesense_jobs_pending", "Background jobs queued or running"
+)
+
+STARTUP_SECONDS = Gauge(
+    "homesense_startup_seconds", "Time spent importing the app, starting up and warming caches", ("phase",)
+)
+
+INFERENCE_LOG_RECORDS = Counter(
+    "homesense_inference_log_records_total", "Inference log records by result", ("result",)
+)
+
+CALIBRATION_ISSUES = Counter(
+    "homesense_calibration_issues_total", "Calibration issues found by fits, by kind and severity", ("kind", "severity")
+)
+
+ADAPTATION_OBSERVATIONS = Counter(
+    "homesense_adaptation_observations_total",
+    "Dwells considered for online adaptation by outcome", ("result",)
+)
+
+RSSI_OUTLIERS_REJECTED = Counter(
+    "homesense_rssi_outliers_rejected_total", "Readings ignored by the RSSI filter's outlier gate"
+)
+
+SHADOW_REQUESTS = Counter(
+    "homesense_shadow_requests_total", "Requests mirrored to shadow classifiers by result", ("result",)
+)
+SHADOW_DECISIONS = Counter(
+    "homesense_shadow_decisions_total",
+    "Shadow classifier decisions by candidate and agreement with the served room", ("candidate", "result")
+)
+SHADOW_SECONDS = Histogram(
+    "homesense_shadow_classifier_duration_seconds", "Shadow classifier latency by candidate", ("candidate",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+SHADOW_CONFIDENCE = Histogram(
+    "homesense_shadow_confidence", "Confidence of served and shadow classifier decisions", ("candidate",),
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+
+
+# ============================================================================
+# Hooks
+# ============================================================================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status and in-flight requests.
+    
+    Routes are labelled with their path template (e.g. /homes/{home_id}/infer)
+    so label cardinality stays bounded.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        in_flight = HTTP_IN_FLIGHT.labels()
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            HTTP_EXCEPTIONS.labels(_route_label(scope)).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = _route_label(scope)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route).observe(elapsed)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+
+
+def _route_label(scope) -> str:
+    """Get the matched route's path template, or a fixed label for unmatched paths."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every SQL statement executed through a SQLAlchemy engine."""
+    from sqlalchemy import event
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERIES.labels(kind).inc()
+        DB_QUERY_SECONDS.labels(kind).observe(elapsed)
+    
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
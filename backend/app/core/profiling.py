@@ -0,0 +1,286 @@
+"""Request-scoped profiling.
+
+When PROFILING_ENABLED is set, a request is profiled if it carries an
+`X-Profile: 1` header or a `?profile=1` query flag (plus `X-Profile-Token`
+if PROFILING_TOKEN is configured), and a PROFILING_SAMPLE_RATE fraction of
+all requests is profiled automatically. A profile holds the call stacks of
+the request and every SQL statement it executed; it's kept in a small
+in-memory store, its id is returned in the X-Profile-Id response header and
+it can be downloaded from /debug/profiles.
+
+Stacks come from cProfile (downloadable as a .prof file for snakeviz,
+flameprof or gprof2dot) or, with PROFILING_ENGINE=pyinstrument and the
+optional `pyinstrument` dependency (`pip install -e ".[profiling]"`), from
+pyinstrument (HTML flamegraph and speedscope JSON).
+
+Only one request is profiled at a time. Profilers observe the event loop
+thread, so other requests interleaving with the profiled one at await
+points can show up in its stacks; the SQL list is strictly per request.
+"""
+from collections import OrderedDict
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import time
+import uuid
+
+# Statements recorded per profile (further statements are dropped)
+MAX_SQL_STATEMENTS = 500
+
+# Paths never profiled (the profile endpoints themselves and scrapes)
+EXCLUDED_PREFIXES = ("/debug/profiles", "/metrics", "/healthz")
+
+# SQL statements of the request being profiled (None when not profiling)
+_SQL_LOG: ContextVar[Optional[List[Dict]]] = ContextVar("profiling_sql_log", default=None)
+
+# Python allows a single active profiler per thread
+_PROFILER_LOCK = Lock()
+
+
+# ============================================================================
+# Stack capture
+# ============================================================================
+
+class _CProfileCapture:
+    """Deterministic call profile via the standard library's cProfile."""
+    
+    formats = {
+        "prof": "application/octet-stream",
+        "txt": "text/plain; charset=utf-8",
+    }
+    
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+    
+    def start(self):
+        self.profiler.enable()
+    
+    def stop(self):
+        self.profiler.disable()
+        self.profiler.create_stats()
+    
+    def summary(self, limit: int = 30) -> str:
+        """Top functions by cumulative time."""
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    
+    def render(self, fmt: str) -> bytes:
+        if fmt == "prof":
+            # Same format as Profile.dump_stats(), readable by pstats.Stats(path).
+            # Stats are re-snapshotted since pstats.Stats() consumes profiler.stats
+            self.profiler.create_stats()
+            return marshal.dumps(self.profiler.stats)
+        return self.summary(limit=200).encode()
+
+
+class _PyinstrumentCapture:
+    """Statistical profile via pyinstrument, with await-aware stacks."""
+    
+    formats = {
+        "html": "text/html; charset=utf-8",
+        "speedscope": "application/json",
+        "txt": "text/plain; charset=utf-8",
+    }
+    
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError(
+                "PROFILING_ENGINE=pyinstrument requires pyinstrument. "
+                "Install it with: pip install -e \".[profiling]\""
+            )
+        self.profiler = Profiler(interval=0.0005, async_mode="enabled")
+    
+    def start(self):
+        self.profiler.start()
+    
+    def stop(self):
+        self.profiler.stop()
+    
+    def summary(self, limit: int = 30) -> str:
+        return self.profiler.output_text(unicode=True, color=False)
+    
+    def render(self, fmt: str) -> bytes:
+        if fmt == "html":
+            return self.profiler.output_html().encode()
+        if fmt == "speedscope":
+            from pyinstrument.renderers import SpeedscopeRenderer
+            return self.profiler.output(renderer=SpeedscopeRenderer()).encode()
+        return self.summary().encode()
+
+
+_ENGINES = {"cprofile": _CProfileCapture, "pyinstrument": _PyinstrumentCapture}
+
+
+# ============================================================================
+# Profile store
+# ============================================================================
+
+class ProfileStore:
+    """The most recent profiles, oldest evicted first."""
+    
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Tuple[Dict, object]]" = OrderedDict()
+        self._lock = Lock()
+    
+    def add(self, info: Dict, capture) -> None:
+        with self._lock:
+            self._profiles[info["id"]] = (info, capture)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+    
+    def list(self) -> List[Dict]:
+        """Profile summaries, newest first (without SQL statements)."""
+        with self._lock:
+            entries = list(self._profiles.values())
+        return [
+            {key: value for key, value in info.items() if key != "sql"}
+            for info, _ in reversed(entries)
+        ]
+    
+    def get(self, profile_id: str) -> Optional[Tuple[Dict, object]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    """Get the process-wide profile store."""
+    global _store
+    if _store is None:
+        from app.core.config import get_settings
+        _store = ProfileStore(get_settings().PROFILING_MAX_PROFILES)
+    return _store
+
+
+# ============================================================================
+# Hooks
+# ============================================================================
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles flagged or sampled requests.
+    
+    Args:
+        app: ASGI app to wrap
+        engine: "cprofile" or "pyinstrument"
+        token: Shared secret required in X-Profile-Token for flagged requests (empty: none)
+        sample_rate: Fraction of requests profiled without a flag
+    """
+    
+    def __init__(self, app, engine: str = "cprofile", token: str = "", sample_rate: float = 0.0):
+        if engine not in _ENGINES:
+            raise ValueError(f"Unknown profiling engine '{engine}'. Use one of: {', '.join(_ENGINES)}")
+        self.app = app
+        self.capture_class = _ENGINES[engine]
+        self.token = token
+        self.sample_rate = sample_rate
+    
+    def _trigger(self, scope) -> Optional[str]:
+        """Decide whether (and why) a request is profiled."""
+        if scope["path"].startswith(EXCLUDED_PREFIXES):
+            return None
+        
+        headers = dict(scope["headers"])
+        flag = headers.get(b"x-profile", b"").decode()
+        if not flag:
+            flag = parse_qs(scope.get("query_string", b"").decode()).get("profile", [""])[0]
+        if flag.lower() in ("1", "true"):
+            if not self.token or headers.get(b"x-profile-token", b"").decode() == self.token:
+                return "flag"
+        
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        trigger = self._trigger(scope)
+        if trigger is None or not _PROFILER_LOCK.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        
+        profile_id = uuid.uuid4().hex[:16]
+        status_code = 500
+        
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+        
+        sql: List[Dict] = []
+        sql_token = _SQL_LOG.set(sql)
+        capture = self.capture_class()
+        started_at = int(time.time())
+        start = time.perf_counter()
+        capture.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            capture.stop()
+            elapsed = time.perf_counter() - start
+            _SQL_LOG.reset(sql_token)
+            _PROFILER_LOCK.release()
+            
+            route = getattr(scope.get("route"), "path", None)
+            get_profile_store().add({
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status_code,
+                "trigger": trigger,
+                "started_at": started_at,
+                "duration_ms": round(elapsed * 1000, 3),
+                "sql_count": len(sql),
+                "sql_ms": round(sum(statement["duration_ms"] for statement in sql), 3),
+                "formats": sorted(capture.formats),
+                "sql": sql,
+            }, capture)
+
+
+def instrument_engine_profiling(engine) -> None:
+    """Record SQL statements (with parameters and duration) of profiled requests."""
+    from sqlalchemy import event
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _SQL_LOG.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        log = _SQL_LOG.get()
+        starts = conn.info.get("profile_start")
+        if log is None or not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        if len(log) >= MAX_SQL_STATEMENTS:
+            return
+        log.append({
+            "statement": statement,
+            "parameters": repr(parameters)[:500],
+            "duration_ms": round(duration * 1000, 3),
+        })
+    
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        if context.connection is not None and context.connection.info.get("profile_start"):
+            context.connection.info["profile_start"].pop()
@@ -1,6 +1,8 @@
 """CRUD operations for database models."""
+from sqlalchemy import and_, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict, Tuple
 from app.db import models
 import time
 
@@ -9,10 +11,10 @@ import time
 # Room CRUD
 # ============================================================================
 
-def get_or_create_room(db: Session, name: str, beacon_id: str) -> models.Room:
-    """Get existing room by beacon_id or create new one."""
+def get_or_create_room(db: Session, home_id: str, name: str, beacon_id: str) -> models.Room:
+    """Get existing room in a home by beacon_id or create new one."""
     # First check if beacon_id exists
-    room = db.query(models.Room).filter(models.Room.beacon_id == beacon_id).first()
+    room = get_room_by_beacon_id(db, home_id, beacon_id)
     if room:
         # Update name if it changed
         if room.name != name:
@@ -22,7 +24,7 @@ def get_or_create_room(db: Session, name: str, beacon_id: str) -> models.Room:
         return room
     
     # Check if name exists (shouldn't happen in normal flow)
-    room = db.query(models.Room).filter(models.Room.name == name).first()
+    room = get_room_by_name(db, home_id, name)
     if room:
         # Update beacon_id
         room.beacon_id = beacon_id
@@ -31,26 +33,42 @@ def get_or_create_room(db: Session, name: str, beacon_id: str) -> models.Room:
         return room
     
     # Create new room
-    room = models.Room(name=name, beacon_id=beacon_id)
+    room = models.Room(home_id=home_id, name=name, beacon_id=beacon_id)
     db.add(room)
     db.commit()
     db.refresh(room)
     return room
 
 
-def get_room_by_name(db: Session, name: str) -> Optional[models.Room]:
-    """Get room by name."""
-    return db.query(models.Room).filter(models.Room.name == name).first()
+def get_room_by_name(db: Session, home_id: str, name: str) -> Optional[models.Room]:
+    """Get room in a home by name."""
+    return db.query(models.Room).filter(
+        models.Room.home_id == home_id,
+        models.Room.name == name
+    ).first()
+
+
+def get_room_by_beacon_id(db: Session, home_id: str, beacon_id: str) -> Optional[models.Room]:
+    """Get room in a home by beacon_id."""
+    return db.query(models.Room).filter(
+        models.Room.home_id == home_id,
+        models.Room.beacon_id == beacon_id
+    ).first()
 
 
-def get_room_by_beacon_id(db: Session, beacon_id: str) -> Optional[models.Room]:
-    """Get room by beacon_id."""
-    return db.query(models.Room).filter(models.Room.beacon_id == beacon_id).first()
+def get_all_rooms(db: Session, home_id: str) -> List[models.Room]:
+    """Get all rooms in a home."""
+    return db.query(models.Room).filter(models.Room.home_id == home_id).all()
 
 
-def get_all_rooms(db: Session) -> List[models.Room]:
-    """Get all rooms."""
-    return db.query(models.Room).all()
+def get_room_names(db: Session, home_id: str) -> Dict[str, str]:
+    """Get beacon_id -> room name of a home's rooms without loading ORM objects."""
+    return dict(db.query(models.Room.beacon_id, models.Room.name).filter(models.Room.home_id == home_id).all())
+
+
+def get_home_ids(db: Session) -> List[str]:
+    """Get ids of all homes that have at least one room."""
+    return [home_id for (home_id,) in db.query(models.Room.home_id).distinct().all()]
 
 
 # ============================================================================
@@ -59,6 +77,7 @@ def get_all_rooms(db: Session) -> List[models.Room]:
 
 def create_calibration_window(
     db: Session,
+    home_id: str,
     room_id: int,
     window_start: int,
     window_end: int,
@@ -67,6 +86,7 @@ def create_calibration_window(
 ) -> models.CalibrationWindow:
     """Create a new calibration window."""
     window = models.CalibrationWindow(
+        home_id=home_id,
         room_id=room_id,
         window_start=window_start,
         window_end=window_end,
@@ -79,15 +99,292 @@ def create_calibration_window(
     return window
 
 
-def delete_calibration_windows_by_beacon(db: Session, beacon_id: str) -> int:
-    """Delete all calibration windows for a beacon. Returns count of deleted windows."""
+def delete_calibration_windows_by_beacon(db: Session, home_id: str, beacon_id: str) -> int:
+    """Delete all calibration windows for a beacon in a home. Returns count of deleted windows."""
     count = db.query(models.CalibrationWindow).filter(
+        models.CalibrationWindow.home_id == home_id,
         models.CalibrationWindow.beacon_id == beacon_id
     ).delete()
     db.commit()
     return count
 
 
+def _assign_room(db: Session, home_id: str, name: str, beacon_id: str) -> models.Room:
+    """get_or_create_room without committing (the room is flushed to get its id)."""
+    room = get_room_by_beacon_id(db, home_id, beacon_id) or get_room_by_name(db, home_id, name)
+    if room is None:
+        room = models.Room(home_id=home_id, name=name, beacon_id=beacon_id)
+        db.add(room)
+    room.name = name
+    room.beacon_id = beacon_id
+    db.flush()
+    return room
+
+
+def _assign_rooms(db: Session, home_id: str, names: Dict[str, str]) -> Dict[str, models.Room]:
+    """
+    _assign_room for many beacons at once (beacon_id -> room name), without committing.
+    
+    Rooms are matched by beacon first; the other beacons then take over the
+    remaining rooms by name, or get new ones. Changed rooms are moved to
+    placeholder values before they get their final ones, so the batch may
+    swap names or beacons between rooms without a unique constraint
+    failing midway.
+    """
+    rooms = {
+        room.beacon_id: room for room in db.query(models.Room).filter(
+            models.Room.home_id == home_id,
+            models.Room.beacon_id.in_(list(names))
+        )
+    }
+    unmatched = [beacon_id for beacon_id in names if beacon_id not in rooms]
+    if unmatched:
+        claimed = {room.id for room in rooms.values()}
+        by_name = {
+            room.name: room for room in db.query(models.Room).filter(
+                models.Room.home_id == home_id,
+                models.Room.name.in_([names[beacon_id] for beacon_id in unmatched])
+            )
+        }
+        for beacon_id in unmatched:
+            room = by_name.get(names[beacon_id])
+            if room is not None and room.id not in claimed:
+                rooms[beacon_id] = room
+                claimed.add(room.id)
+    
+    changed = [
+        (beacon_id, room) for beacon_id, room in rooms.items()
+        if (room.name, room.beacon_id) != (names[beacon_id], beacon_id)
+    ]
+    for _, room in changed:
+        room.name = room.beacon_id = f"\0reassigning:{room.id}"
+    db.flush()
+    for beacon_id, room in changed:
+        room.name = names[beacon_id]
+        room.beacon_id = beacon_id
+    db.flush()
+    
+    for beacon_id, name in names.items():
+        if beacon_id not in rooms:
+            rooms[beacon_id] = models.Room(home_id=home_id, name=name, beacon_id=beacon_id)
+            db.add(rooms[beacon_id])
+    db.flush()
+    return rooms
+
+
+def replace_calibration_windows(
+    db: Session,
+    home_id: str,
+    windows: List[Tuple[str, str, int, int, List[float]]]
+) -> Tuple[Dict[str, models.Room], int]:
+    """
+    Replace the calibration windows of every beacon in `windows` in one transaction.
+    
+    Rooms are resolved like get_or_create_room (renamed, re-assigned or
+    created), all at once: the batch may swap room names (or beacons)
+    between its beacons. Nothing is written if an assignment conflicts with
+    a room outside the batch.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+        windows: (room_name, beacon_id, window_start, window_end, rssi_samples) tuples
+    
+    Returns:
+        Tuple of (rooms by beacon_id, count of deleted windows)
+    
+    Raises:
+        IntegrityError: If a room name or beacon is already assigned elsewhere
+    """
+    names: Dict[str, str] = {}
+    for room_name, beacon_id, _, _, _ in windows:
+        names.setdefault(beacon_id, room_name)
+    try:
+        rooms = _assign_rooms(db, home_id, names)
+        deleted = db.query(models.CalibrationWindow).filter(
+            models.CalibrationWindow.home_id == home_id,
+            models.CalibrationWindow.beacon_id.in_(list(rooms))
+        ).delete(synchronize_session=False)
+        db.execute(insert(models.CalibrationWindow), [
+            {
+                "home_id": home_id,
+                "room_id": rooms[beacon_id].id,
+                "window_start": window_start,
+                "window_end": window_end,
+                "beacon_id": beacon_id,
+                "rssi_samples": rssi_samples,
+            }
+            for _, beacon_id, window_start, window_end, rssi_samples in windows
+        ])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    return rooms, deleted
+
+
+def create_calibration_session(
+    db: Session,
+    home_id: str,
+    session_id: str,
+    beacon_id: str,
+    room: str,
+    window_start: int
+) -> models.CalibrationSession:
+    """Open a chunked calibration upload session."""
+    now = int(time.time())
+    session = models.CalibrationSession(
+        id=session_id,
+        home_id=home_id,
+        beacon_id=beacon_id,
+        room=room,
+        window_start=window_start,
+        created_at=now,
+        updated_at=now,
+        chunks=0,
+        samples=0
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def get_calibration_session(db: Session, home_id: str, session_id: str) -> Optional[models.CalibrationSession]:
+    """Get one of a home's open calibration sessions."""
+    return db.query(models.CalibrationSession).filter(
+        models.CalibrationSession.id == session_id,
+        models.CalibrationSession.home_id == home_id
+    ).first()
+
+
+def add_calibration_chunk(
+    db: Session,
+    session: models.CalibrationSession,
+    data: bytes,
+    samples: int,
+    stats: Tuple[float, float, float, float]
+) -> models.CalibrationSession:
+    """
+    Store a chunk of a calibration session and its updated running statistics.
+    
+    Args:
+        db: Database session
+        session: Calibration session
+        data: The chunk's samples as little-endian float32
+        samples: Number of samples in the chunk
+        stats: Session statistics including the chunk: (mean, m2, min, max)
+    
+    Returns:
+        The updated session
+    """
+    db.add(models.CalibrationChunk(session_id=session.id, seq=session.chunks, samples=samples, data=data))
+    session.chunks += 1
+    session.samples += samples
+    session.mean_rssi, session.m2, session.min_rssi, session.max_rssi = stats
+    session.updated_at = int(time.time())
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def iter_calibration_chunks(db: Session, session_id: str, batch_size: int = 16) -> Iterator[Tuple[int, bytes]]:
+    """Stream a calibration session's chunks as (samples, data), in upload order."""
+    query = select(models.CalibrationChunk.samples, models.CalibrationChunk.data).where(
+        models.CalibrationChunk.session_id == session_id
+    ).order_by(models.CalibrationChunk.seq)
+    for samples, data in db.execute(query.execution_options(yield_per=batch_size)):
+        yield samples, data
+
+
+def commit_calibration_session(
+    db: Session,
+    session: models.CalibrationSession,
+    windows: Iterator[Tuple[int, int, List[float]]]
+) -> Tuple[models.Room, int, int]:
+    """
+    Replace the session beacon's calibration windows with the session's, in one transaction.
+    
+    The session and its chunks are deleted with it.
+    
+    Args:
+        db: Database session
+        session: Calibration session
+        windows: (window_start, window_end, rssi_samples) per window, consumed one at a time
+    
+    Returns:
+        Tuple of (room, count of deleted windows, count of created windows)
+    
+    Raises:
+        IntegrityError: If the room name is already assigned another beacon
+    """
+    try:
+        room = _assign_room(db, session.home_id, session.room, session.beacon_id)
+        deleted = db.query(models.CalibrationWindow).filter(
+            models.CalibrationWindow.home_id == session.home_id,
+            models.CalibrationWindow.beacon_id == session.beacon_id
+        ).delete(synchronize_session=False)
+        created = 0
+        for window_start, window_end, rssi_samples in windows:
+            db.execute(insert(models.CalibrationWindow), [{
+                "home_id": session.home_id,
+                "room_id": room.id,
+                "window_start": window_start,
+                "window_end": window_end,
+                "beacon_id": session.beacon_id,
+                "rssi_samples": rssi_samples,
+            }])
+            created += 1
+        _delete_calibration_session(db, session.id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    return room, deleted, created
+
+
+def _delete_calibration_session(db: Session, session_id: str) -> None:
+    db.query(models.CalibrationChunk).filter(
+        models.CalibrationChunk.session_id == session_id
+    ).delete(synchronize_session=False)
+    db.query(models.CalibrationSession).filter(
+        models.CalibrationSession.id == session_id
+    ).delete(synchronize_session=False)
+
+
+def delete_calibration_session(db: Session, session_id: str) -> None:
+    """Discard a calibration session and its chunks."""
+    _delete_calibration_session(db, session_id)
+    db.commit()
+
+
+def delete_stale_calibration_sessions(
+    db: Session,
+    before_ts: int,
+    limit: int,
+    home_id: Optional[str] = None
+) -> int:
+    """
+    Delete up to `limit` sessions (with their chunks) last updated before `before_ts`.
+    
+    Only sessions of `home_id` if given. Returns count of deleted sessions.
+    """
+    query = db.query(models.CalibrationSession.id).filter(models.CalibrationSession.updated_at < before_ts)
+    if home_id is not None:
+        query = query.filter(models.CalibrationSession.home_id == home_id)
+    session_ids = [session_id for (session_id,) in query.limit(limit).all()]
+    if not session_ids:
+        return 0
+    db.query(models.CalibrationChunk).filter(
+        models.CalibrationChunk.session_id.in_(session_ids)
+    ).delete(synchronize_session=False)
+    db.query(models.CalibrationSession).filter(
+        models.CalibrationSession.id.in_(session_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(session_ids)
+
+
 def get_calibration_windows_by_room(db: Session, room_id: int) -> List[models.CalibrationWindow]:
     """Get all calibration windows for a room."""
     return db.query(models.CalibrationWindow).filter(
@@ -95,16 +392,80 @@ def get_calibration_windows_by_room(db: Session, room_id: int) -> List[models.Ca
     ).all()
 
 
-def get_calibration_windows_by_beacon(db: Session, beacon_id: str) -> List[models.CalibrationWindow]:
-    """Get all calibration windows for a beacon."""
+def delete_orphaned_calibration_windows(db: Session, limit: int, home_id: Optional[str] = None) -> int:
+    """
+    Delete up to `limit` windows whose beacon no longer belongs to their room.
+    
+    These are left behind when a room is re-assigned to a new beacon. Only
+    windows of `home_id` if given. Returns count of deleted windows.
+    """
+    query = db.query(models.CalibrationWindow.id).join(
+        models.Room, models.CalibrationWindow.room_id == models.Room.id
+    ).filter(
+        models.CalibrationWindow.beacon_id != models.Room.beacon_id
+    )
+    if home_id is not None:
+        query = query.filter(models.Room.home_id == home_id)
+    orphan_ids = [window_id for (window_id,) in query.limit(limit).all()]
+    if not orphan_ids:
+        return 0
+    count = db.query(models.CalibrationWindow).filter(
+        models.CalibrationWindow.id.in_(orphan_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+
+def iter_calibration_window_rows(
+    db: Session,
+    home_id: Optional[str] = None,
+    chunk_size: int = 100
+) -> Iterator[Tuple]:
+    """
+    Stream calibration windows joined with their room.
+    
+    Yields (id, home_id, room_name, beacon_id, window_start, window_end, rssi_samples)
+    ordered by (home_id, window_start, id). Windows hold whole sample lists,
+    so chunks are kept small.
+    """
+    query = db.query(
+        models.CalibrationWindow.id,
+        models.CalibrationWindow.home_id,
+        models.Room.name,
+        models.CalibrationWindow.beacon_id,
+        models.CalibrationWindow.window_start,
+        models.CalibrationWindow.window_end,
+        models.CalibrationWindow.rssi_samples
+    ).join(models.Room, models.CalibrationWindow.room_id == models.Room.id)
+    if home_id is not None:
+        query = query.filter(models.CalibrationWindow.home_id == home_id)
+    return iter(query.order_by(
+        models.CalibrationWindow.home_id,
+        models.CalibrationWindow.window_start,
+        models.CalibrationWindow.id
+    ).yield_per(chunk_size))
+
+
+def get_calibration_windows_by_beacon(db: Session, home_id: str, beacon_id: str) -> List[models.CalibrationWindow]:
+    """Get all calibration windows for a beacon in a home."""
     return db.query(models.CalibrationWindow).filter(
+        models.CalibrationWindow.home_id == home_id,
         models.CalibrationWindow.beacon_id == beacon_id
     ).all()
 
 
-def get_all_calibration_windows(db: Session) -> List[models.CalibrationWindow]:
-    """Get all calibration windows."""
-    return db.query(models.CalibrationWindow).all()
+def get_all_calibration_windows(db: Session, home_id: str) -> List[models.CalibrationWindow]:
+    """Get all calibration windows in a home."""
+    return db.query(models.CalibrationWindow).filter(
+        models.CalibrationWindow.home_id == home_id
+    ).all()
+
+
+def has_calibration_windows(db: Session, home_id: str) -> bool:
+    """Check whether a home has any calibration windows without loading them."""
+    return db.query(models.CalibrationWindow.id).filter(
+        models.CalibrationWindow.home_id == home_id
+    ).first() is not None
 
 
 # ============================================================================
@@ -113,6 +474,7 @@ def get_all_calibration_windows(db: Session) -> List[models.CalibrationWindow]:
 
 def upsert_centroid(
     db: Session,
+    home_id: str,
     room_id: int,
     mean_rssi: float
 ) -> models.Centroid:
@@ -125,11 +487,15 @@ def upsert_centroid(
     
     if centroid:
         centroid.mean_rssi = mean_rssi
+        centroid.fitted_mean_rssi = mean_rssi
+        centroid.adapted_at = None
         centroid.updated_at = updated_at
     else:
         centroid = models.Centroid(
+            home_id=home_id,
             room_id=room_id,
             mean_rssi=mean_rssi,
+            fitted_mean_rssi=mean_rssi,
             updated_at=updated_at
         )
         db.add(centroid)
@@ -139,17 +505,75 @@ def upsert_centroid(
     return centroid
 
 
-def get_all_centroids(db: Session) -> List[models.Centroid]:
-    """Get all centroids."""
-    return db.query(models.Centroid).all()
+def get_all_centroids(db: Session, home_id: str) -> List[models.Centroid]:
+    """Get all centroids in a home."""
+    return db.query(models.Centroid).filter(models.Centroid.home_id == home_id).all()
+
+
+def get_centroid_rows(db: Session, home_id: str) -> List[Tuple[str, str, float]]:
+    """Get (beacon_id, room_name, mean_rssi) rows for a home without loading ORM objects."""
+    return db.query(
+        models.Room.beacon_id,
+        models.Room.name,
+        models.Centroid.mean_rssi
+    ).join(models.Room, models.Centroid.room_id == models.Room.id).filter(
+        models.Centroid.home_id == home_id
+    ).all()
+
+
+def get_adaptation_rows(db: Session, home_id: str) -> List[Tuple[str, str, float, float, Optional[int]]]:
+    """Get (beacon_id, room_name, mean_rssi, fitted_mean_rssi, adapted_at) rows for a home."""
+    return db.query(
+        models.Room.beacon_id,
+        models.Room.name,
+        models.Centroid.mean_rssi,
+        func.coalesce(models.Centroid.fitted_mean_rssi, models.Centroid.mean_rssi),
+        models.Centroid.adapted_at
+    ).join(models.Room, models.Centroid.room_id == models.Room.id).filter(
+        models.Centroid.home_id == home_id
+    ).all()
 
 
-def get_centroids_dict(db: Session) -> Dict[str, float]:
-    """Get centroids as a dictionary mapping beacon_id to mean_rssi."""
-    centroids = db.query(models.Centroid).join(models.Room).all()
+def update_adapted_means(db: Session, home_id: str, means: Dict[str, float]) -> int:
+    """Set the (online adapted) mean_rssi of beacons in a home; the fitted means stay."""
+    now = int(time.time())
+    room_ids = dict(db.query(models.Room.beacon_id, models.Room.id).filter(
+        models.Room.home_id == home_id, models.Room.beacon_id.in_(list(means))
+    ).all())
+    updated = 0
+    for beacon_id, mean_rssi in means.items():
+        if beacon_id not in room_ids:
+            continue
+        updated += db.query(models.Centroid).filter(models.Centroid.room_id == room_ids[beacon_id]).update(
+            {"mean_rssi": mean_rssi, "adapted_at": now, "updated_at": now}, synchronize_session=False
+        )
+    db.commit()
+    return updated
+
+
+def reset_adapted_means(db: Session, home_id: str) -> int:
+    """Restore the fitted means of a home's adapted centroids. Returns the number restored."""
+    restored = db.query(models.Centroid).filter(
+        models.Centroid.home_id == home_id,
+        models.Centroid.adapted_at.isnot(None),
+        models.Centroid.fitted_mean_rssi.isnot(None)
+    ).update(
+        {
+            "mean_rssi": models.Centroid.fitted_mean_rssi,
+            "adapted_at": None,
+            "updated_at": int(time.time()),
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    return restored
+
+
+def get_centroids_dict(db: Session, home_id: str) -> Dict[str, float]:
+    """Get centroids for a home as a dictionary mapping beacon_id to mean_rssi."""
     return {
-        centroid.room.beacon_id: centroid.mean_rssi
-        for centroid in centroids
+        beacon_id: mean_rssi
+        for beacon_id, _, mean_rssi in get_centroid_rows(db, home_id)
     }
 
 
@@ -159,14 +583,18 @@ def get_centroids_dict(db: Session) -> Dict[str, float]:
 
 def create_location_event(
     db: Session,
+    home_id: str,
     room_id: int,
     start_ts: int,
     end_ts: int,
-    confidence: float
+    confidence: float,
+    device_id: Optional[str] = None
 ) -> models.LocationEvent:
     """Create a new location event."""
     event = models.LocationEvent(
+        home_id=home_id,
         room_id=room_id,
+        device_id=device_id,
         start_ts=start_ts,
         end_ts=end_ts,
         confidence=confidence
@@ -179,18 +607,520 @@ def create_location_event(
 
 def get_events_by_date_range(
     db: Session,
+    home_id: str,
     start_ts: int,
-    end_ts: int
+    end_ts: int,
+    device_id: Optional[str] = None
 ) -> List[models.LocationEvent]:
-    """Get all location events within a date range."""
-    return db.query(models.LocationEvent).filter(
+    """Get all location events in a home within a date range, optionally for one device."""
+    query = db.query(models.LocationEvent).filter(
+        models.LocationEvent.home_id == home_id,
         models.LocationEvent.start_ts >= start_ts,
         models.LocationEvent.start_ts < end_ts
-    ).order_by(models.LocationEvent.start_ts).all()
+    )
+    if device_id is not None:
+        query = query.filter(models.LocationEvent.device_id == device_id)
+    return query.order_by(models.LocationEvent.start_ts).all()
 
 
-def get_all_events(db: Session) -> List[models.LocationEvent]:
-    """Get all location events."""
-    return db.query(models.LocationEvent).order_by(
+def get_all_events(db: Session, home_id: str) -> List[models.LocationEvent]:
+    """Get all location events in a home."""
+    return db.query(models.LocationEvent).filter(
+        models.LocationEvent.home_id == home_id
+    ).order_by(
         models.LocationEvent.start_ts
     ).all()
+
+
+def iter_event_rows(
+    db: Session,
+    home_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    chunk_size: int = 10000,
+    device_id: Optional[str] = None,
+    after: Optional[Tuple[int, int]] = None,
+    limit: Optional[int] = None
+) -> Iterator[Tuple]:
+    """
+    Stream events joined with their room without building ORM objects.
+    
+    Yields (id, home_id, device_id, room_name, beacon_id, start_ts, end_ts, confidence)
+    ordered by (home_id, start_ts, id), fetching `chunk_size` rows at a time.
+    `after` is a (start_ts, id) keyset cursor: only rows after it are returned.
+    """
+    query = db.query(
+        models.LocationEvent.id,
+        models.LocationEvent.home_id,
+        models.LocationEvent.device_id,
+        models.Room.name,
+        models.Room.beacon_id,
+        models.LocationEvent.start_ts,
+        models.LocationEvent.end_ts,
+        models.LocationEvent.confidence
+    ).join(models.Room, models.LocationEvent.room_id == models.Room.id)
+    if home_id is not None:
+        query = query.filter(models.LocationEvent.home_id == home_id)
+    if start_ts is not None:
+        query = query.filter(models.LocationEvent.start_ts >= start_ts)
+    if end_ts is not None:
+        query = query.filter(models.LocationEvent.start_ts < end_ts)
+    if device_id is not None:
+        query = query.filter(models.LocationEvent.device_id == device_id)
+    if after is not None:
+        after_ts, after_id = after
+        query = query.filter(or_(
+            models.LocationEvent.start_ts > after_ts,
+            and_(models.LocationEvent.start_ts == after_ts, models.LocationEvent.id > after_id)
+        ))
+    query = query.order_by(
+        models.LocationEvent.home_id,
+        models.LocationEvent.start_ts,
+        models.LocationEvent.id
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return iter(query.yield_per(chunk_size))
+
+
+def get_event_device_ids(db: Session, home_id: str, start_ts: int, end_ts: int) -> List[Optional[str]]:
+    """Get distinct device ids (None for unattributed events) with events in a home and range."""
+    rows = db.query(models.LocationEvent.device_id).filter(
+        models.LocationEvent.home_id == home_id,
+        models.LocationEvent.start_ts >= start_ts,
+        models.LocationEvent.start_ts < end_ts
+    ).distinct().all()
+    return [device_id for (device_id,) in rows]
+
+
+def get_timeline_event_page(
+    db: Session,
+    home_id: str,
+    device_id: Optional[str],
+    start_ts: int,
+    end_ts: int,
+    after: Tuple[int, int],
+    limit: int
+) -> List[Tuple[int, int, int, int, float]]:
+    """
+    Get one page of a device timeline as (id, room_id, start_ts, end_ts, confidence) rows.
+    
+    Pages are keyed on (start_ts, id) so callers can modify rows between pages.
+    """
+    after_ts, after_id = after
+    query = db.query(
+        models.LocationEvent.id,
+        models.LocationEvent.room_id,
+        models.LocationEvent.start_ts,
+        models.LocationEvent.end_ts,
+        models.LocationEvent.confidence
+    ).filter(
+        models.LocationEvent.home_id == home_id,
+        models.LocationEvent.start_ts >= start_ts,
+        models.LocationEvent.start_ts < end_ts,
+        or_(
+            models.LocationEvent.start_ts > after_ts,
+            and_(models.LocationEvent.start_ts == after_ts, models.LocationEvent.id > after_id)
+        )
+    )
+    if device_id is None:
+        query = query.filter(models.LocationEvent.device_id.is_(None))
+    else:
+        query = query.filter(models.LocationEvent.device_id == device_id)
+    return query.order_by(
+        models.LocationEvent.start_ts,
+        models.LocationEvent.id
+    ).limit(limit).all()
+
+
+def get_last_timeline_event(
+    db: Session,
+    home_id: str,
+    device_id: Optional[str],
+    start_ts: int,
+    before_ts: int
+) -> Optional[Tuple[int, int, int, int, float]]:
+    """Get a device's last event starting in [start_ts, before_ts) as a get_timeline_event_page row."""
+    query = db.query(
+        models.LocationEvent.id,
+        models.LocationEvent.room_id,
+        models.LocationEvent.start_ts,
+        models.LocationEvent.end_ts,
+        models.LocationEvent.confidence
+    ).filter(
+        models.LocationEvent.home_id == home_id,
+        models.LocationEvent.start_ts >= start_ts,
+        models.LocationEvent.start_ts < before_ts
+    )
+    if device_id is None:
+        query = query.filter(models.LocationEvent.device_id.is_(None))
+    else:
+        query = query.filter(models.LocationEvent.device_id == device_id)
+    return query.order_by(
+        models.LocationEvent.start_ts.desc(),
+        models.LocationEvent.id.desc()
+    ).first()
+
+
+def get_merge_watermark(db: Session, home_id: str) -> Optional[int]:
+    """Get the start time before which a home's events were merged (None if never)."""
+    return db.query(models.MergeWatermark.merged_until).filter(
+        models.MergeWatermark.home_id == home_id
+    ).scalar()
+
+
+def set_merge_watermark(db: Session, home_id: str, merged_until: int) -> None:
+    """Record that a home's events starting before `merged_until` were merged."""
+    watermark = db.get(models.MergeWatermark, home_id)
+    if watermark is None:
+        db.add(models.MergeWatermark(home_id=home_id, merged_until=merged_until))
+    else:
+        watermark.merged_until = max(watermark.merged_until, merged_until)
+    db.commit()
+
+
+def get_expired_event_page(db: Session, home_id: str, before_ts: int, limit: int) -> List[models.LocationEvent]:
+    """Get the oldest page of events in a home starting before a cutoff."""
+    return db.query(models.LocationEvent).filter(
+        models.LocationEvent.home_id == home_id,
+        models.LocationEvent.start_ts < before_ts
+    ).order_by(
+        models.LocationEvent.start_ts,
+        models.LocationEvent.id
+    ).limit(limit).all()
+
+
+def update_location_event_span(db: Session, event_id: int, end_ts: int, confidence: float) -> None:
+    """Set the end and confidence of a location event without committing."""
+    db.query(models.LocationEvent).filter(
+        models.LocationEvent.id == event_id
+    ).update(
+        {models.LocationEvent.end_ts: end_ts, models.LocationEvent.confidence: confidence},
+        synchronize_session=False
+    )
+
+
+def delete_location_events_by_ids(db: Session, event_ids: List[int]) -> int:
+    """Delete location events by id without committing. Returns count of deleted events."""
+    if not event_ids:
+        return 0
+    return db.query(models.LocationEvent).filter(
+        models.LocationEvent.id.in_(event_ids)
+    ).delete(synchronize_session=False)
+
+
+# ============================================================================
+# Daily Rollup CRUD
+# ============================================================================
+
+def add_to_daily_rollup(
+    db: Session,
+    home_id: str,
+    device_id: Optional[str],
+    date: str,
+    room_id: int,
+    duration: int,
+    event_count: int
+) -> models.DailyRollup:
+    """Add dwell time to a day's rollup row, creating it if needed. Does not commit."""
+    query = db.query(models.DailyRollup).filter(
+        models.DailyRollup.home_id == home_id,
+        models.DailyRollup.date == date,
+        models.DailyRollup.room_id == room_id
+    )
+    if device_id is None:
+        query = query.filter(models.DailyRollup.device_id.is_(None))
+    else:
+        query = query.filter(models.DailyRollup.device_id == device_id)
+    
+    rollup = query.first()
+    if rollup:
+        rollup.duration += duration
+        rollup.event_count += event_count
+    else:
+        rollup = models.DailyRollup(
+            home_id=home_id,
+            device_id=device_id,
+            date=date,
+            room_id=room_id,
+            duration=duration,
+            event_count=event_count
+        )
+        db.add(rollup)
+    return rollup
+
+
+def get_day_watermark(db: Session, home_id: str, date: str, start_ts: int, end_ts: int) -> Tuple:
+    """
+    Get a cheap fingerprint of a home's data for one day.
+    
+    Counts, highest ids and summed end times/durations of the day's events and
+    rollups: inserting, deleting, merging (end_ts grows) or rolling up events
+    all change it. Read from the home-leading indexes without loading rows
+    into the session.
+    """
+    events = db.query(
+        func.count(models.LocationEvent.id),
+        func.max(models.LocationEvent.id),
+        func.sum(models.LocationEvent.end_ts)
+    ).filter(
+        models.LocationEvent.home_id == home_id,
+        models.LocationEvent.start_ts >= start_ts,
+        models.LocationEvent.start_ts < end_ts
+    ).one()
+    rollups = db.query(
+        func.count(models.DailyRollup.id),
+        func.max(models.DailyRollup.id),
+        func.sum(models.DailyRollup.duration)
+    ).filter(
+        models.DailyRollup.home_id == home_id,
+        models.DailyRollup.date == date
+    ).one()
+    return tuple(events) + tuple(rollups)
+
+
+def get_daily_rollups(
+    db: Session,
+    home_id: str,
+    date: str,
+    device_id: Optional[str] = None
+) -> List[models.DailyRollup]:
+    """Get rollup rows for a home and day, optionally for one device."""
+    query = db.query(models.DailyRollup).filter(
+        models.DailyRollup.home_id == home_id,
+        models.DailyRollup.date == date
+    )
+    if device_id is not None:
+        query = query.filter(models.DailyRollup.device_id == device_id)
+    return query.all()
+
+
+# ============================================================================
+# Model Version CRUD
+# ============================================================================
+
+def bump_model_version(db: Session, home_id: str) -> int:
+    """
+    Give a home's model the next version of the shared sequence. Returns the new version.
+    
+    The counter row is incremented first, which locks it (a row lock on
+    PostgreSQL, the write lock on SQLite) until the commit. Bumps are thereby
+    serialized: no two get the same version, versions become visible in
+    increasing order (so a poller using `version > last_seen` misses none),
+    and a home's first bump sees a concurrent one's row instead of
+    inserting a duplicate.
+    """
+    now = int(time.time())
+    db.query(models.ModelVersionCounter).filter(
+        models.ModelVersionCounter.id == 1
+    ).update({"version": models.ModelVersionCounter.version + 1}, synchronize_session=False)
+    version = db.query(models.ModelVersionCounter.version).filter(
+        models.ModelVersionCounter.id == 1
+    ).scalar()
+    
+    updated = db.query(models.ModelVersion).filter(
+        models.ModelVersion.home_id == home_id
+    ).update({"version": version, "updated_at": now}, synchronize_session=False)
+    if not updated:
+        db.add(models.ModelVersion(home_id=home_id, version=version, updated_at=now))
+    db.commit()
+    return version
+
+
+def get_model_versions_since(db: Session, version: int) -> List[Tuple[str, int]]:
+    """Get (home_id, version) of homes whose model changed after the given version."""
+    return db.query(models.ModelVersion.home_id, models.ModelVersion.version).filter(
+        models.ModelVersion.version > version
+    ).all()
+
+
+def get_model_version(db: Session, home_id: str) -> Optional[models.ModelVersion]:
+    """Get a home's model version row (None if its model never changed)."""
+    return db.get(models.ModelVersion, home_id)
+
+
+def get_latest_model_version(db: Session) -> int:
+    """Get the highest model version of any home (0 if none changed yet)."""
+    return db.query(func.max(models.ModelVersion.version)).scalar() or 0
+
+
+def get_recently_changed_homes(db: Session, limit: int) -> List[str]:
+    """Get the homes whose model changed most recently, newest first."""
+    rows = db.query(models.ModelVersion.home_id).order_by(
+        models.ModelVersion.version.desc()
+    ).limit(limit).all()
+    return [home_id for home_id, in rows]
+
+
+# ============================================================================
+# Model Snapshot CRUD
+# ============================================================================
+
+def create_model_snapshot(
+    db: Session,
+    home_id: str,
+    version: str,
+    source: str,
+    parent_version: Optional[str],
+    beacons: int
+) -> models.ModelSnapshotRecord:
+    """Record a saved model snapshot, or return the existing record of that version."""
+    record = get_model_snapshot(db, home_id, version)
+    if record is not None:
+        return record
+    record = models.ModelSnapshotRecord(
+        home_id=home_id,
+        version=version,
+        source=source,
+        parent_version=parent_version,
+        beacons=beacons,
+        created_at=int(time.time())
+    )
+    db.add(record)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker saved the same content first
+        db.rollback()
+        return get_model_snapshot(db, home_id, version)
+    db.refresh(record)
+    return record
+
+
+def get_model_snapshot(db: Session, home_id: str, version: str) -> Optional[models.ModelSnapshotRecord]:
+    """Get the record of one of a home's saved model snapshots."""
+    return db.query(models.ModelSnapshotRecord).filter(
+        models.ModelSnapshotRecord.home_id == home_id,
+        models.ModelSnapshotRecord.version == version
+    ).first()
+
+
+def get_model_snapshots(
+    db: Session,
+    home_id: str,
+    limit: Optional[int] = None
+) -> List[models.ModelSnapshotRecord]:
+    """Get a home's saved model snapshots, newest first."""
+    query = db.query(models.ModelSnapshotRecord).filter(
+        models.ModelSnapshotRecord.home_id == home_id
+    ).order_by(models.ModelSnapshotRecord.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def delete_model_snapshots(db: Session, home_id: str, versions: List[str]) -> int:
+    """Delete the records of some of a home's model snapshots. Returns the number deleted."""
+    if not versions:
+        return 0
+    deleted = db.query(models.ModelSnapshotRecord).filter(
+        models.ModelSnapshotRecord.home_id == home_id,
+        models.ModelSnapshotRecord.version.in_(versions)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def get_active_model(db: Session, home_id: str) -> Optional[models.ActiveModel]:
+    """Get a home's active model pointer (None if no snapshot was ever activated)."""
+    return db.get(models.ActiveModel, home_id)
+
+
+def set_active_model(db: Session, home_id: str, version: str) -> models.ActiveModel:
+    """Point a home at a model snapshot, remembering the one it replaces."""
+    now = int(time.time())
+    active = db.get(models.ActiveModel, home_id)
+    if active is None:
+        active = models.ActiveModel(home_id=home_id, version=version, activated_at=now)
+        db.add(active)
+    elif active.version != version:
+        active.previous_version = active.version
+        active.version = version
+        active.activated_at = now
+    db.commit()
+    db.refresh(active)
+    return active
+
+
+def set_centroid_means(db: Session, home_id: str, means: Dict[str, Tuple[float, float, Optional[int]]]) -> int:
+    """
+    Overwrite the centroids of a home's beacons with those of a model snapshot.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+        means: Dictionary mapping beacon_id to (mean_rssi, fitted_mean_rssi, adapted_at)
+    
+    Returns:
+        Number of centroids written (beacons without a room are skipped)
+    """
+    now = int(time.time())
+    room_ids = dict(db.query(models.Room.beacon_id, models.Room.id).filter(
+        models.Room.home_id == home_id, models.Room.beacon_id.in_(list(means))
+    ).all())
+    existing = {
+        centroid.room_id: centroid
+        for centroid in db.query(models.Centroid).filter(models.Centroid.home_id == home_id).all()
+    }
+    for beacon_id, (mean_rssi, fitted_mean, adapted_at) in means.items():
+        room_id = room_ids.get(beacon_id)
+        if room_id is None:
+            continue
+        centroid = existing.pop(room_id, None)
+        if centroid is None:
+            centroid = models.Centroid(home_id=home_id, room_id=room_id)
+            db.add(centroid)
+        centroid.mean_rssi = mean_rssi
+        centroid.fitted_mean_rssi = fitted_mean
+        centroid.adapted_at = adapted_at
+        centroid.updated_at = now
+    # Beacons the snapshot doesn't know weren't part of that model
+    for centroid in existing.values():
+        db.delete(centroid)
+    db.commit()
+    return len(room_ids)
+
+
+# ============================================================================
+# Background Job CRUD
+# ============================================================================
+
+def save_background_job(db: Session, job: Dict) -> models.BackgroundJob:
+    """Insert or update a job's row from its dictionary form."""
+    row = db.get(models.BackgroundJob, job["id"])
+    if row is None:
+        row = models.BackgroundJob(id=job["id"])
+        db.add(row)
+    for field in ("home_id", "kind", "params", "status", "created_at", "started_at", "finished_at", "result", "error"):
+        setattr(row, field, job[field])
+    db.commit()
+    return row
+
+
+def get_background_job(db: Session, job_id: str) -> Optional[models.BackgroundJob]:
+    """Get a job by id."""
+    return db.get(models.BackgroundJob, job_id)
+
+
+def get_background_jobs(db: Session, home_id: str, limit: int = 100) -> List[models.BackgroundJob]:
+    """Get a home's most recent jobs, newest first."""
+    return db.query(models.BackgroundJob).filter(
+        models.BackgroundJob.home_id == home_id
+    ).order_by(models.BackgroundJob.created_at.desc()).limit(limit).all()
+
+
+def delete_old_background_jobs(db: Session, home_id: str, keep: int) -> int:
+    """Delete a home's finished jobs beyond the `keep` most recent. Returns count of deleted jobs."""
+    cutoff = db.query(models.BackgroundJob.created_at).filter(
+        models.BackgroundJob.home_id == home_id
+    ).order_by(models.BackgroundJob.created_at.desc()).offset(keep).limit(1).scalar()
+    if cutoff is None:
+        return 0
+    
+    deleted = db.query(models.BackgroundJob).filter(
+        models.BackgroundJob.home_id == home_id,
+        models.BackgroundJob.created_at <= cutoff,
+        models.BackgroundJob.status.in_(("succeeded", "failed"))
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -1,26 +1,44 @@
 """Database initialization."""
+import time
+from app.core.config import get_settings
+from app.db import migrations
 from app.db.session import engine, Base
-from app.db import models
+from app.db import models  # registers the models for drop_all
+
+settings = get_settings()
 
 
 def init_db(drop_existing: bool = False):
     """
-    Initialize database by creating tables if they don't exist.
+    Bring the database schema up to date.
+    
+    Checks the schema version (one primary-key lookup) and applies pending
+    migrations if MIGRATE_ON_STARTUP is set.
     
     Args:
         drop_existing: If True, drops all tables first (destructive, for development only)
     
-    For production, use proper migrations instead.
+    Raises:
+        RuntimeError: If migrations are pending and MIGRATE_ON_STARTUP is off
     """
-    # Import all models to ensure they're registered with Base
-    # (already imported above, but being explicit)
+    started = time.perf_counter()
     
     if drop_existing:
         # Drop all existing tables (destructive - use only for development/testing)
         Base.metadata.drop_all(bind=engine)
         print("⚠ Dropped all existing tables")
     
-    # Create all tables (only creates if they don't exist)
-    Base.metadata.create_all(bind=engine)
+    version = migrations.current_version(engine)
+    head = migrations.head_version()
+    if version >= head:
+        print(f"✓ Database schema up to date (version {version}, {(time.perf_counter() - started) * 1000:.1f} ms)")
+        return
+    
+    if not settings.MIGRATE_ON_STARTUP:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {head}. "
+            f"Run: python -m app.db.migrations upgrade"
+        )
     
-    print("✓ Database initialized successfully")
+    migrations.upgrade(engine, batch_size=settings.MIGRATION_BATCH_SIZE)
+    print(f"✓ Database initialized successfully ({(time.perf_counter() - started) * 1000:.1f} ms)")
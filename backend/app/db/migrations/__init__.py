@@ -0,0 +1,296 @@
+"""Versioned schema migrations.
+
+Each module in `app/db/migrations/versions` named `v<NNNN>_<description>.py`
+upgrades the schema from version NNNN-1 to NNNN through an `upgrade(ctx)`
+function. The applied version is stored in the `schema_info` table
+(`name = 'version'`), so checking whether a database is current at startup
+is a single primary-key lookup.
+
+Migrations are forward-only and made of idempotent steps (the helpers on
+MigrationContext skip work that is already done), so an upgrade that was
+interrupted can simply be run again. Steps commit one by one instead of
+holding one long transaction:
+
+- create_index() builds indexes without blocking writers where the database
+  supports it (CREATE INDEX CONCURRENTLY on PostgreSQL); on SQLite readers
+  keep working (WAL) and writers wait out the build (busy_timeout).
+- backfill() updates large tables in batches of MIGRATION_BATCH_SIZE rows,
+  one short transaction per batch.
+
+Only one process migrates at a time: upgrade() takes a lock row in
+schema_info, and workers starting together wait for it. The lock's timestamp
+is refreshed between steps and every LOCK_HEARTBEAT_S by a background thread,
+so a single long step (e.g. an index build on a large table) doesn't let a
+starting worker take it over as stale.
+
+    python -m app.db.migrations status
+    python -m app.db.migrations upgrade [--to N] [--batch-size N]
+"""
+from pathlib import Path
+from threading import Event, Thread
+from typing import Callable, List, Optional, Tuple
+import importlib
+import os
+import pkgutil
+import time
+from sqlalchemy import Column, Table, inspect, literal, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+# Seconds after which a lock left by a crashed migrating process is taken over
+LOCK_STALE_S = 600
+
+# Seconds between refreshes of the lock while a migration runs
+LOCK_HEARTBEAT_S = 60
+
+# Seconds a process waits for another one's upgrade before giving up
+LOCK_WAIT_S = 1800
+
+_VERSIONS_DIR = Path(__file__).parent / "versions"
+
+
+class MigrationContext:
+    """
+    Schema operations for migrations; each commits on its own.
+    
+    Args:
+        engine: SQLAlchemy engine of the database being migrated
+        batch_size: Rows per transaction in backfill()
+        heartbeat: Called between steps to keep the migration lock fresh
+    """
+    
+    def __init__(self, engine: Engine, batch_size: int, heartbeat: Optional[Callable[[], None]] = None):
+        self.engine = engine
+        self.dialect = engine.dialect
+        self.batch_size = batch_size
+        self._heartbeat = heartbeat or (lambda: None)
+    
+    def execute(self, sql: str, params: Optional[dict] = None) -> int:
+        """Run one statement in its own transaction. Returns the affected row count."""
+        with self.engine.begin() as conn:
+            rowcount = conn.execute(text(sql), params or {}).rowcount
+        self._heartbeat()
+        return rowcount
+    
+    def has_table(self, table: str) -> bool:
+        with self.engine.connect() as conn:
+            return inspect(conn).has_table(table)
+    
+    def has_column(self, table: str, column: str) -> bool:
+        with self.engine.connect() as conn:
+            return any(info["name"] == column for info in inspect(conn).get_columns(table))
+    
+    def has_index(self, table: str, name: str) -> bool:
+        """Whether an index or a unique constraint with this name exists on the table."""
+        with self.engine.connect() as conn:
+            inspector = inspect(conn)
+            names = {index["name"] for index in inspector.get_indexes(table)}
+            names.update(constraint["name"] for constraint in inspector.get_unique_constraints(table))
+        return name in names
+    
+    def create_table(self, table: Table) -> None:
+        """Create a table (and the indexes declared on it) unless it exists."""
+        with self.engine.begin() as conn:
+            table.create(conn, checkfirst=True)
+        self._heartbeat()
+    
+    def add_column(self, table: str, column: Column) -> None:
+        """
+        Add a column unless it exists.
+        
+        Give NOT NULL columns a server_default: existing rows take the default
+        without being rewritten (SQLite, PostgreSQL 11+).
+        """
+        if self.has_column(table, column.name):
+            return
+        ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=self.dialect)}"
+        if column.server_default is not None:
+            default = literal(column.server_default.arg).compile(
+                dialect=self.dialect, compile_kwargs={"literal_binds": True}
+            )
+            ddl += f" DEFAULT {default}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        self.execute(ddl)
+    
+    def create_index(self, name: str, table: str, columns: List[str], unique: bool = False) -> None:
+        """Build an index unless it exists, without blocking writers where supported."""
+        if self.has_index(table, name):
+            return
+        ddl = (
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX{{concurrently}} IF NOT EXISTS "
+            f"{name} ON {table} ({', '.join(columns)})"
+        )
+        if self.dialect.name == "postgresql":
+            # CONCURRENTLY can't run inside a transaction
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(ddl.format(concurrently=" CONCURRENTLY")))
+            self._heartbeat()
+        else:
+            self.execute(ddl.format(concurrently=""))
+    
+    def drop_index(self, name: str) -> None:
+        self.execute(f"DROP INDEX IF EXISTS {name}")
+    
+    def backfill(self, table: str, assignments: str, where: str, params: Optional[dict] = None) -> int:
+        """
+        Update rows matching `where` in batches, one transaction per batch.
+        
+        `where` must stop matching a row once it's updated, or the backfill
+        never ends.
+        
+        Args:
+            table: Table with an integer `id` primary key
+            assignments: SET clause, e.g. "home_id = 'default'"
+            where: Condition selecting rows still to update, e.g. "home_id IS NULL"
+            params: Bound parameters used in assignments or where
+        
+        Returns:
+            Number of rows updated
+        """
+        total = 0
+        while True:
+            updated = self.execute(
+                f"UPDATE {table} SET {assignments} WHERE id IN "
+                f"(SELECT id FROM {table} WHERE {where} LIMIT :batch_size)",
+                {**(params or {}), "batch_size": self.batch_size},
+            )
+            total += updated
+            if updated < self.batch_size:
+                return total
+
+
+# ============================================================================
+# Versions
+# ============================================================================
+
+def load_migrations() -> List[Tuple[int, str, Callable[[MigrationContext], None]]]:
+    """(version, description, upgrade) of every migration, in version order."""
+    migrations = []
+    for module_info in pkgutil.iter_modules([str(_VERSIONS_DIR)]):
+        if not module_info.name.startswith("v"):
+            continue
+        version = int(module_info.name[1:5])
+        module = importlib.import_module(f"{__name__}.versions.{module_info.name}")
+        description = (module.__doc__ or module_info.name).strip().splitlines()[0].rstrip(".")
+        migrations.append((version, description, module.upgrade))
+    
+    migrations.sort(key=lambda migration: migration[0])
+    expected = list(range(1, len(migrations) + 1))
+    if [migration[0] for migration in migrations] != expected:
+        raise RuntimeError(f"Migration versions must be consecutive from 1, found {[m[0] for m in migrations]}")
+    return migrations
+
+
+def head_version() -> int:
+    """Version of the newest migration (the version the code expects)."""
+    return sum(1 for module_info in pkgutil.iter_modules([str(_VERSIONS_DIR)]) if module_info.name.startswith("v"))
+
+
+def current_version(engine: Engine) -> int:
+    """Version stored in the database (0 for a new or pre-migration database)."""
+    try:
+        with engine.connect() as conn:
+            # Plain SQL: compiling an ORM statement costs more than the query on first use
+            value = conn.exec_driver_sql("SELECT value FROM schema_info WHERE name = 'version'").scalar()
+    except DBAPIError:
+        # schema_info doesn't exist yet
+        return 0
+    return int(value) if value is not None else 0
+
+
+def _ensure_schema_info(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS schema_info (name VARCHAR NOT NULL PRIMARY KEY, value VARCHAR NOT NULL)"
+        )
+
+
+def _set_info(engine: Engine, name: str, value: str) -> None:
+    with engine.begin() as conn:
+        if not conn.execute(
+            text("UPDATE schema_info SET value = :value WHERE name = :name"), {"name": name, "value": value}
+        ).rowcount:
+            conn.execute(text("INSERT INTO schema_info (name, value) VALUES (:name, :value)"),
+                         {"name": name, "value": value})
+
+
+def _acquire_lock(engine: Engine, owner: str) -> None:
+    """Take the migration lock, waiting while another live process holds it."""
+    deadline = time.time() + LOCK_WAIT_S
+    while True:
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text("DELETE FROM schema_info WHERE name = 'migration_lock' AND value < :stale"),
+                    {"stale": f"{time.time() - LOCK_STALE_S:017.6f}"},
+                )
+                conn.execute(
+                    text("INSERT INTO schema_info (name, value) VALUES ('migration_lock', :value)"),
+                    {"value": f"{time.time():017.6f} {owner}"},
+                )
+            return
+        except IntegrityError:
+            if time.time() > deadline:
+                raise RuntimeError("Timed out waiting for another process to finish migrating")
+            time.sleep(0.5)
+
+
+def _release_lock(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM schema_info WHERE name = 'migration_lock'")
+
+
+def upgrade(engine: Engine, target: Optional[int] = None, batch_size: int = 5000) -> List[int]:
+    """
+    Apply pending migrations up to `target` (default: the newest).
+    
+    Args:
+        engine: Engine of the database to migrate
+        target: Version to stop at
+        batch_size: Rows per transaction for backfills
+    
+    Returns:
+        Versions applied by this call (empty if another process already did the work)
+    """
+    migrations = load_migrations()
+    target = len(migrations) if target is None else target
+    if current_version(engine) >= target:
+        return []
+    
+    _ensure_schema_info(engine)
+    owner = f"pid={os.getpid()}"
+    _acquire_lock(engine, owner)
+    
+    def heartbeat():
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE schema_info SET value = :value WHERE name = 'migration_lock'"),
+                {"value": f"{time.time():017.6f} {owner}"},
+            )
+    
+    stopped = Event()
+    
+    def keep_alive():
+        while not stopped.wait(LOCK_HEARTBEAT_S):
+            try:
+                heartbeat()
+            except DBAPIError as e:
+                # E.g. SQLite busy while a step holds the write lock: try again next time
+                print(f"Migration lock heartbeat failed: {e}")
+    
+    Thread(target=keep_alive, name="migration-lock", daemon=True).start()
+    applied = []
+    try:
+        context = MigrationContext(engine, batch_size, heartbeat)
+        # Re-read under the lock: a process that held it may have migrated already
+        for version, description, step in migrations[current_version(engine):target]:
+            started = time.perf_counter()
+            step(context)
+            _set_info(engine, "version", str(version))
+            applied.append(version)
+            print(f"✓ Migration {version:04d} applied: {description} ({time.perf_counter() - started:.2f} s)")
+    finally:
+        stopped.set()
+        _release_lock(engine)
+    return applied
@@ -0,0 +1,27 @@
+"""Command line for schema migrations (see app/db/migrations/__init__.py)."""
+from app.core.config import get_settings
+from app.db.migrations import current_version, load_migrations, upgrade
+from app.db.session import engine
+
+if __name__ == "__main__":
+    import argparse
+    
+    settings = get_settings()
+    
+    parser = argparse.ArgumentParser(prog="python -m app.db.migrations", description="Manage the database schema")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the database version and pending migrations")
+    upgrade_parser = commands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="Stop at this version (default: newest)")
+    upgrade_parser.add_argument("--batch-size", type=int, default=settings.MIGRATION_BATCH_SIZE,
+                                help="Rows per transaction for backfills")
+    args = parser.parse_args()
+    
+    if args.command == "status":
+        version = current_version(engine)
+        print(f"Database version: {version}")
+        for number, description, _ in load_migrations():
+            print(f"  [{'x' if number <= version else ' '}] {number:04d} {description}")
+    else:
+        applied = upgrade(engine, args.to, args.batch_size)
+        print(f"Applied {len(applied)} migration(s); database version: {current_version(engine)}")
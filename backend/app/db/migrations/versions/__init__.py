@@ -0,0 +1 @@
+"""Migration modules, applied in order of their `v<NNNN>` prefix."""
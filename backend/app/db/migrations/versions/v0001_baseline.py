@@ -0,0 +1,54 @@
+"""Create the original single-home tables.
+
+Databases created by create_all before migrations existed already have
+these tables (at whatever later shape they were created); the following
+migrations bring them to the current schema.
+"""
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, JSON, MetaData, String, Table
+
+metadata = MetaData()
+
+rooms = Table(
+    "rooms", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, unique=True, nullable=False, index=True),
+    Column("beacon_id", String, unique=True, nullable=False, index=True),
+)
+
+calibration_windows = Table(
+    "calibration_windows", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("room_id", Integer, ForeignKey("rooms.id"), nullable=False),
+    Column("window_start", Integer, nullable=False),
+    Column("window_end", Integer, nullable=False),
+    Column("beacon_id", String, nullable=False, index=True),
+    Column("rssi_samples", JSON, nullable=False),
+    Index("idx_room_window", "room_id", "window_start"),
+    Index("idx_beacon_id", "beacon_id"),
+)
+
+centroids = Table(
+    "centroids", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("room_id", Integer, ForeignKey("rooms.id"), unique=True, nullable=False),
+    Column("mean_rssi", Float, nullable=False),
+    Column("updated_at", Integer, nullable=False),
+)
+
+location_events = Table(
+    "location_events", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("room_id", Integer, ForeignKey("rooms.id"), nullable=False),
+    Column("start_ts", Integer, nullable=False, index=True),
+    Column("end_ts", Integer, nullable=False),
+    Column("confidence", Float, nullable=False),
+    Index("idx_start_ts", "start_ts"),
+    Index("idx_room_start", "room_id", "start_ts"),
+)
+
+
+def upgrade(ctx):
+    if ctx.has_table("rooms"):
+        return
+    for table in (rooms, calibration_windows, centroids, location_events):
+        ctx.create_table(table)
@@ -0,0 +1,29 @@
+"""Scope rooms, calibration, centroids and events by home.
+
+Existing rows belong to the default home. New home-leading indexes are
+built before the single-home ones are dropped, so queries always have one.
+"""
+from sqlalchemy import Column, String
+
+DEFAULT_HOME_ID = "default"
+
+
+def upgrade(ctx):
+    for table in ("rooms", "calibration_windows", "centroids", "location_events"):
+        ctx.add_column(table, Column("home_id", String, nullable=False, server_default=DEFAULT_HOME_ID))
+    
+    # Room names and beacons become unique per home instead of globally
+    ctx.create_index("uq_room_home_name", "rooms", ["home_id", "name"], unique=True)
+    ctx.create_index("uq_room_home_beacon", "rooms", ["home_id", "beacon_id"], unique=True)
+    ctx.drop_index("ix_rooms_name")
+    ctx.drop_index("ix_rooms_beacon_id")
+    
+    ctx.create_index("idx_home_beacon", "calibration_windows", ["home_id", "beacon_id"])
+    ctx.drop_index("idx_beacon_id")
+    ctx.drop_index("ix_calibration_windows_beacon_id")
+    
+    ctx.create_index("idx_centroid_home", "centroids", ["home_id"])
+    
+    ctx.create_index("idx_home_start", "location_events", ["home_id", "start_ts"])
+    ctx.drop_index("idx_start_ts")
+    ctx.drop_index("ix_location_events_start_ts")
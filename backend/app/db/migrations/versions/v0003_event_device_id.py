@@ -0,0 +1,7 @@
+"""Record the device that produced each location event."""
+from sqlalchemy import Column, String
+
+
+def upgrade(ctx):
+    ctx.add_column("location_events", Column("device_id", String, nullable=True))
+    ctx.create_index("idx_device_start", "location_events", ["device_id", "start_ts"])
@@ -0,0 +1,23 @@
+"""Add per-day room dwell rollups kept after raw events expire."""
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+# Referenced by the foreign key
+Table("rooms", metadata, Column("id", Integer, primary_key=True))
+
+daily_rollups = Table(
+    "daily_rollups", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("home_id", String, nullable=False),
+    Column("device_id", String, nullable=True),
+    Column("date", String, nullable=False),
+    Column("room_id", Integer, ForeignKey("rooms.id"), nullable=False),
+    Column("duration", Integer, nullable=False),
+    Column("event_count", Integer, nullable=False),
+    Index("idx_rollup_home_date", "home_id", "date"),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(daily_rollups)
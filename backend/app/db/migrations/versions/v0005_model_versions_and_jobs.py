@@ -0,0 +1,34 @@
+"""Add the model version counter and persisted background jobs for multi-worker deployments."""
+from sqlalchemy import Column, Float, Index, Integer, JSON, MetaData, String, Table
+
+metadata = MetaData()
+
+model_versions = Table(
+    "model_versions", metadata,
+    Column("home_id", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", Integer, nullable=False),
+    Index("idx_model_version", "version"),
+)
+
+background_jobs = Table(
+    "background_jobs", metadata,
+    Column("id", String, primary_key=True),
+    Column("home_id", String, nullable=False),
+    Column("kind", String, nullable=False),
+    Column("params", JSON, nullable=False),
+    Column("status", String, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Column("started_at", Float, nullable=True),
+    Column("finished_at", Float, nullable=True),
+    Column("result", JSON, nullable=True),
+    Column("error", String, nullable=True),
+    Index("idx_job_home_created", "home_id", "created_at"),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(model_versions)
+    ctx.create_table(background_jobs)
+    # Schema fingerprint used by the startup check before migrations existed
+    ctx.execute("DELETE FROM schema_info WHERE name = 'fingerprint'")
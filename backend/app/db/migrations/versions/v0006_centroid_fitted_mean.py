@@ -0,0 +1,8 @@
+"""Keep each centroid's fitted mean next to its (online adapted) mean."""
+from sqlalchemy import Column, Float, Integer
+
+
+def upgrade(ctx):
+    ctx.add_column("centroids", Column("fitted_mean_rssi", Float, nullable=True))
+    ctx.add_column("centroids", Column("adapted_at", Integer, nullable=True))
+    ctx.backfill("centroids", "fitted_mean_rssi = mean_rssi", "fitted_mean_rssi IS NULL")
@@ -0,0 +1,30 @@
+"""Add the history of saved model snapshots and each home's active one."""
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, UniqueConstraint
+
+metadata = MetaData()
+
+model_snapshots = Table(
+    "model_snapshots", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("home_id", String, nullable=False),
+    Column("version", String, nullable=False),
+    Column("source", String, nullable=False),
+    Column("parent_version", String, nullable=True),
+    Column("beacons", Integer, nullable=False),
+    Column("created_at", Integer, nullable=False),
+    UniqueConstraint("home_id", "version", name="uq_model_snapshot_version"),
+    Index("idx_model_snapshot_home", "home_id", "id"),
+)
+
+active_models = Table(
+    "active_models", metadata,
+    Column("home_id", String, primary_key=True),
+    Column("version", String, nullable=False),
+    Column("previous_version", String, nullable=True),
+    Column("activated_at", Integer, nullable=False),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(model_snapshots)
+    ctx.create_table(active_models)
@@ -0,0 +1,39 @@
+"""Add chunked calibration upload sessions."""
+from sqlalchemy import (
+    Column, Float, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, UniqueConstraint
+)
+
+metadata = MetaData()
+
+calibration_sessions = Table(
+    "calibration_sessions", metadata,
+    Column("id", String, primary_key=True),
+    Column("home_id", String, nullable=False),
+    Column("beacon_id", String, nullable=False),
+    Column("room", String, nullable=False),
+    Column("window_start", Integer, nullable=False),
+    Column("created_at", Integer, nullable=False),
+    Column("updated_at", Integer, nullable=False),
+    Column("chunks", Integer, nullable=False),
+    Column("samples", Integer, nullable=False),
+    Column("mean_rssi", Float, nullable=True),
+    Column("m2", Float, nullable=True),
+    Column("min_rssi", Float, nullable=True),
+    Column("max_rssi", Float, nullable=True),
+    Index("idx_calibration_session_updated", "updated_at"),
+)
+
+calibration_chunks = Table(
+    "calibration_chunks", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("session_id", String, ForeignKey("calibration_sessions.id"), nullable=False),
+    Column("seq", Integer, nullable=False),
+    Column("samples", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    UniqueConstraint("session_id", "seq", name="uq_calibration_chunk_seq"),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(calibration_sessions)
+    ctx.create_table(calibration_chunks)
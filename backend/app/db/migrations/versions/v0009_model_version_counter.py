@@ -0,0 +1,19 @@
+"""Hand out model versions from a locked counter row."""
+from sqlalchemy import Column, Integer, MetaData, Table
+
+metadata = MetaData()
+
+model_version_counter = Table(
+    "model_version_counter", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(model_version_counter)
+    ctx.execute(
+        "INSERT INTO model_version_counter (id, version) "
+        "SELECT 1, COALESCE(MAX(version), 0) FROM model_versions "
+        "WHERE NOT EXISTS (SELECT 1 FROM model_version_counter)"
+    )
@@ -0,0 +1,14 @@
+"""Remember how far each home's events were merged by the retention job."""
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+merge_watermarks = Table(
+    "merge_watermarks", metadata,
+    Column("home_id", String, primary_key=True),
+    Column("merged_until", Integer, nullable=False),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(merge_watermarks)
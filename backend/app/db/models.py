@@ -1,24 +1,37 @@
-"""SQLAlchemy database models."""
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON, Index
+"""SQLAlchemy database models.
+
+Changing a table here needs a matching migration in app/db/migrations/versions.
+"""
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
+# Home used by clients that don't address a specific tenant
+DEFAULT_HOME_ID = "default"
+
 
 class Room(Base):
     """Room entity with associated beacon."""
     __tablename__ = "rooms"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, nullable=False, index=True)
-    beacon_id = Column(String, unique=True, nullable=False, index=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
+    name = Column(String, nullable=False)
+    beacon_id = Column(String, nullable=False)
     
     # Relationships
     calibration_windows = relationship("CalibrationWindow", back_populates="room", cascade="all, delete-orphan")
     centroid = relationship("Centroid", back_populates="room", uselist=False, cascade="all, delete-orphan")
     location_events = relationship("LocationEvent", back_populates="room", cascade="all, delete-orphan")
     
+    # Names and beacons are unique within a home (the constraints double as home-leading indexes)
+    __table_args__ = (
+        UniqueConstraint('home_id', 'name', name='uq_room_home_name'),
+        UniqueConstraint('home_id', 'beacon_id', name='uq_room_home_beacon'),
+    )
+    
     def __repr__(self):
-        return f"<Room(id={self.id}, name='{self.name}', beacon_id='{self.beacon_id}')>"
+        return f"<Room(id={self.id}, home_id='{self.home_id}', name='{self.name}', beacon_id='{self.beacon_id}')>"
 
 
 class CalibrationWindow(Base):
@@ -26,10 +39,11 @@ class CalibrationWindow(Base):
     __tablename__ = "calibration_windows"
     
     id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
     window_start = Column(Integer, nullable=False)  # Unix timestamp
     window_end = Column(Integer, nullable=False)    # Unix timestamp
-    beacon_id = Column(String, nullable=False, index=True)
+    beacon_id = Column(String, nullable=False)
     rssi_samples = Column(JSON, nullable=False)     # list[float] - raw RSSI values
     
     # Relationships
@@ -38,25 +52,76 @@ class CalibrationWindow(Base):
     # Indexes for querying
     __table_args__ = (
         Index('idx_room_window', 'room_id', 'window_start'),
-        Index('idx_beacon_id', 'beacon_id'),
+        Index('idx_home_beacon', 'home_id', 'beacon_id'),
     )
     
     def __repr__(self):
         return f"<CalibrationWindow(id={self.id}, room_id={self.room_id}, beacon_id='{self.beacon_id}')>"
 
 
+class CalibrationSession(Base):
+    """A calibration recording being uploaded in chunks, with running statistics."""
+    __tablename__ = "calibration_sessions"
+    
+    id = Column(String, primary_key=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
+    beacon_id = Column(String, nullable=False)
+    room = Column(String, nullable=False)
+    window_start = Column(Integer, nullable=False)   # Unix timestamp
+    created_at = Column(Integer, nullable=False)     # Unix timestamps
+    updated_at = Column(Integer, nullable=False)
+    chunks = Column(Integer, nullable=False, default=0)
+    samples = Column(Integer, nullable=False, default=0)
+    mean_rssi = Column(Float, nullable=True)         # Running mean (Welford)
+    m2 = Column(Float, nullable=True)                # Running sum of squared deviations from the mean
+    min_rssi = Column(Float, nullable=True)
+    max_rssi = Column(Float, nullable=True)
+    
+    __table_args__ = (
+        Index('idx_calibration_session_updated', 'updated_at'),
+    )
+    
+    def __repr__(self):
+        return f"<CalibrationSession(id='{self.id}', beacon_id='{self.beacon_id}', samples={self.samples})>"
+
+
+class CalibrationChunk(Base):
+    """Samples of one chunk of a calibration session, as little-endian float32."""
+    __tablename__ = "calibration_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("calibration_sessions.id"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    samples = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('session_id', 'seq', name='uq_calibration_chunk_seq'),
+    )
+    
+    def __repr__(self):
+        return f"<CalibrationChunk(session_id='{self.session_id}', seq={self.seq}, samples={self.samples})>"
+
+
 class Centroid(Base):
     """Centroid (mean RSSI) for a room's beacon."""
     __tablename__ = "centroids"
     
     id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
     room_id = Column(Integer, ForeignKey("rooms.id"), unique=True, nullable=False)
     mean_rssi = Column(Float, nullable=False)        # Single mean RSSI value
     updated_at = Column(Integer, nullable=False)     # Unix timestamp
+    fitted_mean_rssi = Column(Float, nullable=True)  # mean_rssi as of the last fit (before online adaptation)
+    adapted_at = Column(Integer, nullable=True)      # Last online adaptation since the fit, if any
     
     # Relationships
     room = relationship("Room", back_populates="centroid")
     
+    __table_args__ = (
+        Index('idx_centroid_home', 'home_id'),
+    )
+    
     def __repr__(self):
         return f"<Centroid(id={self.id}, room_id={self.room_id}, mean_rssi={self.mean_rssi})>"
 
@@ -66,19 +131,166 @@ class LocationEvent(Base):
     __tablename__ = "location_events"
     
     id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
-    start_ts = Column(Integer, nullable=False, index=True)  # Unix timestamp
-    end_ts = Column(Integer, nullable=False)                # Unix timestamp
+    device_id = Column(String, nullable=True)   # Phone/person that produced the event
+    start_ts = Column(Integer, nullable=False)  # Unix timestamp
+    end_ts = Column(Integer, nullable=False)    # Unix timestamp
     confidence = Column(Float, nullable=False)
     
     # Relationships
     room = relationship("Room", back_populates="location_events")
     
-    # Indexes for date range queries
+    # Indexes for per-home date range queries
     __table_args__ = (
-        Index('idx_start_ts', 'start_ts'),
+        Index('idx_home_start', 'home_id', 'start_ts'),
         Index('idx_room_start', 'room_id', 'start_ts'),
+        Index('idx_device_start', 'device_id', 'start_ts'),
     )
     
     def __repr__(self):
         return f"<LocationEvent(id={self.id}, room_id={self.room_id}, start_ts={self.start_ts})>"
+
+
+class DailyRollup(Base):
+    """Per-day dwell time in a room, kept after raw location events expire."""
+    __tablename__ = "daily_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
+    device_id = Column(String, nullable=True)
+    date = Column(String, nullable=False)            # YYYY-MM-DD (local time, like /insights/daily)
+    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
+    duration = Column(Integer, nullable=False)       # Seconds spent in the room
+    event_count = Column(Integer, nullable=False)    # Raw events folded into this row
+    
+    # Relationships
+    room = relationship("Room")
+    
+    __table_args__ = (
+        Index('idx_rollup_home_date', 'home_id', 'date'),
+    )
+    
+    def __repr__(self):
+        return f"<DailyRollup(id={self.id}, home_id='{self.home_id}', date='{self.date}', room_id={self.room_id})>"
+
+
+class MergeWatermark(Base):
+    """
+    How far the retention job merged a home's events.
+    
+    Events starting before `merged_until` were merged already, so each pass
+    only pages the events that arrived since the previous one.
+    """
+    __tablename__ = "merge_watermarks"
+    
+    home_id = Column(String, primary_key=True)
+    merged_until = Column(Integer, nullable=False)   # Unix timestamp
+    
+    def __repr__(self):
+        return f"<MergeWatermark(home_id='{self.home_id}', merged_until={self.merged_until})>"
+
+
+class ModelVersion(Base):
+    """
+    Change counter of a home's model (rooms, calibration, centroids).
+    
+    Versions come from one sequence shared by all homes, so a worker can
+    find every home changed since its last check with `version > last_seen`.
+    """
+    __tablename__ = "model_versions"
+    
+    home_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(Integer, nullable=False)     # Unix timestamp
+    
+    __table_args__ = (
+        Index('idx_model_version', 'version'),
+    )
+    
+    def __repr__(self):
+        return f"<ModelVersion(home_id='{self.home_id}', version={self.version})>"
+
+
+class ModelVersionCounter(Base):
+    """
+    The shared model version sequence (a single row, id 1).
+    
+    Bumps update this row first, so they hold its lock until they commit:
+    versions are committed in the order they are handed out.
+    """
+    __tablename__ = "model_version_counter"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<ModelVersionCounter(version={self.version})>"
+
+
+class ModelSnapshotRecord(Base):
+    """A saved model snapshot of a home; its content lives under MODEL_DIR/<home_id>/<version>."""
+    __tablename__ = "model_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
+    version = Column(String, nullable=False)         # ModelSnapshot.version (content hash)
+    source = Column(String, nullable=False)          # fit, adaptation or rollback
+    parent_version = Column(String, nullable=True)   # version that was active when it was saved
+    beacons = Column(Integer, nullable=False)
+    created_at = Column(Integer, nullable=False)     # Unix timestamp
+    
+    __table_args__ = (
+        UniqueConstraint('home_id', 'version', name='uq_model_snapshot_version'),
+        Index('idx_model_snapshot_home', 'home_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f"<ModelSnapshotRecord(home_id='{self.home_id}', version='{self.version}', source='{self.source}')>"
+
+
+class ActiveModel(Base):
+    """Pointer to the model snapshot a home serves, and the one it replaced."""
+    __tablename__ = "active_models"
+    
+    home_id = Column(String, primary_key=True)
+    version = Column(String, nullable=False)
+    previous_version = Column(String, nullable=True)
+    activated_at = Column(Integer, nullable=False)   # Unix timestamp
+    
+    def __repr__(self):
+        return f"<ActiveModel(home_id='{self.home_id}', version='{self.version}')>"
+
+
+class BackgroundJob(Base):
+    """Status and result of a background job, shared by all workers."""
+    __tablename__ = "background_jobs"
+    
+    id = Column(String, primary_key=True)
+    home_id = Column(String, nullable=False, default=DEFAULT_HOME_ID)
+    kind = Column(String, nullable=False)
+    params = Column(JSON, nullable=False)
+    status = Column(String, nullable=False)          # queued, running, succeeded or failed
+    created_at = Column(Float, nullable=False)       # Unix timestamps
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    
+    __table_args__ = (
+        Index('idx_job_home_created', 'home_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<BackgroundJob(id='{self.id}', kind='{self.kind}', status='{self.status}')>"
+
+
+class SchemaInfo(Base):
+    """Facts about the database schema: the applied migration version and the migration lock."""
+    __tablename__ = "schema_info"
+    
+    name = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    
+    def __repr__(self):
+        return f"<SchemaInfo(name='{self.name}', value='{self.value}')>"
@@ -1,7 +1,9 @@
 """Database session management."""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import get_settings
+from app.core.metrics import instrument_engine
+from app.core.profiling import instrument_engine_profiling
 
 settings = get_settings()
 
@@ -12,6 +14,27 @@ engine = create_engine(
     echo=False
 )
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+
+if settings.PROFILING_ENABLED:
+    instrument_engine_profiling(engine)
+
+if "sqlite" in settings.DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """
+        Let the retention job hand freed pages back to the OS (applies to newly
+        created databases), and let several worker processes share the file:
+        WAL lets readers run alongside the writer, and writers wait for the
+        lock instead of failing with "database is locked".
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA busy_timeout = 5000")
+        cursor.close()
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,9 +1,20 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 from app.api.router import api_router
 from app.core.config import get_settings
+from app.core.metrics import STARTUP_SECONDS, MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
 from app.db.init_db import init_db
+from app.services.inference_log import get_inference_log
+from app.services.jobs import shutdown_jobs
+from app.services.retention import retention_loop
+from app.services.snapshot import warm_snapshots
+import asyncio
+import importlib
 
 settings = get_settings()
 
@@ -23,17 +34,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, status and in-flight metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# On-demand and sampled request profiles
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        engine=settings.PROFILING_ENGINE,
+        token=settings.PROFILING_TOKEN,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+    )
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on application startup."""
+    """Initialize database and background jobs on application startup."""
+    started = time.perf_counter()
     init_db()
+    
+    if settings.RETENTION_INTERVAL_S > 0:
+        app.state.retention_task = asyncio.create_task(retention_loop(settings.RETENTION_INTERVAL_S))
+    
+    if settings.INFERENCE_LOG_ENABLED:
+        get_inference_log().start()
+    
+    if settings.SHADOW_CLASSIFIERS:
+        # Resolves the candidates, so a misspelled one fails startup
+        from app.services.shadow import get_shadow_evaluator
+        get_shadow_evaluator().start()
+    
+    STARTUP_SECONDS.labels("startup").set(time.perf_counter() - started)
+    
+    if settings.FAST_START:
+        # Runs once startup returns, while uvicorn binds the port and serves requests
+        app.state.warmup_task = asyncio.create_task(warm_up())
+
+
+async def warm_up():
+    """Build caches and import deferred modules off the event loop."""
+    started = time.perf_counter()
+    homes = await asyncio.to_thread(warm_snapshots, settings.WARMUP_HOMES) if settings.WARMUP_HOMES > 0 else 0
+    
+    # The LLM module (and httpx, when an API key is set) is otherwise imported by the first
+    # /suggest or insights request
+    await asyncio.to_thread(importlib.import_module, "app.services.llm")
+    if settings.LLM_API_KEY:
+        await asyncio.to_thread(importlib.import_module, "httpx")
+    # Likewise the tracker and RSSI filter (and numpy) on the first /infer using them
+    if settings.TRACKER_ENABLED:
+        await asyncio.to_thread(importlib.import_module, "app.services.tracker")
+    if settings.RSSI_FILTER != "none":
+        await asyncio.to_thread(importlib.import_module, "app.services.rssi_filter")
+    if settings.CLASSIFIER == "knn" and settings.WARMUP_HOMES > 0:
+        from app.services.fingerprint import warm_indexes
+        await asyncio.to_thread(warm_indexes, settings.WARMUP_HOMES)
+    
+    elapsed = time.perf_counter() - started
+    STARTUP_SECONDS.labels("warmup").set(elapsed)
+    print(f"✓ Warmed {homes} model snapshots ({elapsed * 1000:.1f} ms)")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered inference log records and stop background job and shadow workers."""
+    if settings.INFERENCE_LOG_ENABLED:
+        get_inference_log().stop()
+    if settings.SHADOW_CLASSIFIERS:
+        from app.services.shadow import get_shadow_evaluator
+        get_shadow_evaluator().stop()
+    shutdown_jobs()
 
 
 # Include API router
 app.include_router(api_router)
 
+STARTUP_SECONDS.labels("import").set(time.perf_counter() - _import_started)
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # An import string lets uvicorn start WORKERS processes that each import the app
+    uvicorn.run("app.main:app", host="0.0.0.0", port=settings.PORT, workers=settings.WORKERS)
@@ -1,15 +1,18 @@
 """Schemas for calibration data."""
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional
+from app.schemas.common import float32_samples
 
 
 class CalibrationWindow(BaseModel):
     """A single calibration window with raw RSSI samples for a beacon."""
     beacon_id: str
     room: str
-    rssi_samples: List[float]  # Raw RSSI values
+    rssi_samples: List[float]  # Raw RSSI values (or a float32 blob in MessagePack/CBOR bodies)
     window_start: int  # Unix timestamp
     window_end: int    # Unix timestamp
+    
+    decode_samples = field_validator("rssi_samples", mode="before")(float32_samples)
 
 
 class CalibrationUploadResponse(BaseModel):
@@ -17,3 +20,115 @@ class CalibrationUploadResponse(BaseModel):
     ok: bool
     beacon_id: str
     room: str
+
+
+class CalibrationScanBeacon(BaseModel):
+    """Samples of one beacon in a multi-beacon calibration scan."""
+    beacon_id: str
+    room: str
+    rssi_samples: List[float]  # Raw RSSI values (or a float32 blob in MessagePack/CBOR bodies)
+    
+    decode_samples = field_validator("rssi_samples", mode="before")(float32_samples)
+
+
+class CalibrationScan(BaseModel):
+    """Samples of several beacons recorded over the same window."""
+    window_start: int  # Unix timestamp
+    window_end: int    # Unix timestamp
+    beacons: List[CalibrationScanBeacon]
+
+
+class CalibrationBatch(BaseModel):
+    """Calibration windows and scans uploaded together."""
+    windows: List[CalibrationWindow] = []
+    scans: List[CalibrationScan] = []
+
+
+class CalibrationBatchResponse(BaseModel):
+    """Response after a batch calibration upload."""
+    ok: bool
+    windows: int                # Windows stored
+    replaced: int               # Previous windows of the uploaded beacons deleted
+    rooms: Dict[str, str]       # Room of each uploaded beacon
+    centroids: Optional[Dict[str, float]] = None  # Refitted means, with ?fit=true
+
+
+class CalibrationSessionOpen(BaseModel):
+    """Request to open a chunked calibration upload session."""
+    beacon_id: str
+    room: str
+    window_start: Optional[int] = None  # Unix timestamp (default: now)
+
+
+class CalibrationSessionOut(BaseModel):
+    """A calibration session with the running statistics of its samples."""
+    id: str
+    beacon_id: str
+    room: str
+    window_start: int
+    created_at: int
+    updated_at: int
+    chunks: int
+    samples: int
+    mean_rssi: Optional[float] = None
+    std_db: Optional[float] = None
+    min_rssi: Optional[float] = None
+    max_rssi: Optional[float] = None
+
+
+class CalibrationSessionClosed(CalibrationSessionOut):
+    """A closed calibration session and the windows it stored."""
+    ok: bool
+    windows: int    # Windows stored (one per chunk)
+    replaced: int   # Previous windows of the beacon deleted
+    centroids: Optional[Dict[str, float]] = None  # Refitted means, with ?fit=true
+
+
+class AdaptationState(BaseModel):
+    """Online adaptation state of a beacon's mean."""
+    beacon_id: str
+    room: str
+    mean_rssi: float         # Mean used for inference
+    fitted_mean_rssi: float  # Mean from the last fit
+    drift_db: float          # mean_rssi - fitted_mean_rssi
+    adapted_at: Optional[int] = None  # Unix timestamp of the last adaptation since the fit
+    pending_dwells: int      # Confirmed dwells waiting for the next update (this worker)
+
+
+class CalibrationHistogram(BaseModel):
+    """RSSI histogram of a beacon's calibration samples."""
+    start_db: float    # Lower edge of the first bin
+    bin_db: float      # Bin width
+    counts: List[int]  # Samples per bin
+
+
+class BeaconCalibrationStats(BaseModel):
+    """Calibration statistics of one beacon."""
+    beacon_id: str
+    room: str
+    samples: int
+    windows: int
+    mean_rssi: float
+    std_db: float
+    sample_rate_hz: Optional[float] = None  # Samples per second of window time
+    drift_db: float                         # Largest deviation of a quarter's mean from the mean
+    bimodality: Optional[float] = None      # Bimodality coefficient (> 0.555 suggests two modes)
+    histogram: CalibrationHistogram
+
+
+class CalibrationIssue(BaseModel):
+    """A problem found in the calibration data."""
+    severity: str  # "error" (rejects strict fits) or "warning"
+    kind: str      # too_few_samples, similar_levels, low_sample_rate, noisy, non_stationary, bimodal
+    beacon_id: Optional[str] = None
+    rooms: Optional[List[str]] = None  # Room pair, for similar_levels
+    message: str
+
+
+class CalibrationAnalysis(BaseModel):
+    """Calibration quality of a home."""
+    beacons: List[BeaconCalibrationStats]
+    rooms: List[str]                             # Room of each beacon, in the order of beacons
+    separability: List[List[Optional[float]]]    # d' between rooms (None on the diagonal)
+    overlap: List[List[Optional[float]]]         # Shared histogram mass between rooms
+    issues: List[CalibrationIssue]
@@ -1,6 +1,21 @@
 """Common schemas shared across endpoints."""
 from pydantic import BaseModel
-from typing import List
+from typing import Any, List, Optional
+import struct
+
+
+def float32_samples(value: Any) -> Any:
+    """
+    Accept RSSI samples as a little-endian float32 blob (MessagePack/CBOR bodies).
+    
+    Used as a `mode="before"` validator; anything else is validated as usual.
+    """
+    if not isinstance(value, (bytes, bytearray)):
+        return value
+    if len(value) % 4:
+        raise ValueError("float32 samples length is not a multiple of 4 bytes")
+    # float32 -> float would show representation noise (-63.2 as -63.20000076)
+    return [round(sample, 2) for sample in struct.unpack(f"<{len(value) // 4}f", value)]
 
 
 class BeaconReading(BaseModel):
@@ -12,3 +27,5 @@ class BeaconReading(BaseModel):
 class FeatureVector(BaseModel):
     """Feature vector with beacon readings for inference."""
     readings: List[BeaconReading]
+    device_id: Optional[str] = None  # Phone that scanned the readings (inference log, tracking)
+    ts: Optional[float] = None  # Scan time in Unix seconds for tracking (default: time of the request)
@@ -1,5 +1,6 @@
 """Schemas for location events."""
 from pydantic import BaseModel
+from typing import Optional
 
 
 class LocationEventIn(BaseModel):
@@ -8,6 +9,7 @@ class LocationEventIn(BaseModel):
     start_ts: int  # Unix timestamp
     end_ts: int    # Unix timestamp
     confidence: float
+    device_id: Optional[str] = None  # Phone/person that produced the event
 
 
 class LocationEventOut(BaseModel):
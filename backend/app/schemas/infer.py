@@ -1,8 +1,28 @@
 """Schemas for inference."""
+from typing import List, Optional
 from pydantic import BaseModel
+from app.schemas.common import FeatureVector
 
 
 class InferenceResult(BaseModel):
     """Result of room inference."""
     room: str
     confidence: float
+    raw_room: Optional[str] = None  # Per-scan classifier decision when the room is tracked
+
+
+class InferenceBatch(BaseModel):
+    """Several scans classified in one request, in order."""
+    scans: List[FeatureVector]
+
+
+class InferenceBatchResult(BaseModel):
+    """Results of a batch, one per scan."""
+    results: List[InferenceResult]
+
+
+class InferenceSlots(BaseModel):
+    """Beacon order of compact slot-array /infer requests for a model version."""
+    version: str        # Model version the slots belong to (send it back with the slots)
+    beacons: List[str]  # beacon_id of each slot
+    rooms: List[str]    # Room of each slot
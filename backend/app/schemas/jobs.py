@@ -0,0 +1,24 @@
+"""Schemas for background jobs."""
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+
+class JobOut(BaseModel):
+    """A background job and, once finished, its result or error."""
+    id: str
+    kind: str  # fit, insights, retention or export
+    home_id: str
+    params: Dict[str, Any]
+    status: str  # queued, running, succeeded or failed
+    created_at: float  # Unix timestamp
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+
+class ExportJobIn(BaseModel):
+    """Parameters of an export job."""
+    format: str = Field("parquet", pattern="^(parquet|arrow)$")
+    since: Optional[str] = None  # First day (YYYY-MM-DD)
+    until: Optional[str] = None  # Day after the last one (YYYY-MM-DD)
@@ -0,0 +1,47 @@
+"""Schemas for saved model versions."""
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+
+class ModelVersionOut(BaseModel):
+    """A saved model version of a home."""
+    version: str  # Content hash (means, rooms, parameters and kNN samples)
+    source: str  # fit or adaptation
+    parent_version: Optional[str] = None  # Version active when it was saved
+    beacons: int
+    created_at: int  # Unix timestamp
+    active: bool = False
+    previous: bool = False  # What POST /models/rollback would activate
+
+
+class ModelCentroid(BaseModel):
+    """A beacon of a saved model version."""
+    beacon_id: str
+    room: str
+    mean_rssi: float  # Mean used for inference
+    fitted_mean_rssi: float  # Mean from the fit (before online adaptation)
+
+
+class ModelVersionDetail(ModelVersionOut):
+    """A saved model version with its content."""
+    params: Dict[str, Any]  # Classifier and its parameters
+    centroids: List[ModelCentroid]
+
+
+class BeaconChange(BaseModel):
+    """A beacon whose room or mean differs between two model versions."""
+    beacon_id: str
+    room: Optional[str] = None  # None: not in this version
+    against_room: Optional[str] = None
+    mean_rssi: Optional[float] = None
+    against_mean_rssi: Optional[float] = None
+    delta_db: Optional[float] = None  # mean_rssi - against_mean_rssi
+
+
+class ModelDiff(BaseModel):
+    """Differences of a model version from another one."""
+    version: str
+    against: str
+    params: Dict[str, List[Any]]  # Changed parameters: name -> [against, version]
+    beacons: List[BeaconChange]
+    max_delta_db: float
@@ -0,0 +1,26 @@
+"""Schemas for shadow classifier evaluation."""
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class ClassifierStats(BaseModel):
+    """Decisions of the served classifier or a shadow candidate for a home."""
+    candidate: str  # "served" or the candidate spec
+    requests: int
+    agreement_rate: Optional[float] = None  # Fraction of decisions picking the served room
+    errors: int  # Candidate raised an exception
+    skipped: int  # Candidate couldn't classify (e.g. knn without an index for the model)
+    confidence_mean: Optional[float] = None
+    confidence_histogram: List[int]  # Counts per 0.1-wide confidence bin
+    latency_mean_us: Optional[float] = None  # Over the last SHADOW_WINDOW decisions
+    latency_p50_us: Optional[float] = None
+    latency_p95_us: Optional[float] = None
+
+
+class ShadowReport(BaseModel):
+    """Shadow evaluation statistics of a home (this worker's share of the traffic)."""
+    enabled: bool
+    sample_rate: float
+    dropped: int  # Requests not evaluated because the queue was full (all homes)
+    served: ClassifierStats
+    candidates: List[ClassifierStats]
@@ -0,0 +1,242 @@
+"""Online adaptation of beacon means from confirmed dwells.
+
+BLE signal strength drifts over days (batteries age, furniture moves), so a
+fitted mean slowly stops matching what phones measure in the room. With
+ADAPTATION_ENABLED the means follow that drift between calibrations:
+
+1. /infer collects, per device, the raw reading of the winning beacon of
+   every decision, as runs of consecutive decisions for the same beacon
+   (count and sum only). Readings aren't filtered by the decision's
+   confidence: it falls with the distance from the current mean, so
+   gating on it would keep exactly the readings that agree with the old
+   mean and the mean could never follow the drift.
+2. A location event of that device for the room lasting ADAPT_MIN_DWELL_S
+   with confidence >= ADAPT_MIN_CONFIDENCE confirms the runs inside it: if
+   they hold ADAPT_MIN_READINGS readings, their mean is one observation of
+   where the beacon's mean really is.
+3. Every ADAPT_INTERVAL_S per home, the observations are folded into the
+   beacon's mean as an exponentially decayed update: each confirmed dwell
+   moves the mean by ADAPT_RATE of the way towards its observation, so older
+   dwells (and the fit itself) lose weight geometrically.
+
+Guard rails: observations further than ADAPT_MAX_DRIFT_DB from the fitted
+mean are discarded (that's not drift, the room or beacon changed: recalibrate),
+one update moves a mean by at most ADAPT_MAX_STEP_DB, and a mean never leaves
+the fitted mean by more than ADAPT_MAX_DRIFT_DB. The fitted means are kept,
+so POST /calibration/adaptation/rollback restores the last fit, and the next
+fit starts over from its own means. Every update is saved as a new model
+version (see services/model_store.py), so it can also be undone with
+POST /models/rollback.
+
+Runs and pending observations live in the process that saw them, so with
+several workers a dwell only counts readings that reached the worker that
+received its event. Updates are batched per ADAPT_INTERVAL_S because every
+update is a model change (snapshots rebuild, tracker and RSSI filter state of
+the home's devices restart). The kNN classifier is fitted on the samples
+themselves and isn't adapted.
+"""
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Deque, Dict, List, Optional, Tuple
+import time
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.core.metrics import ADAPTATION_OBSERVATIONS
+from app.db import crud
+from app.schemas.common import BeaconReading
+from app.services.model_store import save_model
+
+settings = get_settings()
+
+# Recent runs kept per device (a dwell is usually one run, a flickering one a few)
+RUNS_PER_DEVICE = 32
+
+# Decisions for the same beacon further apart than this start a new run
+RUN_MAX_GAP_S = 60
+
+# Runs may start/end this many seconds outside the event they belong to
+EVENT_SLACK_S = 30
+
+
+class _Run:
+    __slots__ = ("beacon_id", "start_ts", "end_ts", "count", "total")
+    
+    def __init__(self, beacon_id: str, ts: float, rssi: float):
+        self.beacon_id = beacon_id
+        self.start_ts = ts
+        self.end_ts = ts
+        self.count = 1
+        self.total = rssi
+
+
+class Adaptation:
+    """Recent readings per device and confirmed observations per home awaiting the next update."""
+    
+    def __init__(self, max_devices: int):
+        self.max_devices = max_devices
+        self._runs: "OrderedDict[Tuple[str, str], Deque[_Run]]" = OrderedDict()
+        # home_id -> beacon_id -> observed means of confirmed dwells
+        self._pending: Dict[str, Dict[str, List[float]]] = {}
+        self._flushed_at: Dict[str, float] = {}
+        self._lock = Lock()
+    
+    def observe(
+        self,
+        home_id: str,
+        device_id: str,
+        beacon_id: str,
+        readings: List[BeaconReading],
+        ts: Optional[float] = None
+    ) -> None:
+        """Record an /infer decision: the winning beacon's reading."""
+        rssi = next((reading.rssi for reading in reversed(readings) if reading.beacon_id == beacon_id), None)
+        if rssi is None:
+            return
+        ts = time.time() if ts is None else ts
+        key = (home_id, device_id)
+        
+        with self._lock:
+            runs = self._runs.get(key)
+            if runs is None:
+                runs = self._runs[key] = deque(maxlen=RUNS_PER_DEVICE)
+                while len(self._runs) > self.max_devices:
+                    self._runs.popitem(last=False)
+            self._runs.move_to_end(key)
+            
+            last = runs[-1] if runs else None
+            if last is not None and last.beacon_id == beacon_id and 0 <= ts - last.end_ts <= RUN_MAX_GAP_S:
+                last.end_ts = ts
+                last.count += 1
+                last.total += rssi
+            else:
+                runs.append(_Run(beacon_id, ts, rssi))
+    
+    def confirm(
+        self,
+        db: Session,
+        home_id: str,
+        device_id: str,
+        beacon_id: str,
+        start_ts: int,
+        end_ts: int,
+        confidence: float
+    ) -> bool:
+        """
+        Confirm a device's readings with one of its location events.
+        
+        Args:
+            db: Database session
+            home_id: Home the event belongs to
+            device_id: Device that reported the event
+            beacon_id: Beacon of the event's room
+            start_ts: Event start (Unix seconds)
+            end_ts: Event end (Unix seconds)
+            confidence: Event confidence
+        
+        Returns:
+            Whether the dwell became an observation
+        """
+        if confidence < settings.ADAPT_MIN_CONFIDENCE or end_ts - start_ts < settings.ADAPT_MIN_DWELL_S:
+            return False
+        
+        with self._lock:
+            runs = self._runs.get((home_id, device_id))
+            inside = [
+                run for run in (runs or ())
+                if run.beacon_id == beacon_id
+                and run.start_ts >= start_ts - EVENT_SLACK_S
+                and run.end_ts <= end_ts + EVENT_SLACK_S
+            ]
+            for run in inside:
+                # Each run confirms at most one dwell
+                runs.remove(run)
+            count = sum(run.count for run in inside)
+        
+        if count < settings.ADAPT_MIN_READINGS:
+            ADAPTATION_OBSERVATIONS.labels("too_few_readings").inc()
+            return False
+        observed = sum(run.total for run in inside) / count
+        
+        with self._lock:
+            self._pending.setdefault(home_id, {}).setdefault(beacon_id, []).append(observed)
+            flushed_at = self._flushed_at.setdefault(home_id, time.monotonic())
+        ADAPTATION_OBSERVATIONS.labels("confirmed").inc()
+        
+        if time.monotonic() - flushed_at >= settings.ADAPT_INTERVAL_S:
+            self.flush(db, home_id)
+        return True
+    
+    def pending(self, home_id: str) -> Dict[str, int]:
+        """Confirmed dwells per beacon waiting for the next update."""
+        with self._lock:
+            return {beacon_id: len(observed) for beacon_id, observed in self._pending.get(home_id, {}).items()}
+    
+    def flush(self, db: Session, home_id: str) -> Dict[str, float]:
+        """
+        Fold a home's pending observations into its beacon means.
+        
+        Args:
+            db: Database session
+            home_id: Home to update
+        
+        Returns:
+            Dictionary mapping beacon_id to its new mean (beacons that moved)
+        """
+        with self._lock:
+            pending = self._pending.pop(home_id, {})
+            self._flushed_at[home_id] = time.monotonic()
+        if not pending:
+            return {}
+        
+        means = {}
+        for beacon_id, _, mean_rssi, fitted_mean, _ in crud.get_adaptation_rows(db, home_id):
+            observed = pending.get(beacon_id)
+            if not observed:
+                continue
+            # Dwells that look nothing like the fit aren't drift: ignore them
+            observed = [value for value in observed if abs(value - fitted_mean) <= settings.ADAPT_MAX_DRIFT_DB]
+            ADAPTATION_OBSERVATIONS.labels("beyond_drift_limit").inc(len(pending[beacon_id]) - len(observed))
+            if not observed:
+                continue
+            
+            # Each dwell moves the mean ADAPT_RATE of the way to what it observed
+            mean = mean_rssi
+            for value in observed:
+                mean += settings.ADAPT_RATE * (value - mean)
+            step = max(-settings.ADAPT_MAX_STEP_DB, min(settings.ADAPT_MAX_STEP_DB, mean - mean_rssi))
+            mean = mean_rssi + step
+            mean = max(fitted_mean - settings.ADAPT_MAX_DRIFT_DB, min(fitted_mean + settings.ADAPT_MAX_DRIFT_DB, mean))
+            if abs(mean - mean_rssi) >= 0.01:
+                means[beacon_id] = round(mean, 2)
+        
+        if means:
+            crud.update_adapted_means(db, home_id, means)
+            save_model(db, home_id, "adaptation")
+            ADAPTATION_OBSERVATIONS.labels("applied").inc(sum(len(pending[beacon_id]) for beacon_id in means))
+        return means
+    
+    def rollback(self, db: Session, home_id: str) -> int:
+        """
+        Restore a home's fitted means and drop its pending observations.
+        
+        Returns:
+            Number of beacons restored
+        """
+        with self._lock:
+            self._pending.pop(home_id, None)
+        restored = crud.reset_adapted_means(db, home_id)
+        if restored:
+            # Same content as the fit, so its saved version is activated again
+            save_model(db, home_id, "fit")
+        return restored
+
+
+_adaptation: Optional[Adaptation] = None
+
+
+def get_adaptation() -> Adaptation:
+    """Get the process-wide adaptation state."""
+    global _adaptation
+    if _adaptation is None:
+        _adaptation = Adaptation(settings.ADAPT_MAX_DEVICES)
+    return _adaptation
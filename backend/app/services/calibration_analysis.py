@@ -0,0 +1,244 @@
+"""Quality analysis of a home's calibration windows.
+
+Uploads accept any non-empty sample list, so short, noisy, drifting or
+bimodal calibrations, and rooms whose fingerprints overlap, used to surface
+only as bad inference. The analysis computes per beacon (all windows pooled,
+in time order):
+
+- samples, mean, standard deviation and sample rate (samples per second of
+  window time)
+- drift: the largest deviation of the mean of a quarter of the samples from
+  the overall mean (a stationary calibration stays near 0 dB)
+- bimodality coefficient from skewness and kurtosis (above 0.555 suggests
+  two modes, e.g. a door open and closed)
+- a histogram in HISTOGRAM_BIN_DB bins
+
+and between every pair of rooms the separability d' = |mean difference| /
+RMS of the standard deviations (how many spreads apart the fingerprints are)
+and the overlap of their histograms. These compare each room's own beacon
+levels, which the nearest-centroid classifier never confuses (a reading is
+only compared with its own beacon's mean), so pairs closer than
+CALIBRATION_MIN_SEPARATION are informational warnings, never errors.
+Incremental fits analyze only the refitted beacons, so their pairwise checks
+skip pairs with the other beacons.
+
+Everything is computed with a handful of array operations over all samples
+of the home at once (bincount by beacon, segment and bin), so an analysis
+costs about as much as reading the windows. Fits run it on the windows they
+read and count the issues found (homesense_calibration_issues_total); with
+CALIBRATION_STRICT a fit with errors is rejected and the active model stays.
+"""
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.core.metrics import CALIBRATION_ISSUES
+from app.db import crud
+from app.services.centroid import CalibrationRejected
+
+settings = get_settings()
+
+# Histogram range and bin width (dB); samples outside are counted in the edge bins
+HISTOGRAM_MIN_DB = -110.0
+HISTOGRAM_MAX_DB = -20.0
+HISTOGRAM_BIN_DB = 2.0
+
+# Parts of a beacon's samples compared for drift
+DRIFT_SEGMENTS = 4
+
+# Bimodality coefficient of a uniform distribution; above it suggests two modes
+BIMODALITY_THRESHOLD = 0.555
+
+# (beacon_id, room_name, window_start, window_end, rssi_samples)
+WindowRow = Tuple[str, str, int, int, Sequence[float]]
+
+
+def analyze_windows(windows: List[WindowRow]) -> Dict:
+    """
+    Analyze calibration windows (see the module docstring).
+    
+    Pure function of its input so it can run in a worker process.
+    
+    Args:
+        windows: Window rows in time order
+    
+    Returns:
+        Dictionary with "beacons" (stats per beacon), "rooms" and the
+        "separability" and "overlap" matrices in that order, and "issues"
+    """
+    windows = [window for window in windows if len(window[4])]
+    beacons = sorted({window[0] for window in windows})
+    if not beacons:
+        return {"beacons": [], "rooms": [], "separability": [], "overlap": [], "issues": []}
+    rooms = {window[0]: window[1] for window in windows}
+    code_of = {beacon_id: i for i, beacon_id in enumerate(beacons)}
+    n_beacons = len(beacons)
+    
+    # One flat array of every sample, with its beacon's code
+    lengths = np.array([len(window[4]) for window in windows], dtype=np.intp)
+    window_codes = np.array([code_of[window[0]] for window in windows], dtype=np.intp)
+    values = np.fromiter(chain.from_iterable(window[4] for window in windows), dtype=np.float64, count=lengths.sum())
+    codes = np.repeat(window_codes, lengths)
+    # Group by beacon, keeping time order within each
+    order = np.argsort(codes, kind="stable")
+    values, codes = values[order], codes[order]
+    
+    counts = np.bincount(codes, minlength=n_beacons).astype(np.float64)
+    means = np.bincount(codes, weights=values, minlength=n_beacons) / counts
+    centered = values - means[codes]
+    m2 = np.bincount(codes, weights=centered ** 2, minlength=n_beacons) / counts
+    m3 = np.bincount(codes, weights=centered ** 3, minlength=n_beacons) / counts
+    m4 = np.bincount(codes, weights=centered ** 4, minlength=n_beacons) / counts
+    std = np.sqrt(m2 * counts / np.maximum(counts - 1, 1))
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skewness = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+        kurtosis = np.where(m2 > 0, m4 / m2 ** 2 - 3.0, 0.0)
+        small_sample = 3.0 * (counts - 1) ** 2 / ((counts - 2) * (counts - 3))
+        bimodality = np.where(counts > 3, (skewness ** 2 + 1) / (kurtosis + small_sample), np.nan)
+    
+    durations = np.bincount(
+        window_codes, weights=[window[3] - window[2] for window in windows], minlength=n_beacons
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.where(durations > 0, counts / durations, np.nan)
+    
+    # Drift: means of consecutive quarters of each beacon's samples
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+    positions = np.arange(len(values)) - starts[codes]
+    segments = np.minimum(positions * DRIFT_SEGMENTS // counts[codes].astype(np.intp), DRIFT_SEGMENTS - 1)
+    segment_keys = codes * DRIFT_SEGMENTS + segments
+    segment_counts = np.bincount(segment_keys, minlength=n_beacons * DRIFT_SEGMENTS).reshape(n_beacons, -1)
+    segment_sums = np.bincount(segment_keys, weights=values, minlength=n_beacons * DRIFT_SEGMENTS).reshape(n_beacons, -1)
+    with np.errstate(invalid="ignore"):
+        segment_means = segment_sums / segment_counts
+    drift = np.nanmax(np.abs(segment_means - means[:, None]), axis=1)
+    
+    n_bins = int((HISTOGRAM_MAX_DB - HISTOGRAM_MIN_DB) / HISTOGRAM_BIN_DB)
+    bins = np.clip(((values - HISTOGRAM_MIN_DB) / HISTOGRAM_BIN_DB).astype(np.intp), 0, n_bins - 1)
+    histograms = np.bincount(codes * n_bins + bins, minlength=n_beacons * n_bins).reshape(n_beacons, n_bins)
+    
+    # Pairwise: spreads apart, and shared probability mass of the histograms
+    difference = np.abs(means[:, None] - means[None, :])
+    spread = np.sqrt((std[:, None] ** 2 + std[None, :] ** 2) / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Identical zero-spread samples are 0 spreads apart, distinct ones infinitely many
+        separability = np.where(spread > 0, difference / spread, np.where(difference > 0, np.inf, 0.0))
+    densities = histograms / counts[:, None]
+    overlap = np.minimum(densities[:, None, :], densities[None, :, :]).sum(axis=2)
+    
+    stats = []
+    for i, beacon_id in enumerate(beacons):
+        nonzero = np.flatnonzero(histograms[i])
+        first, last = int(nonzero[0]), int(nonzero[-1])
+        stats.append({
+            "beacon_id": beacon_id,
+            "room": rooms[beacon_id],
+            "samples": int(counts[i]),
+            "windows": int((window_codes == i).sum()),
+            "mean_rssi": round(float(means[i]), 2),
+            "std_db": round(float(std[i]), 2),
+            "sample_rate_hz": None if np.isnan(rates[i]) else round(float(rates[i]), 3),
+            "drift_db": round(float(drift[i]), 2),
+            "bimodality": None if np.isnan(bimodality[i]) else round(float(bimodality[i]), 3),
+            "histogram": {
+                "start_db": HISTOGRAM_MIN_DB + first * HISTOGRAM_BIN_DB,
+                "bin_db": HISTOGRAM_BIN_DB,
+                "counts": histograms[i, first:last + 1].tolist(),
+            },
+        })
+    
+    room_names = [rooms[beacon_id] for beacon_id in beacons]
+    separability_rows = [
+        [None if i == j else round(float(separability[i, j]), 2) if np.isfinite(separability[i, j]) else None
+         for j in range(n_beacons)]
+        for i in range(n_beacons)
+    ]
+    overlap_rows = [
+        [None if i == j else round(float(overlap[i, j]), 3) for j in range(n_beacons)] for i in range(n_beacons)
+    ]
+    return {
+        "beacons": stats,
+        "rooms": room_names,
+        "separability": separability_rows,
+        "overlap": overlap_rows,
+        "issues": find_issues(stats, room_names, separability),
+    }
+
+
+def find_issues(stats: List[Dict], rooms: List[str], separability: np.ndarray) -> List[Dict]:
+    """Flag beacons and room pairs outside the CALIBRATION_* limits."""
+    issues = []
+    
+    def add(severity: str, kind: str, message: str, beacon_id: Optional[str] = None,
+            room_pair: Optional[List[str]] = None) -> None:
+        issues.append({
+            "severity": severity, "kind": kind, "beacon_id": beacon_id, "rooms": room_pair, "message": message,
+        })
+    
+    for beacon in stats:
+        label = f"{beacon['room']} ({beacon['beacon_id']})"
+        if beacon["samples"] < settings.CALIBRATION_MIN_SAMPLES:
+            add("error", "too_few_samples",
+                f"{label}: {beacon['samples']} samples, need {settings.CALIBRATION_MIN_SAMPLES}", beacon["beacon_id"])
+        if beacon["sample_rate_hz"] is not None and beacon["sample_rate_hz"] < settings.CALIBRATION_MIN_SAMPLE_RATE_HZ:
+            add("warning", "low_sample_rate",
+                f"{label}: {beacon['sample_rate_hz']} samples/s, expected {settings.CALIBRATION_MIN_SAMPLE_RATE_HZ}",
+                beacon["beacon_id"])
+        if beacon["std_db"] > settings.CALIBRATION_MAX_STD_DB:
+            add("warning", "noisy", f"{label}: spread {beacon['std_db']} dB", beacon["beacon_id"])
+        if beacon["drift_db"] > settings.CALIBRATION_MAX_DRIFT_DB:
+            add("warning", "non_stationary",
+                f"{label}: mean moves {beacon['drift_db']} dB during calibration", beacon["beacon_id"])
+        if beacon["bimodality"] is not None and beacon["bimodality"] > BIMODALITY_THRESHOLD:
+            add("warning", "bimodal", f"{label}: samples look bimodal ({beacon['bimodality']})", beacon["beacon_id"])
+    
+    close_i, close_j = np.nonzero(np.triu(separability < settings.CALIBRATION_MIN_SEPARATION, k=1))
+    for i, j in zip(close_i.tolist(), close_j.tolist()):
+        add("warning", "similar_levels",
+            f"{rooms[i]} and {rooms[j]} read their beacons {separability[i, j]:.2f} spreads apart "
+            f"(below {settings.CALIBRATION_MIN_SEPARATION}; informational)", room_pair=[rooms[i], rooms[j]])
+    return issues
+
+
+def check_calibration(home_id: str, analysis: Dict) -> None:
+    """
+    Report the issues a fit's calibration analysis found.
+    
+    Args:
+        home_id: Home that was fitted
+        analysis: Analysis as returned by analyze_windows
+    
+    Raises:
+        CalibrationRejected: With CALIBRATION_STRICT, if any issue is an error
+    """
+    issues = analysis["issues"]
+    for issue in issues:
+        CALIBRATION_ISSUES.labels(issue["kind"], issue["severity"]).inc()
+    if not issues:
+        return
+    errors = sum(issue["severity"] == "error" for issue in issues)
+    print(f"Calibration of home '{home_id}': {errors} errors, {len(issues) - errors} warnings "
+          f"(GET /calibration/analysis)")
+    if errors and settings.CALIBRATION_STRICT:
+        raise CalibrationRejected(analysis)
+
+
+def analyze_calibration(db: Session, home_id: str) -> Dict:
+    """
+    Analyze a home's current calibration windows.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+    
+    Returns:
+        Analysis as returned by analyze_windows
+    """
+    windows = [
+        (beacon_id, room_name, window_start, window_end, rssi_samples)
+        for _, _, room_name, beacon_id, window_start, window_end, rssi_samples
+        in crud.iter_calibration_window_rows(db, home_id)
+    ]
+    return analyze_windows(windows)
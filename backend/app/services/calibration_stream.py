@@ -0,0 +1,207 @@
+"""Chunked upload of long calibration recordings.
+
+A CalibrationWindow carries its whole sample list in one JSON body, which is
+parsed into Python floats before anything is stored, so a long high-rate
+recording spikes memory and latency. A calibration session instead takes the
+recording in chunks (POST /calibration/sessions/{id}/chunks), each in a
+compact encoding chosen by its Content-Type:
+
+- application/octet-stream: little-endian float32 samples
+- application/x-int8: one signed byte per sample (whole dBm)
+- application/x-ndjson: one number, or a JSON array of numbers, per line
+
+Each chunk is stored as a float32 blob and folded into the session's running
+mean, M2 (sum of squared deviations), min and max with the parallel Welford
+update, so statistics are available after every chunk without revisiting
+earlier ones. Closing the session turns each chunk into a calibration window
+(their time spans split the session's in proportion to their samples) and
+replaces the beacon's previous windows in one transaction, reading the chunks
+back one at a time: memory is bounded by CALIBRATION_CHUNK_MAX_BYTES whatever
+the recording's length. Sessions not updated for CALIBRATION_SESSION_TTL_S
+are deleted by the retention job.
+
+Chunks of one session should be sent one after another; concurrent appends
+to the same session can lose a statistics update.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+import time
+import uuid
+import numpy as np
+import orjson
+from sqlalchemy.orm import Session
+from app.db import crud, models
+
+FLOAT32 = "application/octet-stream"
+INT8 = "application/x-int8"
+NDJSON = "application/x-ndjson"
+CHUNK_TYPES = (FLOAT32, INT8, NDJSON)
+
+
+def decode_chunk(body: bytes, content_type: str) -> np.ndarray:
+    """
+    Decode a chunk body into float32 samples.
+    
+    Args:
+        body: Request body
+        content_type: Its media type (one of CHUNK_TYPES)
+    
+    Returns:
+        Samples as a float32 array
+    
+    Raises:
+        ValueError: If the body is malformed or holds non-finite samples
+    """
+    if content_type == FLOAT32:
+        if len(body) % 4:
+            raise ValueError("float32 chunk length is not a multiple of 4 bytes")
+        values = np.frombuffer(body, dtype="<f4")
+    elif content_type == INT8:
+        values = np.frombuffer(body, dtype=np.int8).astype(np.float32)
+    elif content_type == NDJSON:
+        parts = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                value = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                raise ValueError(f"Invalid NDJSON line: {e}")
+            parts.append(value if isinstance(value, list) else [value])
+        try:
+            values = np.array([sample for part in parts for sample in part], dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("NDJSON lines must be numbers or arrays of numbers")
+    else:
+        raise ValueError(f"Unsupported chunk type '{content_type}' (use one of {', '.join(CHUNK_TYPES)})")
+    if not np.isfinite(values).all():
+        raise ValueError("Chunk holds non-finite samples")
+    return values
+
+
+def merge_stats(
+    count: int,
+    mean: Optional[float],
+    m2: Optional[float],
+    values: np.ndarray
+) -> Tuple[float, float]:
+    """
+    Fold a chunk into running statistics (parallel Welford / Chan et al.).
+    
+    Args:
+        count: Samples seen before the chunk
+        mean: Their mean (None if count is 0)
+        m2: Their sum of squared deviations from the mean
+        values: The chunk's samples (non-empty)
+    
+    Returns:
+        Tuple of (mean, m2) over all samples
+    """
+    values = values.astype(np.float64)
+    chunk_mean = float(values.mean())
+    chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+    if not count:
+        return chunk_mean, chunk_m2
+    total = count + len(values)
+    delta = chunk_mean - mean
+    return mean + delta * len(values) / total, m2 + chunk_m2 + delta * delta * count * len(values) / total
+
+
+def open_session(
+    db: Session,
+    home_id: str,
+    beacon_id: str,
+    room: str,
+    window_start: Optional[int] = None
+) -> models.CalibrationSession:
+    """Open a calibration session (window_start defaults to now)."""
+    window_start = int(time.time()) if window_start is None else window_start
+    return crud.create_calibration_session(db, home_id, uuid.uuid4().hex, beacon_id, room, window_start)
+
+
+def append_chunk(
+    db: Session,
+    session: models.CalibrationSession,
+    body: bytes,
+    content_type: str
+) -> models.CalibrationSession:
+    """
+    Decode a chunk, store it and update the session's statistics.
+    
+    Raises:
+        ValueError: If the chunk is malformed or empty
+    """
+    values = decode_chunk(body, content_type)
+    if not len(values):
+        raise ValueError("Chunk holds no samples")
+    mean, m2 = merge_stats(session.samples, session.mean_rssi, session.m2, values)
+    low, high = float(values.min()), float(values.max())
+    if session.samples:
+        low, high = min(low, session.min_rssi), max(high, session.max_rssi)
+    return crud.add_calibration_chunk(
+        db, session, values.astype("<f4").tobytes(), len(values), (mean, m2, low, high)
+    )
+
+
+def _chunk_windows(
+    db: Session,
+    session: models.CalibrationSession,
+    window_end: int
+) -> Iterator[Tuple[int, int, List[float]]]:
+    """The session's chunks as windows splitting [window_start, window_end] by sample count."""
+    span = window_end - session.window_start
+    offset = 0
+    for samples, data in crud.iter_calibration_chunks(db, session.id):
+        start = session.window_start + span * offset // session.samples
+        offset += samples
+        end = session.window_start + span * offset // session.samples
+        # float32 -> float64 would show representation noise (-63.2 as -63.20000076)
+        yield start, end, np.round(np.frombuffer(data, dtype="<f4").astype(np.float64), 2).tolist()
+
+
+def close_session(
+    db: Session,
+    session: models.CalibrationSession,
+    window_end: Optional[int] = None
+) -> Tuple[models.Room, int, int]:
+    """
+    Store a session's samples as the beacon's calibration windows and delete the session.
+    
+    Args:
+        db: Database session
+        session: Calibration session with at least one chunk
+        window_end: End of the recording (default: now)
+    
+    Returns:
+        Tuple of (room, count of replaced windows, count of created windows)
+    
+    Raises:
+        ValueError: If the session has no samples or ends before it starts
+        IntegrityError: If the room name is already assigned another beacon
+    """
+    window_end = int(time.time()) if window_end is None else window_end
+    if not session.samples:
+        raise ValueError("No RSSI samples uploaded")
+    if window_end < session.window_start:
+        raise ValueError("window_end is before the session's window_start")
+    return crud.commit_calibration_session(db, session, _chunk_windows(db, session, window_end))
+
+
+def session_out(session: models.CalibrationSession) -> Dict:
+    """A session as CalibrationSessionOut fields."""
+    std = None
+    if session.samples > 1:
+        std = round(float(np.sqrt(session.m2 / (session.samples - 1))), 3)
+    return {
+        "id": session.id,
+        "beacon_id": session.beacon_id,
+        "room": session.room,
+        "window_start": session.window_start,
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+        "chunks": session.chunks,
+        "samples": session.samples,
+        "mean_rssi": session.mean_rssi,
+        "std_db": std,
+        "min_rssi": session.min_rssi,
+        "max_rssi": session.max_rssi,
+    }
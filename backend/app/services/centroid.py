@@ -1,24 +1,86 @@
 """Centroid calculation service."""
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from typing import Any, Callable, Collection, Dict, List, Optional
+from app.core.config import get_settings
 from app.db import crud, models
+from app.services.snapshot import get_snapshot
 
+settings = get_settings()
 
-def fit_centroids(db: Session) -> Dict[str, float]:
+
+class CalibrationRejected(ValueError):
+    """
+    A fit was refused because its calibration has errors (CALIBRATION_STRICT).
+    
+    Defined here rather than in services/calibration_analysis.py so routes can
+    catch it without loading numpy at startup.
+    """
+    
+    def __init__(self, analysis: Dict):
+        self.analysis = analysis
+        errors = [issue["message"] for issue in analysis["issues"] if issue["severity"] == "error"]
+        super().__init__("Calibration rejected: " + "; ".join(errors))
+
+
+def compute_centroid_means(samples_by_beacon: Dict[str, List[float]]) -> Dict[str, float]:
+    """
+    Compute the mean RSSI of each beacon's calibration samples.
+    
+    Pure function of its input so it can run in a worker process.
+    
+    Args:
+        samples_by_beacon: Dictionary mapping beacon_id to all its RSSI samples
+        
+    Returns:
+        Dictionary mapping beacon_id to mean RSSI value (beacons without samples are skipped)
+    """
+    return {
+        beacon_id: sum(samples) / len(samples)
+        for beacon_id, samples in samples_by_beacon.items()
+        if samples
+    }
+
+
+def fit_centroids(
+    db: Session,
+    home_id: str,
+    run_cpu: Optional[Callable[..., Any]] = None,
+    beacon_ids: Optional[Collection[str]] = None
+) -> Dict[str, float]:
     """
-    Calculate centroids (mean RSSI) for all beacons with calibration data.
+    Calculate centroids (mean RSSI) for all beacons with calibration data in a home.
     
-    For each room/beacon, computes the mean of all RSSI samples
-    and stores it in the database.
+    For each room/beacon, computes the mean of all RSSI samples, stores it
+    in the database and saves the result as the home's active model version.
+    The calibration is analyzed first (see services/calibration_analysis.py).
+    
+    With beacon_ids (an incremental fit, e.g. after a batch upload), only those
+    beacons are read, analyzed and refitted; the others keep their current
+    (possibly adapted) means. A kNN index needs every beacon's samples, so
+    with CLASSIFIER=knn (or knn shadowed) the fit is always complete.
     
     Args:
         db: Database session
+        home_id: Home identifier
+        run_cpu: Optional executor for the analysis and mean computation,
+            called as run_cpu(fn, *args) (background jobs pass a process pool)
+        beacon_ids: Beacons to refit (default: all)
         
     Returns:
-        Dictionary mapping beacon_id to mean RSSI value
+        Dictionary mapping beacon_id to mean RSSI value (of the refitted beacons)
+    
+    Raises:
+        CalibrationRejected: With CALIBRATION_STRICT, if the analysis found errors
     """
-    rooms = crud.get_all_rooms(db)
-    centroids_dict = {}
+    from app.services.model_store import save_model, wants_knn_shadow
+    rooms = crud.get_all_rooms(db, home_id)
+    if beacon_ids is not None and settings.CLASSIFIER != "knn" and not wants_knn_shadow():
+        rooms = [room for room in rooms if room.beacon_id in beacon_ids]
+    else:
+        beacon_ids = None
+    room_ids = {}
+    samples_by_beacon = {}
+    window_rows = []
     
     for room in rooms:
         # Get all calibration windows for this room
@@ -31,46 +93,65 @@ def fit_centroids(db: Session) -> Dict[str, float]:
         all_samples = []
         for window in windows:
             all_samples.extend(window.rssi_samples)
+            window_rows.append(
+                (room.beacon_id, room.name, window.window_start, window.window_end, window.rssi_samples)
+            )
         
-        if not all_samples:
-            continue
-        
-        # Calculate mean RSSI
-        mean_rssi = sum(all_samples) / len(all_samples)
-        
-        # Upsert centroid in database
-        crud.upsert_centroid(db, room.id, mean_rssi)
-        
-        # Map beacon_id to mean_rssi
-        centroids_dict[room.beacon_id] = mean_rssi
+        room_ids[room.beacon_id] = room.id
+        samples_by_beacon[room.beacon_id] = all_samples
+    
+    # Catch a bad calibration before it replaces the served model; imported
+    # here (like model_store above) as it loads numpy
+    from app.services.calibration_analysis import analyze_windows, check_calibration
+    window_rows.sort(key=lambda row: row[2])
+    analysis = analyze_windows(window_rows) if run_cpu is None else run_cpu(analyze_windows, window_rows)
+    check_calibration(home_id, analysis)
+    
+    # Calculate mean RSSI per beacon
+    if run_cpu is None:
+        centroids_dict = compute_centroid_means(samples_by_beacon)
+    else:
+        centroids_dict = run_cpu(compute_centroid_means, samples_by_beacon)
+    
+    # Upsert centroids in database
+    for beacon_id, mean_rssi in centroids_dict.items():
+        crud.upsert_centroid(db, home_id, room_ids[beacon_id], mean_rssi)
+    
+    # Saved as a new model version that every worker switches to (the previous
+    # one stays available for rollback)
+    save_model(db, home_id, "fit", samples_by_beacon if beacon_ids is None else None)
     
     return centroids_dict
 
 
-def get_centroids(db: Session) -> Dict[str, float]:
+def get_centroids(db: Session, home_id: str) -> Dict[str, float]:
     """
-    Get all stored centroids.
+    Get all stored centroids for a home.
+    
+    Served from the home's cached model snapshot.
     
     Args:
         db: Database session
+        home_id: Home identifier
         
     Returns:
         Dictionary mapping beacon_id to mean RSSI value
     """
-    return crud.get_centroids_dict(db)
+    return get_snapshot(db, home_id).centroids
 
 
-def get_centroids_list(db: Session) -> List[Dict]:
+def get_centroids_list(db: Session, home_id: str) -> List[Dict]:
     """
-    Get all centroids as a list suitable for API responses.
+    Get all centroids for a home as a list suitable for API responses.
     
     Args:
         db: Database session
+        home_id: Home identifier
         
     Returns:
         List of dictionaries with beacon_id, room, mean_rssi, and updated_at
     """
-    centroids = crud.get_all_centroids(db)
+    centroids = crud.get_all_centroids(db, home_id)
     return [
         {
             "beacon_id": centroid.room.beacon_id,
@@ -1,9 +1,23 @@
 """Classifier service for room inference using beacon distance comparison."""
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from app.schemas.common import BeaconReading
 
 
 def infer_room(readings: List[BeaconReading], centroids_dict: Dict[str, float]) -> Tuple[str, float]:
+    """
+    Infer the most likely room (see infer_room_detailed).
+    
+    Returns:
+        Tuple of (beacon_id, confidence); beacon_id is "unknown" if no reading matches
+    """
+    beacon_id, confidence, _, _ = infer_room_detailed(readings, centroids_dict)
+    return (beacon_id, confidence)
+
+
+def infer_room_detailed(
+    readings: List[BeaconReading],
+    centroids_dict: Dict[str, float]
+) -> Tuple[str, float, Optional[str], Optional[float]]:
     """
     Infer the most likely room by finding the beacon closest to its calibrated mean RSSI.
     
@@ -16,10 +30,11 @@ def infer_room(readings: List[BeaconReading], centroids_dict: Dict[str, float])
         centroids_dict: Dictionary mapping beacon_id to mean RSSI value
         
     Returns:
-        Tuple of (room_name, confidence)
+        Tuple of (beacon_id, confidence, runner_up_beacon_id, margin); the
+        runner-up and margin are None when fewer than two beacons matched
     """
     if not centroids_dict or not readings:
-        return ("unknown", 0.0)
+        return ("unknown", 0.0, None, None)
     
     # Calculate distance from each reading to its centroid
     distances = []
@@ -33,7 +48,7 @@ def infer_room(readings: List[BeaconReading], centroids_dict: Dict[str, float])
             distances.append((reading.beacon_id, distance))
     
     if not distances:
-        return ("unknown", 0.0)
+        return ("unknown", 0.0, None, None)
     
     # Sort by distance (ascending) - closest beacon wins
     distances.sort(key=lambda x: x[1])
@@ -45,6 +60,8 @@ def infer_room(readings: List[BeaconReading], centroids_dict: Dict[str, float])
     # This is done in the endpoint by querying the Room table
     
     # Calculate confidence based on distance and margin
+    runner_up = None
+    margin = None
     if len(distances) == 1:
         # Only one beacon - use distance-based confidence
         # Smaller distance = higher confidence
@@ -54,7 +71,7 @@ def infer_room(readings: List[BeaconReading], centroids_dict: Dict[str, float])
         confidence = min(1.0, max(0.0, confidence))
     else:
         # Multiple beacons - factor in margin
-        second_best_dist = distances[1][1]
+        runner_up, second_best_dist = distances[1]
         margin = second_best_dist - best_dist
         
         # Base confidence from distance
@@ -65,4 +82,11 @@ def infer_room(readings: List[BeaconReading], centroids_dict: Dict[str, float])
         margin_factor = 1.0 + min(margin / 10.0, 1.0)  # Cap at 2x
         confidence = min(1.0, max(0.0, base_confidence * margin_factor))
     
-    return (best_beacon_id, confidence)
+    return (best_beacon_id, confidence, runner_up, margin)
+
+
+# Classifiers selectable by name (e.g. for replaying the inference log).
+# Each takes (readings, centroids_dict) and returns (beacon_id, confidence).
+CLASSIFIERS: Dict[str, Callable[[List[BeaconReading], Dict[str, float]], Tuple[str, float]]] = {
+    "nearest_mean": infer_room,
+}
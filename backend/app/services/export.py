@@ -0,0 +1,270 @@
+"""Columnar export of location events and calibration samples.
+
+Writes Parquet or Arrow IPC files partitioned as
+`<out>/<dataset>/home_id=<home>/date=<YYYY-MM-DD>/part-0.<ext>`, streaming
+rows from the database in fixed-size chunks so memory stays bounded no
+matter how much history is exported. Arrow IPC files can be memory-mapped
+(`pyarrow.memory_map` + `pyarrow.ipc.open_file`) by analysis notebooks and
+the Streamlit pages.
+
+Requires the optional `pyarrow` dependency (`pip install -e ".[export]"`).
+
+    python -m app.services.export --out ./export [--home ID] [--format arrow]
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.orm import Session
+from app.db import crud
+from app.db.session import SessionLocal
+import time
+
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+# Rows buffered before a record batch is written
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _require_pyarrow():
+    """Import pyarrow, explaining how to install it if it's missing."""
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise RuntimeError(
+            "Columnar export requires pyarrow. Install it with: pip install -e \".[export]\""
+        )
+
+
+def _local_date(ts: int) -> str:
+    """Format a timestamp as a local YYYY-MM-DD date (same day boundaries as /insights/daily)."""
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+class _PartitionedWriter:
+    """
+    Writes record batches into one file per (home_id, date) partition.
+    
+    Rows arrive ordered by home and time, so each partition is contiguous
+    and only one file writer is open at any moment.
+    """
+    
+    def __init__(self, root: Path, schema, fmt: str):
+        self.pa = _require_pyarrow()
+        self.root = root
+        self.schema = schema
+        self.fmt = fmt
+        self.partition: Optional[Tuple[str, str]] = None
+        self.writer = None
+        self.files: List[str] = []
+        self.rows = 0
+    
+    def _open(self, partition: Tuple[str, str]):
+        home_id, day = partition
+        directory = self.root / f"home_id={home_id}" / f"date={day}"
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-0.{FORMATS[self.fmt]}"
+        
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(str(path), self.schema, compression="zstd")
+        else:
+            self.writer = self.pa.ipc.new_file(str(path), self.schema)
+        
+        self.partition = partition
+        self.files.append(str(path))
+    
+    def write(self, partition: Tuple[str, str], columns: Dict[str, list]):
+        """Append buffered columns to the file of the given partition."""
+        if partition != self.partition:
+            self.close()
+            self._open(partition)
+        
+        batch = self.pa.RecordBatch.from_pydict(columns, schema=self.schema)
+        if self.fmt == "parquet":
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write(batch)
+        self.rows += batch.num_rows
+    
+    def close(self):
+        """Close the currently open partition file, if any."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.partition = None
+
+
+def _write_partitioned(
+    rows: Iterator[Tuple[Tuple[str, str], tuple]],
+    writer: _PartitionedWriter,
+    names: List[str],
+    chunk_size: int
+) -> Dict:
+    """Buffer (partition, row) pairs column-wise and flush them in chunks."""
+    buffer = {name: [] for name in names}
+    buffered = 0
+    current = None
+    
+    try:
+        for partition, row in rows:
+            if buffered and (partition != current or buffered >= chunk_size):
+                writer.write(current, buffer)
+                buffer = {name: [] for name in names}
+                buffered = 0
+            
+            current = partition
+            for name, value in zip(names, row):
+                buffer[name].append(value)
+            buffered += 1
+        
+        if buffered:
+            writer.write(current, buffer)
+    finally:
+        writer.close()
+    
+    return {"rows": writer.rows, "files": writer.files}
+
+
+def export_events(
+    db: Session,
+    out_dir: str,
+    home_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    fmt: str = "parquet",
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict:
+    """
+    Export location events joined with room names.
+    
+    Args:
+        db: Database session
+        out_dir: Output directory (events go to <out_dir>/events/)
+        home_id: Only export this home (all homes if omitted)
+        start_ts: Only export events starting at or after this timestamp
+        end_ts: Only export events starting before this timestamp
+        fmt: "parquet" or "arrow" (Arrow IPC file)
+        chunk_size: Rows per record batch
+    
+    Returns:
+        Dictionary with rows written and file paths
+    """
+    pa = _require_pyarrow()
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("device_id", pa.string()),
+        ("room", pa.string()),
+        ("beacon_id", pa.string()),
+        ("start_ts", pa.int64()),
+        ("end_ts", pa.int64()),
+        ("duration", pa.int32()),
+        ("confidence", pa.float32()),
+    ])
+    names = schema.names
+    
+    def rows():
+        for event_id, event_home, device_id, room, beacon_id, ev_start, ev_end, confidence in crud.iter_event_rows(
+            db, home_id, start_ts, end_ts, chunk_size
+        ):
+            yield (event_home, _local_date(ev_start)), (
+                event_id, device_id, room, beacon_id, ev_start, ev_end, ev_end - ev_start, confidence
+            )
+    
+    writer = _PartitionedWriter(Path(out_dir) / "events", schema, fmt)
+    return _write_partitioned(rows(), writer, names, chunk_size)
+
+
+def export_calibration(
+    db: Session,
+    out_dir: str,
+    home_id: Optional[str] = None,
+    fmt: str = "parquet",
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict:
+    """
+    Export calibration samples, one row per RSSI sample.
+    
+    Args:
+        db: Database session
+        out_dir: Output directory (samples go to <out_dir>/calibration/)
+        home_id: Only export this home (all homes if omitted)
+        fmt: "parquet" or "arrow" (Arrow IPC file)
+        chunk_size: Rows per record batch
+    
+    Returns:
+        Dictionary with rows written and file paths
+    """
+    pa = _require_pyarrow()
+    schema = pa.schema([
+        ("window_id", pa.int64()),
+        ("room", pa.string()),
+        ("beacon_id", pa.string()),
+        ("window_start", pa.int64()),
+        ("window_end", pa.int64()),
+        ("sample_index", pa.int32()),
+        ("rssi", pa.float32()),
+    ])
+    names = schema.names
+    
+    def rows():
+        for window_id, window_home, room, beacon_id, window_start, window_end, samples in crud.iter_calibration_window_rows(
+            db, home_id
+        ):
+            partition = (window_home, _local_date(window_start))
+            for index, rssi in enumerate(samples):
+                yield partition, (window_id, room, beacon_id, window_start, window_end, index, rssi)
+    
+    writer = _PartitionedWriter(Path(out_dir) / "calibration", schema, fmt)
+    return _write_partitioned(rows(), writer, names, chunk_size)
+
+
+def run_export(
+    out_dir: str,
+    home_id: Optional[str] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    fmt: str = "parquet"
+) -> Dict:
+    """Export events and calibration samples with their own database session."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+    
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        events = export_events(db, out_dir, home_id, start_ts, end_ts, fmt)
+        calibration = export_calibration(db, out_dir, home_id, fmt)
+    finally:
+        db.close()
+    
+    return {
+        "events": events,
+        "calibration": calibration,
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    
+    def _parse_date(value: str) -> int:
+        return int(datetime.strptime(value, "%Y-%m-%d").timestamp())
+    
+    parser = argparse.ArgumentParser(description="Export HomeSense data to Parquet/Arrow")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--home", default=None, help="Only export this home")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--since", type=_parse_date, default=None, help="First day to export (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_parse_date, default=None, help="Day after the last one to export (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
+    result = run_export(args.out, args.home, args.since, args.until, args.format)
+    print(json.dumps({
+        "events_rows": result["events"]["rows"],
+        "events_files": len(result["events"]["files"]),
+        "calibration_rows": result["calibration"]["rows"],
+        "calibration_files": len(result["calibration"]["files"]),
+        "duration_ms": result["duration_ms"],
+    }, indent=2))
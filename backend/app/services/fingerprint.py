@@ -0,0 +1,237 @@
+"""k-nearest-neighbour classification over raw calibration samples.
+
+The nearest-mean classifier reduces each beacon's calibration to one number
+and so ignores how its readings are spread: a beacon whose RSSI wanders over
+15 dB is judged like one that stays within 2 dB, and skewed or bimodal
+distributions (a door open or closed) are summarized by a mean nobody
+measured. With CLASSIFIER=knn, /infer instead looks at the calibration
+samples themselves:
+
+- At fit time each beacon's samples are sorted and all of them are written,
+  concatenated, to one float32 .npy file (plus a small JSON header with the
+  beacon order and offsets) in the saved model's directory (see
+  services/model_store.py). With one beacon
+  per room a calibration sample is one RSSI value of one beacon, so the
+  spatial index is one-dimensional per beacon, where a sorted array with
+  binary search is what a KD-tree reduces to.
+- The file is memory-mapped when a home is first queried, so startup and
+  worker processes don't read it and the page cache is shared between them.
+- A query takes each heard beacon's reading, finds its KNN_K nearest
+  calibration samples of that beacon (binary search, then a window of
+  KNN_K on each side), pools the candidates of all heard beacons and keeps
+  the KNN_K nearest overall. Every neighbour votes for its beacon's room;
+  neighbours further than KNN_MAX_DISTANCE_DB abstain. Confidence is the
+  winner's share of the KNN_K votes, and ties go to the smaller summed
+  distance.
+
+A query is O(beacons heard * (log samples + KNN_K)) regardless of how many
+calibration samples a home has. Homes without an index for their current
+model (e.g. not refit since CLASSIFIER was switched) fall back to the
+nearest-mean classifier. The neighbour count and distance come from the
+model's saved parameters, so an older model keeps the ones it was fitted with.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import numpy as np
+from app.core.config import get_settings
+from app.core.metrics import CACHE_REQUESTS
+from app.schemas.common import BeaconReading
+from app.services.model_store import model_dir
+
+settings = get_settings()
+
+# Files of the index in a saved model's directory
+INDEX_FILE = "knn.npy"
+HEADER_FILE = "knn.json"
+
+
+class FingerprintIndex:
+    """
+    Sorted calibration samples of a home's beacons.
+    
+    Args:
+        beacons: Beacon ids in index order
+        offsets: Start of each beacon's samples in `samples`, plus the total length
+        samples: Concatenated samples, sorted within each beacon (may be a memory map)
+        version: Model version the index was built for
+    """
+    
+    def __init__(self, beacons: List[str], offsets: List[int], samples: np.ndarray, version: str):
+        self.beacons = beacons
+        self.index = {beacon_id: i for i, beacon_id in enumerate(beacons)}
+        self.offsets = offsets
+        self._offsets = np.asarray(offsets, dtype=np.intp)
+        # A plain array view: slicing a np.memmap is several times slower (still backed by the map)
+        self.samples = np.asarray(samples)
+        self.version = version
+    
+    def __len__(self) -> int:
+        return len(self.samples)
+    
+    @classmethod
+    def build(cls, samples_by_beacon: Dict[str, List[float]], version: str) -> "FingerprintIndex":
+        """Index the calibration samples of every beacon that has some."""
+        beacons = sorted(beacon_id for beacon_id, samples in samples_by_beacon.items() if samples)
+        parts = [np.sort(np.asarray(samples_by_beacon[beacon_id], dtype=np.float32)) for beacon_id in beacons]
+        offsets = [0]
+        for part in parts:
+            offsets.append(offsets[-1] + len(part))
+        samples = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+        return cls(beacons, offsets, samples, version)
+    
+    def digest(self) -> str:
+        """Hash of the indexed samples (saved model versions with an index include it)."""
+        digest = hashlib.sha1(json.dumps([self.beacons, self.offsets]).encode())
+        digest.update(np.ascontiguousarray(self.samples, dtype=np.float32))
+        return digest.hexdigest()
+    
+    def classify(
+        self,
+        readings: List[BeaconReading],
+        k: Optional[int] = None,
+        max_distance: Optional[float] = None
+    ) -> Tuple[str, float, Optional[str], Optional[float]]:
+        """
+        Vote on the room among the nearest calibration samples.
+        
+        Args:
+            readings: Beacon readings of one scan
+            k: Neighbours that vote (default KNN_K)
+            max_distance: Neighbours further than this (dB) abstain (default KNN_MAX_DISTANCE_DB)
+        
+        Returns:
+            Tuple of (beacon_id, confidence, runner_up_beacon_id, vote_margin)
+            like infer_room_detailed; the margin is the difference in vote
+            share. beacon_id is "unknown" if no neighbour is close enough.
+        """
+        k = settings.KNN_K if k is None else k
+        max_distance = settings.KNN_MAX_DISTANCE_DB if max_distance is None else max_distance
+        
+        # One reading per beacon (the last one wins)
+        heard = {}
+        for reading in readings:
+            i = self.index.get(reading.beacon_id)
+            if i is not None:
+                heard[i] = reading.rssi
+        if not heard:
+            return ("unknown", 0.0, None, None)
+        
+        beacon_rows = np.fromiter(heard.keys(), dtype=np.intp, count=len(heard))
+        rssi = np.fromiter(heard.values(), dtype=np.float32, count=len(heard))
+        starts = self._offsets[beacon_rows]
+        ends = self._offsets[beacon_rows + 1]
+        positions = np.fromiter(
+            (start + np.searchsorted(self.samples[start:end], value)
+             for start, end, value in zip(starts.tolist(), ends.tolist(), rssi.tolist())),
+            dtype=np.intp, count=len(heard)
+        )
+        
+        # Candidates: up to k samples on each side of every reading's position, within its beacon
+        candidates = positions[:, None] + np.arange(-k, k)
+        valid = (candidates >= starts[:, None]) & (candidates < ends[:, None])
+        distances = np.abs(self.samples[candidates[valid]] - np.repeat(rssi, valid.sum(axis=1)))
+        labels = np.repeat(beacon_rows, valid.sum(axis=1))
+        
+        if len(distances) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            distances, labels = distances[nearest], labels[nearest]
+        voting = distances <= max_distance
+        if not voting.any():
+            return ("unknown", 0.0, None, None)
+        
+        votes = np.bincount(labels[voting], minlength=len(self.beacons))
+        distance_sums = np.bincount(labels[voting], weights=distances[voting], minlength=len(self.beacons))
+        # Most votes first, then the closest neighbours
+        ranking = np.lexsort((distance_sums, -votes))
+        best = int(ranking[0])
+        confidence = float(votes[best]) / k
+        if len(ranking) > 1 and votes[ranking[1]] > 0:
+            runner_up = int(ranking[1])
+            margin = float(votes[best] - votes[runner_up]) / k
+            return (self.beacons[best], confidence, self.beacons[runner_up], margin)
+        return (self.beacons[best], confidence, None, None)
+    
+    # ------------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------------
+    
+    def save(self, directory: Path) -> Path:
+        """
+        Write the index to <directory>/knn.npy (+ knn.json).
+        
+        Returns:
+            Path of the .npy file
+        """
+        data_path = directory / INDEX_FILE
+        np.save(data_path, np.ascontiguousarray(self.samples, dtype=np.float32))
+        (directory / HEADER_FILE).write_text(json.dumps({"beacons": self.beacons, "offsets": self.offsets}))
+        return data_path
+    
+    @classmethod
+    def load(cls, directory: Path, version: str) -> Optional["FingerprintIndex"]:
+        """Memory-map the index in a saved model's directory, if it has one."""
+        try:
+            header = json.loads((directory / HEADER_FILE).read_text())
+            samples = np.load(directory / INDEX_FILE, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        return cls(header["beacons"], header["offsets"], samples, version)
+
+
+# LRU of home_id -> mapped index, and the model version of homes known to have none
+_indexes: "OrderedDict[str, FingerprintIndex]" = OrderedDict()
+_missing: Dict[str, str] = {}
+_lock = Lock()
+
+
+def get_index(snapshot) -> Optional[FingerprintIndex]:
+    """
+    Get the memory-mapped index matching a home's model snapshot.
+    
+    Args:
+        snapshot: The home's ModelSnapshot
+    
+    Returns:
+        FingerprintIndex, or None if the model was saved without one
+    """
+    # Indexes are saved with model versions; renamed rooms change snapshot.version, not the index
+    version = snapshot.saved_version or snapshot.version
+    with _lock:
+        index = _indexes.get(snapshot.home_id)
+        if index is not None and index.version == version:
+            _indexes.move_to_end(snapshot.home_id)
+            CACHE_REQUESTS.labels("fingerprint", "hit").inc()
+            return index
+        if _missing.get(snapshot.home_id) == version:
+            return None
+    
+    CACHE_REQUESTS.labels("fingerprint", "miss").inc()
+    index = FingerprintIndex.load(model_dir(snapshot.home_id, version), version)
+    with _lock:
+        if index is None:
+            _missing[snapshot.home_id] = version
+            return None
+        _missing.pop(snapshot.home_id, None)
+        _indexes[snapshot.home_id] = index
+        _indexes.move_to_end(snapshot.home_id)
+        while len(_indexes) > settings.SNAPSHOT_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def warm_indexes(limit: int) -> int:
+    """Map the indexes of the homes whose model changed most recently (after startup)."""
+    from app.db import crud
+    from app.db.session import SessionLocal
+    from app.services.snapshot import get_snapshot
+    
+    db = SessionLocal()
+    try:
+        home_ids = crud.get_recently_changed_homes(db, min(limit, settings.SNAPSHOT_CACHE_SIZE))
+        return sum(get_index(get_snapshot(db, home_id)) is not None for home_id in home_ids)
+    finally:
+        db.close()
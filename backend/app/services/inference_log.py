@@ -0,0 +1,178 @@
+"""Append-only log of inference decisions for accuracy measurement and replay.
+
+/infer enqueues one record per decision without blocking; a background
+thread writes them in batches as NDJSON to one file per local day
+(`<INFERENCE_LOG_DIR>/inference-YYYY-MM-DD.ndjson`). Each file is
+self-contained: the first time a model version appears in a file, a
+`model` record with its centroids and rooms is written before the
+decisions that used it, so `app.services.replay` can re-run any classifier
+without the database state of the time.
+
+Records:
+    {"type": "model", "home_id", "version", "centroids": {beacon: mean}, "rooms": {beacon: room}}
+    {"type": "inference", "ts", "home_id", "device_id", "version", "readings": [[beacon, rssi], ...],
+     "beacon_id", "room", "confidence", "runner_up", "margin", "latency_us"}
+
+If the queue is full (the disk can't keep up), records are dropped and
+counted rather than slowing down inference.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import queue
+import threading
+import time
+import orjson
+from app.core.config import get_settings
+from app.core.metrics import INFERENCE_LOG_RECORDS
+
+settings = get_settings()
+
+_STOP = object()
+
+
+class InferenceLog:
+    """Buffered, append-only NDJSON writer fed from a bounded queue."""
+    
+    def __init__(self, directory: str, batch_size: int, flush_interval_s: float, max_queue: int):
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        # Path of the current day's file and the (home_id, version) models already written to it
+        self._models_path: Optional[Path] = None
+        self._models_written: Set[Tuple[str, str]] = set()
+    
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="inference-log", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush queued records and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def record(
+        self,
+        snapshot,
+        readings,
+        beacon_id: str,
+        room: str,
+        confidence: float,
+        runner_up: Optional[str],
+        margin: Optional[float],
+        latency_s: float,
+        device_id: Optional[str] = None
+    ) -> None:
+        """
+        Enqueue one inference decision (never blocks).
+        
+        Args:
+            snapshot: ModelSnapshot the decision was made with
+            readings: BeaconReadings sent by the client
+            beacon_id: Winning beacon ("unknown" if none matched)
+            room: Returned room name
+            confidence: Returned confidence
+            runner_up: Second-closest beacon, if any
+            margin: Distance margin between winner and runner-up, if any
+            latency_s: Classifier latency in seconds
+            device_id: Device that sent the readings, if known
+        """
+        entry = {
+            "type": "inference",
+            "ts": time.time(),
+            "home_id": snapshot.home_id,
+            "device_id": device_id,
+            "version": snapshot.version,
+            "readings": [[reading.beacon_id, reading.rssi] for reading in readings],
+            "beacon_id": beacon_id,
+            "room": room,
+            "confidence": confidence,
+            "runner_up": runner_up,
+            "margin": margin,
+            "latency_us": round(latency_s * 1e6, 1),
+        }
+        try:
+            self._queue.put_nowait((snapshot, entry))
+        except queue.Full:
+            INFERENCE_LOG_RECORDS.labels("dropped").inc()
+    
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                continue
+            
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            if batch:
+                try:
+                    self._write(batch)
+                    INFERENCE_LOG_RECORDS.labels("written").inc(len(batch))
+                except OSError as e:
+                    INFERENCE_LOG_RECORDS.labels("dropped").inc(len(batch))
+                    print(f"Inference log write error: {e}")
+    
+    def _write(self, batch: List[Tuple[object, Dict]]) -> None:
+        """Append a batch, grouped by day file, with one write per file."""
+        lines_by_path: Dict[Path, List[bytes]] = {}
+        for snapshot, entry in batch:
+            day = datetime.fromtimestamp(entry["ts"]).strftime("%Y-%m-%d")
+            path = self.directory / f"inference-{day}.ndjson"
+            if path != self._models_path:
+                self._models_path = path
+                self._models_written = set()
+            
+            lines = lines_by_path.setdefault(path, [])
+            key = (snapshot.home_id, snapshot.version)
+            if key not in self._models_written:
+                self._models_written.add(key)
+                lines.append(orjson.dumps({
+                    "type": "model",
+                    "home_id": snapshot.home_id,
+                    "version": snapshot.version,
+                    "centroids": snapshot.centroids,
+                    "rooms": snapshot.rooms,
+                }))
+            lines.append(orjson.dumps(entry))
+        
+        for path, lines in lines_by_path.items():
+            with open(path, "ab") as f:
+                f.write(b"\n".join(lines) + b"\n")
+
+
+_inference_log: Optional[InferenceLog] = None
+
+
+def get_inference_log() -> InferenceLog:
+    """Get the process-wide inference log."""
+    global _inference_log
+    if _inference_log is None:
+        _inference_log = InferenceLog(
+            settings.INFERENCE_LOG_DIR,
+            settings.INFERENCE_LOG_BATCH_SIZE,
+            settings.INFERENCE_LOG_FLUSH_S,
+            settings.INFERENCE_LOG_QUEUE_SIZE,
+        )
+    return _inference_log
@@ -1,6 +1,87 @@
 """Insights service for analyzing location patterns."""
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from sqlalchemy.orm import Session
+from app.core.metrics import STAGE_SECONDS
+from app.db import crud
+
+
+def day_bounds(date_str: str) -> Tuple[int, int]:
+    """
+    Get the [start, end) timestamps of a local day.
+    
+    Raises:
+        ValueError: If the date isn't in YYYY-MM-DD format
+    """
+    start_ts = int(datetime.strptime(date_str, "%Y-%m-%d").timestamp())
+    return start_ts, start_ts + 86400  # Add 24 hours
+
+
+def summarize_day(db: Session, home_id: str, date_str: str, device_id: Optional[str] = None) -> Dict:
+    """
+    Build the daily summary of a home from its events (or rollups for expired days).
+    
+    Args:
+        db: Database session
+        home_id: Home to summarize
+        date_str: Date string in YYYY-MM-DD format
+        device_id: Optional device/person to summarize; all devices if omitted
+        
+    Returns:
+        Dictionary in the daily_summary format, without the LLM summary
+        
+    Raises:
+        ValueError: If the date isn't in YYYY-MM-DD format
+    """
+    start_ts, end_ts = day_bounds(date_str)
+    
+    # Get events for this date from database
+    with STAGE_SECONDS.labels("insights_query").time():
+        db_events = crud.get_events_by_date_range(db, home_id, start_ts, end_ts, device_id)
+        
+        # Convert to dict format for service
+        events = [
+            {
+                "room": event.room.name,
+                "start_ts": event.start_ts,
+                "end_ts": event.end_ts,
+                "confidence": event.confidence,
+                "device_id": event.device_id
+            }
+            for event in db_events
+        ]
+        
+        rollups = []
+        if not events:
+            # Days past retention only have rollups left
+            rollups = [
+                {"room": rollup.room.name, "duration": rollup.duration}
+                for rollup in crud.get_daily_rollups(db, home_id, date_str, device_id)
+            ]
+    
+    # Generate summary
+    with STAGE_SECONDS.labels("insights_aggregate").time():
+        if rollups:
+            return rollup_summary(rollups, date_str)
+        return daily_summary(events, date_str)
+
+
+async def add_llm_summary(summary: Dict) -> Dict:
+    """Add the LLM-generated insight text to a daily summary (None if there's no data or no LLM)."""
+    from app.services.llm import generate_insight_summary
+    
+    llm_summary = None
+    if summary["total_duration"] > 0:
+        llm_summary = await generate_insight_summary(
+            room_durations=summary["room_durations"],
+            transitions=summary["transitions"],
+            total_duration=summary["total_duration"],
+            most_visited_room=summary["summary"].get("most_visited_room"),
+            date_str=summary["date"]
+        )
+    
+    summary["llm_summary"] = llm_summary
+    return summary
 
 
 def daily_summary(events: List[Dict], date_str: str) -> Dict:
@@ -9,6 +90,8 @@ def daily_summary(events: List[Dict], date_str: str) -> Dict:
     
     Args:
         events: List of location events with room, start_ts, end_ts, confidence
+            and optional device_id. Transitions are computed per device, so
+            occupants moving independently don't produce fake transitions.
         date_str: Date string in YYYY-MM-DD format
         
     Returns:
@@ -52,20 +135,66 @@ def daily_summary(events: List[Dict], date_str: str) -> Dict:
     # Build transitions list with timestamps: [from_room, to_room, timestamp]
     transitions = []
     
-    # Sort events by start time
-    sorted_events = sorted(events, key=lambda e: e["start_ts"])
+    # Each device has its own timeline (events without a device share one)
+    device_events: Dict[Any, List[Dict]] = {}
+    for event in events:
+        device_events.setdefault(event.get("device_id"), []).append(event)
     
-    for i in range(len(sorted_events) - 1):
-        current_event = sorted_events[i]
-        next_event = sorted_events[i + 1]
-        current_room = current_event["room"]
-        next_room = next_event["room"]
+    for timeline in device_events.values():
+        # Sort events by start time
+        sorted_events = sorted(timeline, key=lambda e: e["start_ts"])
         
-        if current_room != next_room:
-            # Transition happened at the end of current event
-            transition_time = current_event["end_ts"]
-            transitions.append([current_room, next_room, transition_time])
+        for i in range(len(sorted_events) - 1):
+            current_event = sorted_events[i]
+            next_event = sorted_events[i + 1]
+            current_room = current_event["room"]
+            next_room = next_event["room"]
+            
+            if current_room != next_room:
+                # Transition happened at the end of current event
+                transition_time = current_event["end_ts"]
+                transitions.append([current_room, next_room, transition_time])
     
+    transitions.sort(key=lambda t: t[2])
+    
+    return _summarize(room_time, total_time, dwell, transitions, date_str)
+
+
+def rollup_summary(rollups: List[Dict], date_str: str) -> Dict:
+    """
+    Generate a daily summary from daily rollups.
+    
+    Used for days whose raw events were expired by the retention job.
+    Dwell times are exact, but rollups don't keep the order of events,
+    so the summary has no transitions.
+    
+    Args:
+        rollups: List of rollups with room and duration (seconds)
+        date_str: Date string in YYYY-MM-DD format
+        
+    Returns:
+        Dictionary in the same format as daily_summary
+    """
+    room_time: Dict[str, int] = {}
+    for rollup in rollups:
+        room_time[rollup["room"]] = room_time.get(rollup["room"], 0) + rollup["duration"]
+    
+    total_time = sum(room_time.values())
+    dwell = {}
+    if total_time > 0:
+        dwell = {room: round(time / total_time, 3) for room, time in room_time.items()}
+    
+    return _summarize(room_time, total_time, dwell, [], date_str)
+
+
+def _summarize(
+    room_time: Dict[str, int],
+    total_time: int,
+    dwell: Dict[str, float],
+    transitions: List[List[Any]],
+    date_str: str
+) -> Dict:
+    """Assemble the summary dictionary from per-room dwell times and transitions."""
     # Find most visited room
     most_visited_room = None
     most_visited_duration = 0
@@ -0,0 +1,290 @@
+"""In-process background jobs for slow work.
+
+Centroid fits, LLM insight summaries, retention/rollup passes and exports
+can run as jobs instead of holding the client's connection: the endpoint
+returns 202 with a job id right away and the client polls GET /jobs/{id}.
+
+- Jobs run on a bounded thread pool (JOBS_THREAD_WORKERS); CPU-heavy steps
+  are handed to a process pool (JOBS_PROCESS_WORKERS) through run_cpu().
+- At most JOBS_MAX_PENDING jobs may be queued or running; beyond that new
+  submissions are rejected instead of queueing without bound.
+- Submitting a job identical (kind, home and parameters) to one that is
+  still queued returns the queued job instead of adding another.
+- Job status and results are stored in the background_jobs table (the
+  most recent JOBS_HISTORY_SIZE per home), so any worker can answer a poll.
+  Deduplication and the pending limit are per worker process.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+import uuid
+import orjson
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.core.metrics import JOBS, JOB_SECONDS, JOBS_PENDING, STAGE_SECONDS
+from app.db import crud
+from app.db.session import SessionLocal
+
+settings = get_settings()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when JOBS_MAX_PENDING jobs are already queued or running."""
+
+
+class Job:
+    """One unit of background work and its outcome."""
+    
+    __slots__ = (
+        "id", "kind", "home_id", "params", "key", "status",
+        "created_at", "started_at", "finished_at", "result", "error",
+    )
+    
+    def __init__(self, kind: str, home_id: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.home_id = home_id
+        self.params = params
+        self.key = (kind, home_id, orjson.dumps(params, option=orjson.OPT_SORT_KEYS))
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "home_id": self.home_id,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Bounded worker pools plus this process's queued jobs."""
+    
+    def __init__(self, thread_workers: int, process_workers: int, max_pending: int, history_size: int):
+        self.process_workers = process_workers
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self._threads = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="job")
+        self._processes = None
+        self._queued: Dict[Tuple, Job] = {}
+        self._pending = 0
+        self._lock = Lock()
+    
+    def _save(self, job: Job) -> None:
+        """Persist the job's current state (and prune the home's old jobs once it's finished)."""
+        db = SessionLocal()
+        try:
+            crud.save_background_job(db, job.to_dict())
+            if job.status in (SUCCEEDED, FAILED):
+                crud.delete_old_background_jobs(db, job.home_id, keep=self.history_size)
+        finally:
+            db.close()
+    
+    def submit(self, kind: str, home_id: str, params: Optional[Dict[str, Any]] = None) -> Job:
+        """
+        Queue a job, or return the identical job that is already queued.
+        
+        Raises:
+            ValueError: If the job kind is unknown
+            JobQueueFull: If too many jobs are queued or running
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        
+        job = Job(kind, home_id, params or {})
+        with self._lock:
+            existing = self._queued.get(job.key)
+            if existing is not None:
+                JOBS.labels(kind, "deduplicated").inc()
+                return existing
+            if self._pending >= self.max_pending:
+                JOBS.labels(kind, "rejected").inc()
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            
+            self._queued[job.key] = job
+            self._pending += 1
+            JOBS_PENDING.labels().set(self._pending)
+        
+        self._save(job)
+        JOBS.labels(kind, "submitted").inc()
+        self._threads.submit(self._run, job)
+        return job
+    
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            if self._queued.get(job.key) is job:
+                del self._queued[job.key]
+            job.status = RUNNING
+            job.started_at = time.time()
+        
+        started = time.perf_counter()
+        self._save(job)
+        try:
+            job.result = JOB_KINDS[job.kind](job, self)
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            JOB_SECONDS.labels(job.kind).observe(time.perf_counter() - started)
+            JOBS.labels(job.kind, job.status).inc()
+            with self._lock:
+                self._pending -= 1
+                JOBS_PENDING.labels().set(self._pending)
+            self._save(job)
+    
+    def run_cpu(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run a CPU-heavy, picklable function in the process pool and wait for it.
+        
+        Called from job threads. With JOBS_PROCESS_WORKERS=0 the function
+        runs in the calling thread.
+        """
+        if self.process_workers <= 0:
+            return fn(*args)
+        if self._processes is None:
+            with self._lock:
+                if self._processes is None:
+                    # Imported here: most processes never start the pool
+                    from concurrent.futures import ProcessPoolExecutor
+                    import multiprocessing
+                    # spawn: forking a process with live threads and DB connections isn't safe
+                    self._processes = ProcessPoolExecutor(
+                        max_workers=self.process_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._processes.submit(fn, *args).result()
+    
+    def get(self, db: Session, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job submitted by any worker."""
+        row = crud.get_background_job(db, job_id)
+        return _row_to_dict(row) if row is not None else None
+    
+    def list(self, db: Session, home_id: str) -> List[Dict[str, Any]]:
+        """Recent jobs of a home, newest first."""
+        return [_row_to_dict(row) for row in crud.get_background_jobs(db, home_id, self.history_size)]
+    
+    def shutdown(self) -> None:
+        """Stop accepting work; queued jobs are cancelled, running ones finish in the background."""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "kind": row.kind,
+        "home_id": row.home_id,
+        "params": row.params,
+        "status": row.status,
+        "created_at": row.created_at,
+        "started_at": row.started_at,
+        "finished_at": row.finished_at,
+        "result": row.result,
+        "error": row.error,
+    }
+
+
+# ============================================================================
+# Job kinds
+# ============================================================================
+
+def _fit_job(job: Job, manager: JobManager) -> Dict[str, float]:
+    """Fit a home's centroids; the mean computation runs in the process pool."""
+    from app.services.centroid import fit_centroids
+    
+    db = SessionLocal()
+    try:
+        if not crud.has_calibration_windows(db, job.home_id):
+            raise ValueError("No calibration data available. Upload calibration data first.")
+        with STAGE_SECONDS.labels("fit_centroids").time():
+            return fit_centroids(db, job.home_id, run_cpu=manager.run_cpu)
+    finally:
+        db.close()
+
+
+def _insights_job(job: Job, manager: JobManager) -> Dict[str, Any]:
+    """Build a daily summary including the LLM insight text."""
+    from app.services.insights import add_llm_summary, summarize_day
+    
+    db = SessionLocal()
+    try:
+        summary = summarize_day(db, job.home_id, job.params["date"], job.params.get("device_id"))
+    finally:
+        db.close()
+    return asyncio.run(add_llm_summary(summary))
+
+
+def _retention_job(job: Job, manager: JobManager) -> Dict[str, int]:
+    """Run a retention pass (merge, roll up and expire events) over the job's home, with RETENTION_DAYS."""
+    from app.services.retention import run_retention_job
+    
+    return run_retention_job(home_id=job.home_id)
+
+
+def _export_job(job: Job, manager: JobManager) -> Dict[str, Any]:
+    """Export a home's events and calibration samples to EXPORT_DIR/<job id>."""
+    from app.services.export import run_export
+    
+    def day_ts(value: Optional[str]) -> Optional[int]:
+        return int(datetime.strptime(value, "%Y-%m-%d").timestamp()) if value else None
+    
+    out_dir = Path(settings.EXPORT_DIR) / job.id
+    return run_export(
+        str(out_dir), job.home_id, day_ts(job.params.get("since")), day_ts(job.params.get("until")),
+        job.params.get("format", "parquet")
+    )
+
+
+JOB_KINDS: Dict[str, Callable[[Job, JobManager], Any]] = {
+    "fit": _fit_job,
+    "insights": _insights_job,
+    "retention": _retention_job,
+    "export": _export_job,
+}
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Get the process-wide job manager."""
+    global _manager
+    if _manager is None:
+        _manager = JobManager(
+            settings.JOBS_THREAD_WORKERS,
+            settings.JOBS_PROCESS_WORKERS,
+            settings.JOBS_MAX_PENDING,
+            settings.JOBS_HISTORY_SIZE,
+        )
+    return _manager
+
+
+def shutdown_jobs() -> None:
+    """Shut down the job manager's pools, if it was started."""
+    global _manager
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
@@ -1,13 +1,25 @@
-"""LLM service for generating contextual suggestions."""
+"""LLM service for generating contextual suggestions.
+
+Imported on first use (see app/api/routes/suggest.py and
+app/services/insights.py) so its rule tables and httpx don't slow down
+application startup.
+"""
 from typing import Dict, List, Optional
-import httpx
 import json
+import time
 from app.core.config import get_settings
+from app.core.metrics import LLM_REQUESTS, LLM_REQUEST_SECONDS, SUGGESTION_FALLBACKS
 from app.schemas.suggest import Suggestion
 
 settings = get_settings()
 
 
+def _async_client(**kwargs):
+    """Create an httpx.AsyncClient (httpx is imported only when an LLM call is made)."""
+    import httpx
+    return httpx.AsyncClient(**kwargs)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # PREFERENCE-BASED SUGGESTIONS
 # These are context-aware preferences that trigger based on room + time
@@ -490,6 +502,7 @@ Respond with ONLY a JSON object (no markdown, no extra text):
   "suggestion": "friendly personalized suggestion message (1-2 sentences)"
 }}"""
 
+    started = time.perf_counter()
     try:
         # Make API call based on provider
         if settings.LLM_PROVIDER == "gemini":
@@ -513,7 +526,7 @@ Respond with ONLY a JSON object (no markdown, no extra text):
         if settings.LLM_PROVIDER != "gemini":
             headers["Authorization"] = f"Bearer {settings.LLM_API_KEY}"
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with _async_client(timeout=10.0) as client:
             response = await client.post(
                 url,
                 json=payload,
@@ -537,11 +550,16 @@ Respond with ONLY a JSON object (no markdown, no extra text):
                     text = text[4:]
                 text = text.strip()
             
-            return json.loads(text)
+            parsed = json.loads(text)
+            LLM_REQUESTS.labels("suggestion", "success").inc()
+            return parsed
             
     except Exception as e:
+        LLM_REQUESTS.labels("suggestion", "error").inc()
         print(f"LLM suggestion text error: {e}")
         return None
+    finally:
+        LLM_REQUEST_SECONDS.labels("suggestion").observe(time.perf_counter() - started)
 
 
 async def generate_suggestion(
@@ -578,6 +596,9 @@ async def generate_suggestion(
                 suggestion=llm_text.get("suggestion", rule_based.suggestion),
                 quick_actions=rule_based.quick_actions  # Always use rule-based for predictability
             )
+        SUGGESTION_FALLBACKS.labels("llm_error").inc()
+    else:
+        SUGGESTION_FALLBACKS.labels("no_api_key").inc()
     
     # Return full rule-based suggestion
     return rule_based
@@ -644,6 +665,7 @@ Examples of good summaries:
 
 Write ONLY the summary text (no quotes, no explanations):"""
 
+    started = time.perf_counter()
     try:
         if settings.LLM_PROVIDER == "gemini":
             url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={settings.LLM_API_KEY}"
@@ -664,7 +686,7 @@ Write ONLY the summary text (no quotes, no explanations):"""
         if settings.LLM_PROVIDER != "gemini":
             headers["Authorization"] = f"Bearer {settings.LLM_API_KEY}"
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with _async_client(timeout=10.0) as client:
             response = await client.post(url, json=payload, headers=headers)
             response.raise_for_status()
             
@@ -677,8 +699,12 @@ Write ONLY the summary text (no quotes, no explanations):"""
             
             # Clean up the response
             text = text.strip().strip('"').strip("'")
+            LLM_REQUESTS.labels("insight_summary", "success").inc()
             return text
             
     except Exception as e:
+        LLM_REQUESTS.labels("insight_summary", "error").inc()
         print(f"LLM insight summary error: {e}")
         return None
+    finally:
+        LLM_REQUEST_SECONDS.labels("insight_summary").observe(time.perf_counter() - started)
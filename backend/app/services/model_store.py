@@ -0,0 +1,310 @@
+"""Versioned model snapshots saved on disk, with an active version per home.
+
+Fitting used to overwrite the centroid table in place, so a bad calibration
+degraded inference at once and the previous model was gone. Now every fit
+(and every online adaptation update) also saves the resulting model as an
+immutable version under MODEL_DIR/<home_id>/<version>/:
+
+- means.npy: float64 array of shape (2, beacons): the served mean and the
+  fitted mean of each beacon, beacons in sorted order
+- meta.json: beacon order, room map, algorithm parameters, source and parent
+- knn.npy + knn.json: the kNN sample index (fits with CLASSIFIER=knn, or
+  knn among SHADOW_CLASSIFIERS)
+
+The version is the ModelSnapshot content hash (combined with a digest of the
+kNN samples when the version has an index), so saving the same model twice
+keeps one copy while new calibration samples always make a new version. Saves
+without samples (adaptation updates) carry the active version's index over.
+A directory is written under a temporary name and renamed, so readers never
+see a partial version.
+
+Room names are served from the rooms table, not from meta.json (which keeps
+the names at save time, shown by GET /models/{version} and diffs), so a
+renamed room keeps its name whichever version is active.
+
+The active_models table points each home at the version it serves (and the
+one before). Switching is an update of that row plus a model change
+announcement: workers rebuild the home's snapshot by memory-mapping the
+version's files, whatever their size. The centroid table is rewritten too
+(one row per beacon), as GET /centroids, online adaptation and the fallback
+for workers without MODEL_DIR read it; a switch costs O(beacons) rows, not
+O(samples). Versions beyond MODEL_HISTORY_SIZE are pruned, except the
+active and previous ones; workers that still have their files mapped keep
+reading them.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.db import crud, models
+from app.services.snapshot import ModelSnapshot, model_params, publish_model_change
+
+settings = get_settings()
+
+MEANS_FILE = "means.npy"
+META_FILE = "meta.json"
+
+
+def model_dir(home_id: str, version: str) -> Path:
+    """Directory of one of a home's saved model versions."""
+    return Path(settings.MODEL_DIR) / home_id / version
+
+
+class SavedModel:
+    """
+    A saved model version, memory-mapped from its directory.
+    
+    Args:
+        home_id: Home the model belongs to
+        meta: Contents of meta.json
+        means: Array of shape (2, beacons): served and fitted means
+    """
+    
+    __slots__ = ("home_id", "version", "beacons", "rooms", "params", "source", "created_at", "parent_version",
+                 "means")
+    
+    def __init__(self, home_id: str, meta: Dict[str, Any], means: np.ndarray):
+        self.home_id = home_id
+        self.version = meta["version"]
+        self.beacons: List[str] = meta["beacons"]
+        self.rooms: Dict[str, str] = meta["rooms"]
+        self.params: Dict[str, Any] = meta["params"]
+        self.source: str = meta["source"]
+        self.created_at: int = meta["created_at"]
+        self.parent_version: Optional[str] = meta.get("parent_version")
+        self.means = means
+    
+    def centroids(self) -> Dict[str, float]:
+        """Served mean RSSI per beacon."""
+        return dict(zip(self.beacons, self.means[0].tolist()))
+    
+    def fitted_means(self) -> Dict[str, float]:
+        """Fitted mean RSSI per beacon (before online adaptation)."""
+        return dict(zip(self.beacons, self.means[1].tolist()))
+    
+    def to_snapshot(self, room_names: Optional[Dict[str, str]] = None) -> ModelSnapshot:
+        """
+        The ModelSnapshot /infer serves for this version.
+        
+        Args:
+            room_names: Current room name per beacon, overriding the names
+                saved with the version (beacons without a room keep theirs)
+        """
+        rooms = dict(self.rooms)
+        if room_names:
+            rooms = {beacon_id: room_names.get(beacon_id, name) for beacon_id, name in rooms.items()}
+        return ModelSnapshot(self.home_id, self.centroids(), rooms, dict(self.params), saved_version=self.version)
+
+
+def load_model(home_id: str, version: str) -> Optional[SavedModel]:
+    """Memory-map one of a home's saved model versions (None if its files are missing)."""
+    directory = model_dir(home_id, version)
+    try:
+        meta = json.loads((directory / META_FILE).read_text())
+        means = np.load(directory / MEANS_FILE, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+    return SavedModel(home_id, meta, means)
+
+
+def wants_knn_shadow() -> bool:
+    """Whether the kNN classifier is a shadow candidate (its index is then saved with every fit)."""
+    return "knn" in (spec.strip() for spec in settings.SHADOW_CLASSIFIERS.split(","))
+
+
+def save_model(
+    db: Session,
+    home_id: str,
+    source: str,
+    samples_by_beacon: Optional[Dict[str, List[float]]] = None
+) -> models.ModelSnapshotRecord:
+    """
+    Save a home's current centroids as a model version and make it the active one.
+    
+    Call after committing new centroids (instead of publish_model_change).
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+        source: What produced the model: "fit" or "adaptation"
+        samples_by_beacon: Calibration samples, to save a kNN index with the
+            model when CLASSIFIER=knn (or knn is a shadow candidate); without
+            them the active version's index is kept
+    
+    Returns:
+        The saved version's record
+    """
+    rows = sorted(crud.get_adaptation_rows(db, home_id))
+    beacons = [beacon_id for beacon_id, _, _, _, _ in rows]
+    rooms = {beacon_id: room_name for beacon_id, room_name, _, _, _ in rows}
+    means = np.array(
+        [[mean_rssi for _, _, mean_rssi, _, _ in rows], [fitted for _, _, _, fitted, _ in rows]],
+        dtype=np.float64
+    ).reshape(2, len(rows))
+    params = model_params()
+    # Hash of exactly what to_snapshot() will load back
+    version = ModelSnapshot(home_id, dict(zip(beacons, means[0].tolist())), rooms, params).version
+    
+    active = crud.get_active_model(db, home_id)
+    index = None
+    if params["classifier"] == "knn" or wants_knn_shadow():
+        from app.services.fingerprint import FingerprintIndex
+        if samples_by_beacon is not None:
+            index = FingerprintIndex.build(samples_by_beacon, version)
+        elif active is not None:
+            index = FingerprintIndex.load(model_dir(home_id, active.version), active.version)
+        if index is None:
+            print(f"Model of home '{home_id}' saved without a kNN index (refit to build one)")
+        else:
+            # The means can stay the same while the samples change
+            version = hashlib.sha1(f"{version}:{index.digest()}".encode()).hexdigest()[:12]
+            index.version = version
+    
+    parent_version = active.version if active is not None and active.version != version else None
+    directory = model_dir(home_id, version)
+    if not (directory / META_FILE).exists():
+        meta = {
+            "version": version,
+            "beacons": beacons,
+            "rooms": rooms,
+            "params": params,
+            "source": source,
+            "created_at": int(time.time()),
+            "parent_version": parent_version,
+        }
+        _write_model(directory, meta, means, index)
+    
+    record = crud.create_model_snapshot(db, home_id, version, source, parent_version, len(beacons))
+    crud.set_active_model(db, home_id, version)
+    prune_models(db, home_id)
+    # Every worker picks up the new model
+    publish_model_change(db, home_id)
+    return record
+
+
+def _write_model(directory: Path, meta: Dict[str, Any], means: np.ndarray, index) -> None:
+    """Write a version's files to a temporary directory and rename it into place."""
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp = directory.parent / f".{directory.name}.{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    np.save(tmp / MEANS_FILE, means)
+    if index is not None:
+        index.save(tmp)
+    (tmp / META_FILE).write_text(json.dumps(meta))
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # Another worker saved the same version first (same content)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def activate_model(db: Session, home_id: str, version: str) -> Optional[models.ActiveModel]:
+    """
+    Make one of a home's saved model versions the one it serves.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+        version: Version to serve
+    
+    Returns:
+        The home's updated pointer, or None if the version isn't saved
+    """
+    if crud.get_model_snapshot(db, home_id, version) is None:
+        return None
+    saved = load_model(home_id, version)
+    if saved is None:
+        return None
+    
+    # The centroid table follows the served model (GET /centroids, adaptation, DB fallback):
+    # one row per beacon, however many samples the version was fitted from
+    means = {
+        beacon_id: (mean_rssi, fitted, None if mean_rssi == fitted else saved.created_at)
+        for beacon_id, mean_rssi, fitted in zip(saved.beacons, saved.means[0].tolist(), saved.means[1].tolist())
+    }
+    crud.set_centroid_means(db, home_id, means)
+    active = crud.set_active_model(db, home_id, version)
+    publish_model_change(db, home_id)
+    return active
+
+
+def rollback_model(db: Session, home_id: str) -> Optional[models.ActiveModel]:
+    """
+    Serve a home's previously active model version again.
+    
+    The version rolled back from becomes the previous one, so a second
+    rollback undoes the first.
+    
+    Returns:
+        The home's updated pointer, or None if there is no previous version
+    """
+    active = crud.get_active_model(db, home_id)
+    if active is None or active.previous_version is None:
+        return None
+    return activate_model(db, home_id, active.previous_version)
+
+
+def prune_models(db: Session, home_id: str) -> int:
+    """Delete a home's versions beyond MODEL_HISTORY_SIZE, except the active and previous ones."""
+    active = crud.get_active_model(db, home_id)
+    keep = {active.version, active.previous_version} if active is not None else set()
+    records = crud.get_model_snapshots(db, home_id)
+    expired = [record.version for record in records[settings.MODEL_HISTORY_SIZE:] if record.version not in keep]
+    crud.delete_model_snapshots(db, home_id, expired)
+    for version in expired:
+        shutil.rmtree(model_dir(home_id, version), ignore_errors=True)
+    return len(expired)
+
+
+def diff_models(saved: SavedModel, against: SavedModel) -> Dict[str, Any]:
+    """
+    Compare two saved model versions.
+    
+    Args:
+        saved: Version to describe
+        against: Version it is compared with
+    
+    Returns:
+        Dictionary with the changed parameters (name -> [against, saved]),
+        the beacons whose room or mean differ and the largest mean change
+    """
+    means = saved.centroids()
+    other_means = against.centroids()
+    beacons = []
+    for beacon_id in sorted(set(means) | set(other_means)):
+        mean_rssi = means.get(beacon_id)
+        other_mean = other_means.get(beacon_id)
+        room = saved.rooms.get(beacon_id)
+        other_room = against.rooms.get(beacon_id)
+        if mean_rssi == other_mean and room == other_room:
+            continue
+        delta = None if mean_rssi is None or other_mean is None else round(mean_rssi - other_mean, 2)
+        beacons.append({
+            "beacon_id": beacon_id,
+            "room": room,
+            "against_room": other_room,
+            "mean_rssi": mean_rssi,
+            "against_mean_rssi": other_mean,
+            "delta_db": delta,
+        })
+    
+    params = {
+        name: [against.params.get(name), saved.params.get(name)]
+        for name in sorted(set(saved.params) | set(against.params))
+        if saved.params.get(name) != against.params.get(name)
+    }
+    deltas = [abs(beacon["delta_db"]) for beacon in beacons if beacon["delta_db"] is not None]
+    return {
+        "version": saved.version,
+        "against": against.version,
+        "params": params,
+        "beacons": beacons,
+        "max_delta_db": max(deltas) if deltas else 0.0,
+    }
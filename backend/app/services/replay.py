@@ -0,0 +1,230 @@
+"""Replay logged inference traffic through a classifier.
+
+Reads the inference log (see app.services.inference_log), re-runs a
+candidate classifier and a baseline classifier on every logged request
+with the model version it was originally served with, and reports how
+often the candidate agrees with production, accuracy against ground truth
+and classifier speed.
+
+Ground truth comes from location events: a logged request is labelled with
+the room of the event of the same home and device covering its timestamp
+(events are the client's confirmed dwells, so transitions stay unlabelled).
+
+    python -m app.services.replay --classifier mypkg.knn:infer_room [--baseline nearest_mean]
+        [--log-dir ./inference_logs] [--home ID] [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--no-labels]
+
+Classifiers are given by name (app.services.classifier.CLASSIFIERS) or as
+`module:function` taking (readings, centroids_dict) and returning
+(beacon_id, confidence).
+"""
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import importlib
+import time
+import orjson
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.db import crud
+from app.schemas.common import BeaconReading
+from app.services.classifier import CLASSIFIERS
+
+settings = get_settings()
+
+# (home_id, device_id) -> (sorted start_ts, end_ts, room name)
+Labels = Dict[Tuple[str, Optional[str]], Tuple[List[int], List[int], List[str]]]
+
+
+def load_classifier(spec: str) -> Callable:
+    """Resolve a classifier by registered name or `module:function`."""
+    if spec in CLASSIFIERS:
+        return CLASSIFIERS[spec]
+    if ":" not in spec:
+        raise ValueError(f"Unknown classifier '{spec}'. Use one of {', '.join(CLASSIFIERS)} or module:function")
+    module_name, function_name = spec.split(":", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def iter_log_records(
+    log_dir: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    home_id: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Stream model and inference records from the daily log files.
+    
+    Args:
+        log_dir: Inference log directory
+        since: First day to read (YYYY-MM-DD, inclusive)
+        until: Last day to read (YYYY-MM-DD, exclusive)
+        home_id: Only yield records of this home
+    """
+    for path in sorted(Path(log_dir).glob("inference-*.ndjson")):
+        day = path.stem[len("inference-"):]
+        if (since and day < since) or (until and day >= until):
+            continue
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                if home_id is None or record["home_id"] == home_id:
+                    yield record
+
+
+def load_labels(db: Session, home_id: Optional[str], start_ts: Optional[int], end_ts: Optional[int]) -> Labels:
+    """Index location events by (home, device) for timestamp lookups."""
+    labels: Labels = {}
+    # Events that started up to a day before the range can still cover its first requests
+    query_start = start_ts - 86400 if start_ts is not None else None
+    for _, event_home, device_id, room, _, ev_start, ev_end, _ in crud.iter_event_rows(
+        db, home_id, query_start, end_ts
+    ):
+        starts, ends, rooms = labels.setdefault((event_home, device_id), ([], [], []))
+        starts.append(ev_start)
+        ends.append(ev_end)
+        rooms.append(room)
+    return labels
+
+
+def label_for(labels: Labels, home_id: str, device_id: Optional[str], ts: float) -> Optional[str]:
+    """Room of the event covering `ts` for the home and device, if any."""
+    timeline = labels.get((home_id, device_id))
+    if timeline is None:
+        return None
+    starts, ends, rooms = timeline
+    index = bisect_right(starts, ts) - 1
+    if index >= 0 and ts <= ends[index]:
+        return rooms[index]
+    return None
+
+
+def _speed(samples: List[float]) -> Dict:
+    """Mean/p50/p99 in microseconds."""
+    if not samples:
+        return {"mean_us": None, "p50_us": None, "p99_us": None}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "mean_us": round(sum(ordered) / n * 1e6, 2),
+        "p50_us": round(ordered[n // 2] * 1e6, 2),
+        "p99_us": round(ordered[min(int(0.99 * n), n - 1)] * 1e6, 2),
+    }
+
+
+def replay(
+    records: Iterator[Dict],
+    candidate: Callable,
+    baseline: Callable,
+    labels: Optional[Labels] = None
+) -> Dict:
+    """
+    Re-run two classifiers over logged inference traffic.
+    
+    Args:
+        records: Log records (model records must precede the inferences using them)
+        candidate: Classifier under test
+        baseline: Reference classifier (normally the production one)
+        labels: Ground truth from location events (accuracy is skipped if None)
+    
+    Returns:
+        Dictionary with agreement, accuracy (logged, baseline, candidate, delta) and speed
+    """
+    models: Dict[Tuple[str, str], Dict] = {}
+    total = 0
+    skipped = 0
+    agree_logged = 0
+    changed = 0
+    labelled = 0
+    correct = {"logged": 0, "baseline": 0, "candidate": 0}
+    timings: Dict[str, List[float]] = {"baseline": [], "candidate": []}
+    logged_latency: List[float] = []
+    
+    for record in records:
+        if record["type"] == "model":
+            models[(record["home_id"], record["version"])] = record
+            continue
+        
+        model = models.get((record["home_id"], record["version"]))
+        if model is None:
+            skipped += 1
+            continue
+        total += 1
+        
+        readings = [BeaconReading(beacon_id=beacon_id, rssi=rssi) for beacon_id, rssi in record["readings"]]
+        rooms = {}
+        for name, classifier in (("baseline", baseline), ("candidate", candidate)):
+            start = time.perf_counter()
+            beacon_id, _ = classifier(readings, model["centroids"])
+            timings[name].append(time.perf_counter() - start)
+            rooms[name] = model["rooms"].get(beacon_id, "unknown")
+        
+        logged_latency.append(record["latency_us"] / 1e6)
+        agree_logged += rooms["candidate"] == record["room"]
+        changed += rooms["candidate"] != rooms["baseline"]
+        
+        if labels is not None:
+            truth = label_for(labels, record["home_id"], record.get("device_id"), record["ts"])
+            if truth is not None:
+                labelled += 1
+                correct["logged"] += record["room"] == truth
+                correct["baseline"] += rooms["baseline"] == truth
+                correct["candidate"] += rooms["candidate"] == truth
+    
+    report = {
+        "records": total,
+        "skipped_without_model": skipped,
+        "models": len(models),
+        "agreement_with_logged": round(agree_logged / total, 4) if total else None,
+        "changed_vs_baseline": changed,
+        "speed": {
+            "logged": _speed(logged_latency),
+            "baseline": _speed(timings["baseline"]),
+            "candidate": _speed(timings["candidate"]),
+        },
+    }
+    if labels is not None:
+        accuracy = {name: round(count / labelled, 4) if labelled else None for name, count in correct.items()}
+        report["labelled"] = labelled
+        report["accuracy"] = accuracy
+        report["accuracy_delta"] = (
+            round(accuracy["candidate"] - accuracy["baseline"], 4) if labelled else None
+        )
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from app.db.session import SessionLocal
+    
+    def _day_ts(value: Optional[str]) -> Optional[int]:
+        return int(datetime.strptime(value, "%Y-%m-%d").timestamp()) if value else None
+    
+    parser = argparse.ArgumentParser(description="Replay the inference log through a classifier")
+    parser.add_argument("--classifier", default="nearest_mean", help="Candidate: registered name or module:function")
+    parser.add_argument("--baseline", default="nearest_mean", help="Reference: registered name or module:function")
+    parser.add_argument("--log-dir", default=settings.INFERENCE_LOG_DIR)
+    parser.add_argument("--home", default=None, help="Only replay this home")
+    parser.add_argument("--since", default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--until", default=None, help="Day after the last one (YYYY-MM-DD)")
+    parser.add_argument("--no-labels", action="store_true", help="Skip ground truth from location events")
+    args = parser.parse_args()
+    
+    labels = None
+    if not args.no_labels:
+        db = SessionLocal()
+        try:
+            labels = load_labels(db, args.home, _day_ts(args.since), _day_ts(args.until))
+        finally:
+            db.close()
+    
+    report = replay(
+        iter_log_records(args.log_dir, args.since, args.until, args.home),
+        load_classifier(args.classifier),
+        load_classifier(args.baseline),
+        labels,
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,340 @@
+"""Retention and compaction for location events and calibration windows.
+
+Run in-process (RETENTION_INTERVAL_S > 0) or from cron:
+
+    python -m app.services.retention [--days N] [--full-vacuum]
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, date, timedelta, time as dt_time
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.db import crud
+from app.db.session import SessionLocal, engine
+import asyncio
+import time
+
+settings = get_settings()
+
+# Events younger than this may still be extended by the client, so they aren't merged yet
+MERGE_SETTLE_S = 3600
+
+
+def retention_cutoff(days: int, now: Optional[float] = None) -> int:
+    """
+    Get the timestamp before which raw events expire.
+    
+    The cutoff is aligned to local midnight so a day is either fully raw
+    or fully rolled up, matching the day boundaries of /insights/daily.
+    """
+    today = date.fromtimestamp(now if now is not None else time.time())
+    return int(datetime.combine(today - timedelta(days=days), dt_time.min).timestamp())
+
+
+def _home_ids(db: Session, home_id: Optional[str]) -> List[str]:
+    """The homes a pass covers: `home_id` alone, or all of them."""
+    return [home_id] if home_id is not None else crud.get_home_ids(db)
+
+
+def merge_adjacent_events(
+    db: Session,
+    start_ts: int,
+    end_ts: int,
+    gap: int,
+    batch_size: int,
+    home_id: Optional[str] = None
+) -> int:
+    """
+    Merge consecutive same-room events of each device timeline into one segment.
+    
+    Two events are merged when the second starts at most `gap` seconds after
+    the first ends. The surviving row keeps the earliest start, the latest end
+    and the duration-weighted confidence.
+    
+    Passes are incremental: a home's events starting before its merge
+    watermark (the previous pass's `end_ts`) were merged already, so only
+    newer ones are paged, each device's run resuming from its last merged
+    event. The work follows the new events rather than the history (events
+    posted later for times before the watermark stay unmerged).
+    
+    Args:
+        db: Database session
+        start_ts: Only events starting at or after this timestamp are merged
+        end_ts: Only events starting before this timestamp are merged
+        gap: Maximum gap in seconds between merged events
+        batch_size: Rows per page/transaction
+        home_id: Only merge this home's events (default: all homes)
+    
+    Returns:
+        Number of events folded into a neighbour (and deleted)
+    """
+    merged = 0
+    
+    for home_id in _home_ids(db, home_id):
+        watermark = crud.get_merge_watermark(db, home_id)
+        since = start_ts if watermark is None else max(start_ts, watermark)
+        if since >= end_ts:
+            continue
+        
+        for device_id in crud.get_event_device_ids(db, home_id, since, end_ts):
+            # Run being extended: [id, room_id, start_ts, end_ts, confidence * weight, weight, dirty]
+            run = None
+            if since > start_ts:
+                # The device's last merged event may absorb the first new one
+                last = crud.get_last_timeline_event(db, home_id, device_id, start_ts, since)
+                if last is not None:
+                    event_id, room_id, ev_start, ev_end, confidence = last
+                    weight = max(ev_end - ev_start, 1)
+                    run = [event_id, room_id, ev_start, ev_end, confidence * weight, weight, False]
+            after: Tuple[int, int] = (since - 1, 0)
+            
+            while True:
+                page = crud.get_timeline_event_page(
+                    db, home_id, device_id, since, end_ts, after, batch_size
+                )
+                if not page:
+                    break
+                
+                updates = []
+                delete_ids = []
+                for event_id, room_id, ev_start, ev_end, confidence in page:
+                    weight = max(ev_end - ev_start, 1)
+                    if run and room_id == run[1] and ev_start - run[3] <= gap:
+                        run[3] = max(run[3], ev_end)
+                        run[4] += confidence * weight
+                        run[5] += weight
+                        run[6] = True
+                        delete_ids.append(event_id)
+                        continue
+                    
+                    if run and run[6]:
+                        updates.append(run)
+                    run = [event_id, room_id, ev_start, ev_end, confidence * weight, weight, False]
+                
+                # The open run is written too so every page commits a consistent state
+                if run and run[6]:
+                    updates.append(run)
+                
+                for event_id, _, _, run_end, weighted_conf, weight, _ in updates:
+                    crud.update_location_event_span(db, event_id, run_end, weighted_conf / weight)
+                if run:
+                    run[6] = False
+                merged += crud.delete_location_events_by_ids(db, delete_ids)
+                db.commit()
+                
+                last = page[-1]
+                after = (last[2], last[0])
+        
+        crud.set_merge_watermark(db, home_id, end_ts)
+    
+    return merged
+
+
+def rollup_expired_events(db: Session, cutoff_ts: int, batch_size: int, home_id: Optional[str] = None) -> int:
+    """
+    Fold events starting before the cutoff into daily rollups and delete them.
+    
+    Each page is rolled up and deleted in the same transaction, so an
+    interrupted run never double counts or loses dwell time.
+    
+    Args:
+        db: Database session
+        cutoff_ts: Events starting before this timestamp expire
+        batch_size: Rows per page/transaction
+        home_id: Only roll up this home's events (default: all homes)
+    
+    Returns:
+        Number of raw events rolled up and deleted
+    """
+    deleted = 0
+    
+    for home_id in _home_ids(db, home_id):
+        while True:
+            page = crud.get_expired_event_page(db, home_id, cutoff_ts, batch_size)
+            if not page:
+                break
+            
+            # (device_id, date, room_id) -> [duration, event_count]
+            totals: Dict[Tuple[Optional[str], str, int], list] = {}
+            for event in page:
+                day = datetime.fromtimestamp(event.start_ts).strftime("%Y-%m-%d")
+                key = (event.device_id, day, event.room_id)
+                total = totals.setdefault(key, [0, 0])
+                total[0] += event.end_ts - event.start_ts
+                total[1] += 1
+            
+            for (device_id, day, room_id), (duration, count) in totals.items():
+                crud.add_to_daily_rollup(db, home_id, device_id, day, room_id, duration, count)
+            
+            deleted += crud.delete_location_events_by_ids(db, [event.id for event in page])
+            db.commit()
+            db.expire_all()
+    
+    return deleted
+
+
+def delete_orphaned_calibration(db: Session, batch_size: int, home_id: Optional[str] = None) -> int:
+    """
+    Delete calibration windows left behind by beacon re-assignment, in batches.
+    
+    Returns:
+        Number of deleted windows
+    """
+    deleted = 0
+    while True:
+        count = crud.delete_orphaned_calibration_windows(db, batch_size, home_id)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def delete_stale_calibration_sessions(
+    db: Session,
+    before_ts: int,
+    batch_size: int,
+    home_id: Optional[str] = None
+) -> int:
+    """
+    Delete calibration sessions abandoned before `before_ts` (with their chunks), in batches.
+    
+    Returns:
+        Number of deleted sessions
+    """
+    deleted = 0
+    while True:
+        count = crud.delete_stale_calibration_sessions(db, before_ts, batch_size, home_id)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def _sqlite_size_bytes(cursor) -> Tuple[int, int]:
+    """Get (file size, free page bytes) of the SQLite database."""
+    page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+    page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+    freelist = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_count * page_size, freelist * page_size
+
+
+def vacuum_sqlite(full: bool = False) -> Dict[str, int]:
+    """
+    Return free pages to the OS after deletes.
+    
+    Databases created with auto_vacuum=INCREMENTAL (the default for new
+    HomeSense databases) are shrunk with an incremental vacuum, which only
+    touches free pages. Older databases need a one-off full VACUUM
+    (`full=True`), which rewrites the file and also switches them to
+    incremental mode.
+    
+    Returns:
+        Dictionary with bytes_before, bytes_after and bytes_free (still reclaimable)
+    """
+    if engine.dialect.name != "sqlite":
+        return {"bytes_before": 0, "bytes_after": 0, "bytes_free": 0}
+    
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        size_before, _ = _sqlite_size_bytes(cursor)
+        
+        # executescript() runs each pragma to completion; execute() would only
+        # step incremental_vacuum once and free a single page
+        if full:
+            cursor.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+        elif cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            cursor.executescript("PRAGMA incremental_vacuum;")
+        
+        size_after, free_after = _sqlite_size_bytes(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+    
+    return {"bytes_before": size_before, "bytes_after": size_after, "bytes_free": free_after}
+
+
+def run_retention(
+    db: Session,
+    days: Optional[int] = None,
+    full_vacuum: bool = False,
+    now: Optional[float] = None,
+    home_id: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Run one retention/compaction pass over all homes, or over one.
+    
+    1. Merge adjacent same-room events (between the cutoff and the settle window)
+    2. Roll up and delete raw events older than the retention cutoff
+    3. Delete orphaned calibration windows and abandoned calibration sessions
+    4. Vacuum SQLite so the freed space is actually returned
+    
+    Args:
+        db: Database session
+        days: Retention in days (defaults to RETENTION_DAYS; 0 skips the rollup step)
+        full_vacuum: Run a full VACUUM instead of an incremental one
+        now: Current time override (for testing)
+        home_id: Only compact this home's rows (the incremental vacuum is
+            database-wide but only releases free pages)
+    
+    Returns:
+        Dictionary with row counts and bytes reclaimed
+    """
+    days = settings.RETENTION_DAYS if days is None else days
+    now = time.time() if now is None else now
+    batch_size = settings.RETENTION_BATCH_SIZE
+    started = time.perf_counter()
+    
+    cutoff_ts = retention_cutoff(days, now) if days > 0 else 0
+    merged = merge_adjacent_events(
+        db, cutoff_ts, int(now) - MERGE_SETTLE_S, settings.RETENTION_MERGE_GAP_S, batch_size, home_id
+    )
+    rolled_up = rollup_expired_events(db, cutoff_ts, batch_size, home_id) if days > 0 else 0
+    calibration_deleted = delete_orphaned_calibration(db, batch_size, home_id)
+    sessions_deleted = delete_stale_calibration_sessions(
+        db, int(now) - settings.CALIBRATION_SESSION_TTL_S, batch_size, home_id
+    )
+    sizes = vacuum_sqlite(full=full_vacuum)
+    
+    return {
+        "events_merged": merged,
+        "events_rolled_up": rolled_up,
+        "calibration_windows_deleted": calibration_deleted,
+        "calibration_sessions_deleted": sessions_deleted,
+        "bytes_reclaimed": max(sizes["bytes_before"] - sizes["bytes_after"], 0),
+        "bytes_free": sizes["bytes_free"],
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    }
+
+
+def run_retention_job(
+    days: Optional[int] = None,
+    full_vacuum: bool = False,
+    home_id: Optional[str] = None
+) -> Dict[str, int]:
+    """Run a retention pass with its own database session."""
+    db = SessionLocal()
+    try:
+        return run_retention(db, days=days, full_vacuum=full_vacuum, home_id=home_id)
+    finally:
+        db.close()
+
+
+async def retention_loop(interval_s: int) -> None:
+    """Run the retention job every `interval_s` seconds without blocking the event loop."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            stats = await asyncio.to_thread(run_retention_job)
+            print(f"✓ Retention: {stats}")
+        except Exception as e:
+            print(f"Retention job error: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description="Compact and expire HomeSense location data")
+    parser.add_argument("--days", type=int, default=None, help="Retention in days (default: RETENTION_DAYS)")
+    parser.add_argument("--full-vacuum", action="store_true", help="Run a full VACUUM (rewrites the database file)")
+    args = parser.parse_args()
+    
+    print(json.dumps(run_retention_job(days=args.days, full_vacuum=args.full_vacuum), indent=2))
@@ -0,0 +1,194 @@
+"""Server-side RSSI smoothing per device and beacon.
+
+Single BLE scans are noisy (several dB of jitter plus occasional reflections
+far off), so phones used to average windows of scans before calling /infer.
+With RSSI_FILTER set, /infer requests carrying a device_id instead pass their
+readings through a filter per (device, beacon) before classification:
+
+- "kalman": a 1-D Kalman filter on a random walk. The estimate's variance
+  grows by RSSI_FILTER_PROCESS_NOISE per second between readings, and each
+  reading (variance RSSI_FILTER_MEASUREMENT_NOISE) is weighed against it, so
+  a beacon heard again after a pause follows the new readings quickly.
+- "ema": an exponential moving average with gain RSSI_FILTER_EMA_ALPHA.
+
+Both gate outliers: a reading further than RSSI_FILTER_GATE_SIGMA standard
+deviations from the estimate is ignored, unless RSSI_FILTER_MAX_REJECTS
+readings in a row were (then the beacon really changed and the filter
+restarts from the reading). A beacon not heard for RSSI_FILTER_RESET_S
+restarts too.
+
+State is one small array per device (estimate, variance, last reading time
+and rejected-in-a-row for each of the home's beacons, in the model's beacon
+order), updated with vectorized numpy operations across the scan's beacons.
+Devices idle for RSSI_FILTER_IDLE_S are evicted, as are the least recently
+seen beyond RSSI_FILTER_MAX_DEVICES.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import time
+import numpy as np
+from app.core.config import get_settings
+from app.core.metrics import RSSI_OUTLIERS_REJECTED, STAGE_SECONDS
+from app.schemas.common import BeaconReading
+
+settings = get_settings()
+
+FILTER_KINDS = ("none", "kalman", "ema")
+
+# Rows of a device's state array
+_ESTIMATE, _VARIANCE, _LAST_TS, _REJECTS = range(4)
+
+
+class _DeviceFilter:
+    __slots__ = ("version", "index", "state", "seen_at")
+    
+    def __init__(self, version: str, beacons: List[str]):
+        self.version = version
+        self.index = {beacon_id: i for i, beacon_id in enumerate(beacons)}
+        self.state = np.zeros((4, len(beacons)))
+        self.state[_LAST_TS] = -np.inf
+        self.seen_at = 0.0
+
+
+class RssiFilter:
+    """
+    Filter state of every device.
+    
+    Args:
+        kind: "kalman", "ema" or "none" (readings pass through)
+        max_devices: Devices kept in memory
+        idle_s: Seconds without readings after which a device's state is dropped
+    """
+    
+    def __init__(self, kind: str, max_devices: int, idle_s: float):
+        if kind not in FILTER_KINDS:
+            raise ValueError(f"Unknown RSSI filter {kind!r}, expected one of {', '.join(FILTER_KINDS)}")
+        self.kind = kind
+        self.max_devices = max_devices
+        self.idle_s = idle_s
+        self._devices: "OrderedDict[Tuple[str, str], _DeviceFilter]" = OrderedDict()
+        self._lock = Lock()
+    
+    def __len__(self) -> int:
+        return len(self._devices)
+    
+    def apply(
+        self,
+        snapshot,
+        device_id: str,
+        readings: List[BeaconReading],
+        ts: Optional[float] = None
+    ) -> List[BeaconReading]:
+        """
+        Update a device's filters with one scan and return the smoothed readings.
+        
+        Readings of beacons outside the home's model pass through unchanged.
+        
+        Args:
+            snapshot: The home's ModelSnapshot (defines the beacons)
+            device_id: Device that scanned the readings
+            readings: Raw readings of the scan
+            ts: Scan time in Unix seconds (defaults to now)
+        
+        Returns:
+            One reading per input reading, in the same order
+        """
+        if self.kind == "none":
+            return readings
+        ts = time.time() if ts is None else ts
+        key = (snapshot.home_id, device_id)
+        
+        with STAGE_SECONDS.labels("rssi_filter").time(), self._lock:
+            device = self._devices.get(key)
+            if device is None or device.version != snapshot.version:
+                device = _DeviceFilter(snapshot.version, sorted(snapshot.centroids))
+                self._devices[key] = device
+            device.seen_at = time.monotonic()
+            self._devices.move_to_end(key)
+            self._evict(device.seen_at)
+            
+            # Duplicate readings of a beacon in one scan: the last one counts
+            positions: Dict[int, int] = {}
+            for position, reading in enumerate(readings):
+                i = device.index.get(reading.beacon_id)
+                if i is not None:
+                    positions[i] = position
+            if not positions:
+                return readings
+            
+            columns = np.fromiter(positions.keys(), dtype=np.intp, count=len(positions))
+            measured = np.fromiter(
+                (readings[position].rssi for position in positions.values()), dtype=np.float64, count=len(positions)
+            )
+            smoothed = self._update(device.state, columns, measured, ts)
+        
+        filtered = list(readings)
+        for position, rssi in zip(positions.values(), smoothed.tolist()):
+            filtered[position] = BeaconReading(beacon_id=readings[position].beacon_id, rssi=round(rssi, 2))
+        return filtered
+    
+    def _update(self, state: np.ndarray, columns: np.ndarray, measured: np.ndarray, ts: float) -> np.ndarray:
+        """Filter step for the given beacons (columns of state); returns their new estimates."""
+        estimate = state[_ESTIMATE, columns]
+        variance = state[_VARIANCE, columns]
+        rejects = state[_REJECTS, columns]
+        dt = np.maximum(ts - state[_LAST_TS, columns], 0.0)
+        fresh = dt > settings.RSSI_FILTER_RESET_S  # never heard (dt is inf) or heard too long ago
+        dt[fresh] = 0.0
+        measurement_noise = settings.RSSI_FILTER_MEASUREMENT_NOISE
+        
+        if self.kind == "kalman":
+            variance = variance + settings.RSSI_FILTER_PROCESS_NOISE * dt
+            spread = np.sqrt(variance + measurement_noise)
+        else:
+            spread = np.full(len(columns), np.sqrt(measurement_noise))
+        
+        outlier = ~fresh & (np.abs(measured - estimate) > settings.RSSI_FILTER_GATE_SIGMA * spread)
+        if settings.RSSI_FILTER_GATE_SIGMA <= 0:
+            outlier[:] = False
+        restart = fresh | (outlier & (rejects + 1 >= settings.RSSI_FILTER_MAX_REJECTS))
+        outlier &= ~restart
+        accept = ~outlier & ~restart
+        
+        if self.kind == "kalman":
+            gain = variance / (variance + measurement_noise)
+        else:
+            gain = np.full(len(columns), settings.RSSI_FILTER_EMA_ALPHA)
+        estimate = np.where(accept, estimate + gain * (measured - estimate), estimate)
+        variance = np.where(accept, (1.0 - gain) * variance, variance)
+        estimate = np.where(restart, measured, estimate)
+        variance = np.where(restart, measurement_noise, variance)
+        
+        rejected = int(outlier.sum())
+        if rejected:
+            RSSI_OUTLIERS_REJECTED.labels().inc(rejected)
+        state[_ESTIMATE, columns] = estimate
+        state[_VARIANCE, columns] = variance
+        state[_REJECTS, columns] = np.where(outlier, rejects + 1, 0.0)
+        # A rejected reading still shows the beacon is around
+        state[_LAST_TS, columns] = np.maximum(state[_LAST_TS, columns], ts)
+        return estimate
+    
+    def _evict(self, now: float) -> None:
+        while self._devices:
+            key, oldest = next(iter(self._devices.items()))
+            if len(self._devices) <= self.max_devices and now - oldest.seen_at <= self.idle_s:
+                break
+            del self._devices[key]
+    
+    def forget(self, home_id: str, device_id: str) -> None:
+        """Drop a device's filter state."""
+        with self._lock:
+            self._devices.pop((home_id, device_id), None)
+
+
+_filter: Optional[RssiFilter] = None
+
+
+def get_rssi_filter() -> RssiFilter:
+    """Get the process-wide RSSI filter configured by RSSI_FILTER."""
+    global _filter
+    if _filter is None:
+        _filter = RssiFilter(settings.RSSI_FILTER, settings.RSSI_FILTER_MAX_DEVICES, settings.RSSI_FILTER_IDLE_S)
+    return _filter
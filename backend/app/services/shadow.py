@@ -0,0 +1,271 @@
+"""Shadow evaluation of candidate classifiers on live /infer traffic.
+
+With SHADOW_CLASSIFIERS set (comma-separated: registered names such as
+"nearest_mean", "knn" for the home's kNN index, or `module:function` like
+app.services.replay accepts), /infer still answers with the served
+classifier, then enqueues a copy of the request (a SHADOW_SAMPLE_RATE
+fraction of them) without blocking. A background thread runs every
+candidate on the same readings and model snapshot and records, per home and
+candidate:
+
+- agreement: how often the candidate picks the served room
+- confidence: mean and a 10-bin histogram (the served classifier's too)
+- latency: mean, p50 and p95 over the last SHADOW_WINDOW decisions
+
+Totals are also exported as metrics (homesense_shadow_*). Statistics live
+in the process that served the requests, so with several workers each
+reports its own share of the traffic. Agreement measures change, not
+accuracy: replay the inference log (app.services.replay) to score a
+candidate against location events.
+
+The thread shares the CPU with request handling, so keep the sample rate
+low for slow candidates; if the queue is full, requests are dropped (and
+counted) rather than delaying inference.
+"""
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+import queue
+import random
+import threading
+import time
+from app.core.config import get_settings
+from app.core.metrics import SHADOW_CONFIDENCE, SHADOW_DECISIONS, SHADOW_REQUESTS, SHADOW_SECONDS
+from app.schemas.common import BeaconReading
+
+settings = get_settings()
+
+_STOP = object()
+
+# Name the served classifier's statistics are reported under
+SERVED = "served"
+
+# Upper bounds of the confidence histogram bins
+CONFIDENCE_BINS = tuple(round(0.1 * i, 1) for i in range(1, 11))
+
+# Candidate: (readings, snapshot) -> (beacon_id, confidence), or None if it can't classify this model
+Candidate = Callable[[List[BeaconReading], object], Optional[Tuple[str, float]]]
+
+
+def _knn(readings: List[BeaconReading], snapshot) -> Optional[Tuple[str, float]]:
+    # Fits save a kNN index when "knn" is a candidate (see model_store.save_model)
+    from app.services.fingerprint import get_index
+    index = get_index(snapshot)
+    if index is None:
+        return None
+    beacon_id, confidence, _, _ = index.classify(
+        readings, snapshot.params.get("knn_k"), snapshot.params.get("knn_max_distance_db")
+    )
+    return (beacon_id, confidence)
+
+
+def load_candidate(spec: str) -> Candidate:
+    """Resolve a candidate by name ("knn", a registered classifier) or `module:function`."""
+    if spec == "knn":
+        return _knn
+    from app.services.replay import load_classifier
+    classify = load_classifier(spec)
+    return lambda readings, snapshot: classify(readings, snapshot.centroids)
+
+
+class _Stats:
+    """Decisions of one classifier for one home."""
+    
+    __slots__ = ("requests", "agreements", "errors", "skipped", "confidence_sum", "confidence_bins", "latencies")
+    
+    def __init__(self, window: int):
+        self.requests = 0
+        self.agreements = 0
+        self.errors = 0
+        self.skipped = 0
+        self.confidence_sum = 0.0
+        self.confidence_bins = [0] * len(CONFIDENCE_BINS)
+        self.latencies: Deque[float] = deque(maxlen=window)
+    
+    def add(self, confidence: float, latency_s: float, agrees: bool) -> None:
+        self.requests += 1
+        self.agreements += agrees
+        self.confidence_sum += confidence
+        self.confidence_bins[min(int(confidence * 10), len(CONFIDENCE_BINS) - 1)] += 1
+        self.latencies.append(latency_s)
+    
+    def summary(self, name: str) -> Dict:
+        latencies = sorted(self.latencies)
+        
+        def percentile(q: float) -> Optional[float]:
+            return round(latencies[int(q * (len(latencies) - 1))] * 1e6, 1) if latencies else None
+        
+        return {
+            "candidate": name,
+            "requests": self.requests,
+            "agreement_rate": round(self.agreements / self.requests, 4) if self.requests else None,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "confidence_mean": round(self.confidence_sum / self.requests, 4) if self.requests else None,
+            "confidence_histogram": list(self.confidence_bins),
+            "latency_mean_us": round(sum(latencies) / len(latencies) * 1e6, 1) if latencies else None,
+            "latency_p50_us": percentile(0.5),
+            "latency_p95_us": percentile(0.95),
+        }
+
+
+class ShadowEvaluator:
+    """
+    Runs candidate classifiers on sampled /infer requests in a background thread.
+    
+    Args:
+        candidates: Candidate specs (see load_candidate)
+        sample_rate: Fraction of requests evaluated
+        max_queue: Requests waiting for evaluation before new ones are dropped
+        window: Recent decisions latency percentiles are computed over
+        max_homes: Homes whose statistics are kept (least recently seen dropped first)
+    """
+    
+    def __init__(self, candidates: List[str], sample_rate: float, max_queue: int, window: int, max_homes: int):
+        self.candidates: Dict[str, Candidate] = {spec: load_candidate(spec) for spec in candidates}
+        self.sample_rate = sample_rate
+        self.window = window
+        self.max_homes = max_homes
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stats: "OrderedDict[str, Dict[str, _Stats]]" = OrderedDict()
+        self._failed: Set[str] = set()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.candidates) and self.sample_rate > 0
+    
+    def start(self) -> None:
+        """Start the evaluation thread."""
+        if self._thread is not None or not self.enabled:
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Evaluate queued requests and stop the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def submit(
+        self,
+        snapshot,
+        readings: List[BeaconReading],
+        room: str,
+        confidence: float,
+        latency_s: float
+    ) -> None:
+        """
+        Enqueue a served decision for shadow evaluation (never blocks).
+        
+        Args:
+            snapshot: ModelSnapshot the decision was made with
+            readings: Readings the served classifier saw
+            room: Served room
+            confidence: Served confidence
+            latency_s: Served classifier latency in seconds
+        """
+        if self._thread is None or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((snapshot, readings, room, confidence, latency_s))
+        except queue.Full:
+            self.dropped += 1
+            SHADOW_REQUESTS.labels("dropped").inc()
+    
+    def evaluate(self, snapshot, readings: List[BeaconReading], room: str, confidence: float, latency_s: float) -> None:
+        """Run every candidate on one served decision and record the outcome."""
+        SHADOW_REQUESTS.labels("evaluated").inc()
+        results = []
+        for name, candidate in self.candidates.items():
+            start = time.perf_counter()
+            try:
+                decision = candidate(readings, snapshot)
+            except Exception as e:
+                results.append((name, "error", e))
+                continue
+            elapsed = time.perf_counter() - start
+            if decision is None:
+                results.append((name, "skipped", None))
+                continue
+            beacon_id, candidate_confidence = decision
+            candidate_room = (snapshot.room_for(beacon_id) if beacon_id != "unknown" else None) or "unknown"
+            results.append((name, "agree" if candidate_room == room else "disagree", (candidate_confidence, elapsed)))
+        
+        with self._lock:
+            stats = self._stats.get(snapshot.home_id)
+            if stats is None:
+                stats = self._stats[snapshot.home_id] = {}
+                while len(self._stats) > self.max_homes:
+                    self._stats.popitem(last=False)
+            self._stats.move_to_end(snapshot.home_id)
+            
+            served = stats.setdefault(SERVED, _Stats(self.window))
+            served.add(confidence, latency_s, True)
+            for name, result, detail in results:
+                candidate_stats = stats.setdefault(name, _Stats(self.window))
+                if result == "error":
+                    candidate_stats.errors += 1
+                elif result == "skipped":
+                    candidate_stats.skipped += 1
+                else:
+                    candidate_stats.add(detail[0], detail[1], result == "agree")
+        
+        SHADOW_CONFIDENCE.labels(SERVED).observe(confidence)
+        for name, result, detail in results:
+            SHADOW_DECISIONS.labels(name, result).inc()
+            if result in ("agree", "disagree"):
+                SHADOW_CONFIDENCE.labels(name).observe(detail[0])
+                SHADOW_SECONDS.labels(name).observe(detail[1])
+            elif result == "error" and name not in self._failed:
+                # Once per candidate: a broken candidate fails on every request
+                self._failed.add(name)
+                print(f"Shadow classifier {name} failed: {detail}")
+    
+    def report(self, home_id: str) -> Dict:
+        """Statistics of a home's served and candidate classifiers."""
+        with self._lock:
+            stats = self._stats.get(home_id, {})
+            served = stats.get(SERVED) or _Stats(self.window)
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "dropped": self.dropped,
+                "served": served.summary(SERVED),
+                "candidates": [
+                    (stats.get(name) or _Stats(self.window)).summary(name) for name in self.candidates
+                ],
+            }
+    
+    def reset(self, home_id: str) -> None:
+        """Forget a home's statistics (e.g. after changing a candidate)."""
+        with self._lock:
+            self._stats.pop(home_id, None)
+    
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            self.evaluate(*item)
+
+
+_evaluator: Optional[ShadowEvaluator] = None
+
+
+def get_shadow_evaluator() -> ShadowEvaluator:
+    """Get the process-wide shadow evaluator configured by SHADOW_CLASSIFIERS."""
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = ShadowEvaluator(
+            [spec.strip() for spec in settings.SHADOW_CLASSIFIERS.split(",") if spec.strip()],
+            settings.SHADOW_SAMPLE_RATE,
+            settings.SHADOW_QUEUE_SIZE,
+            settings.SHADOW_WINDOW,
+            settings.SNAPSHOT_CACHE_SIZE,
+        )
+    return _evaluator
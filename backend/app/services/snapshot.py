@@ -0,0 +1,221 @@
+"""Per-home model snapshots cached in memory for inference.
+
+Every worker process has its own cache. Model changes are published by
+bumping the home's row in the model_versions table; each worker polls that
+table (one indexed query, at most every SNAPSHOT_SYNC_INTERVAL_S) and drops
+the snapshots of homes changed by any process, so all workers serve the new
+centroids within the sync interval.
+
+Homes with a saved model (see services/model_store.py) build their snapshot
+from the active version's files; others from the centroid table. Room names
+always come from the rooms table, so renaming a room takes effect without a
+refit (and also applies to older versions activated later).
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.core.metrics import CACHE_REQUESTS, STAGE_SECONDS
+from app.db import crud
+from app.db.session import SessionLocal
+import hashlib
+import orjson
+import time
+
+settings = get_settings()
+
+
+def model_params() -> Dict[str, Any]:
+    """Algorithm parameters a model is fitted and served with (from the settings)."""
+    return {
+        "classifier": settings.CLASSIFIER,
+        "knn_k": settings.KNN_K,
+        "knn_max_distance_db": settings.KNN_MAX_DISTANCE_DB,
+    }
+
+
+class ModelSnapshot:
+    """
+    Immutable view of a home's fitted model.
+    
+    Holds everything /infer needs so a classification doesn't touch the
+    database: centroids keyed by beacon_id, the beacon -> room name map and
+    the algorithm parameters (default: the current settings).
+    
+    `version` is a short hash of the model's content, so the same fitted
+    model has the same version in every process and across restarts.
+    `saved_version` is the saved model version it was built from (whose
+    directory holds e.g. its kNN index), None if built from the centroid
+    table; the two differ for versions with a kNN index and once a room was
+    renamed after the save.
+    """
+    
+    __slots__ = ("home_id", "centroids", "rooms", "params", "version", "saved_version", "beacons", "built_at")
+    
+    def __init__(
+        self,
+        home_id: str,
+        centroids: Dict[str, float],
+        rooms: Dict[str, str],
+        params: Optional[Dict[str, Any]] = None,
+        saved_version: Optional[str] = None
+    ):
+        self.home_id = home_id
+        self.centroids = centroids  # beacon_id -> mean_rssi
+        self.rooms = rooms          # beacon_id -> room name
+        self.params = model_params() if params is None else params
+        self.version = hashlib.sha1(
+            orjson.dumps([centroids, rooms, self.params], option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()[:12]
+        self.saved_version = saved_version
+        self.beacons = sorted(centroids)  # Slot order of compact /infer requests
+        self.built_at = time.time()
+    
+    def room_for(self, beacon_id: str) -> Optional[str]:
+        """Get the room name for a beacon, if it is part of the model."""
+        return self.rooms.get(beacon_id)
+
+
+# LRU of home_id -> ModelSnapshot, bounded so one process can serve many homes
+_snapshots: "OrderedDict[str, ModelSnapshot]" = OrderedDict()
+_lock = Lock()
+
+# home_id -> count of invalidations (local or synced from other workers), so
+# a build that raced one isn't cached
+_generations: Dict[str, int] = {}
+
+# Highest model version this process has applied, and when it last checked
+_seen_version: Optional[int] = None
+_last_sync = 0.0
+
+
+def build_snapshot(db: Session, home_id: str) -> ModelSnapshot:
+    """
+    Build a snapshot for a home from its active saved model, or the centroid table.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+    
+    Returns:
+        ModelSnapshot with centroids and room names for the home
+    """
+    active = crud.get_active_model(db, home_id)
+    if active is not None:
+        # Imported here: model_store needs numpy and imports this module
+        from app.services.model_store import load_model
+        stored = load_model(home_id, active.version)
+        if stored is not None:
+            return stored.to_snapshot(crud.get_room_names(db, home_id))
+        # Files missing (e.g. MODEL_DIR not shared by this worker): the centroid table matches the active model
+    
+    centroids = {}
+    rooms = {}
+    for beacon_id, room_name, mean_rssi in crud.get_centroid_rows(db, home_id):
+        centroids[beacon_id] = mean_rssi
+        rooms[beacon_id] = room_name
+    return ModelSnapshot(home_id, centroids, rooms)
+
+
+def get_snapshot(db: Session, home_id: str) -> ModelSnapshot:
+    """
+    Get the cached snapshot for a home, building it on first use.
+    
+    Args:
+        db: Database session
+        home_id: Home identifier
+    
+    Returns:
+        ModelSnapshot for the home
+    """
+    sync_model_versions(db)
+    
+    with _lock:
+        snapshot = _snapshots.get(home_id)
+        if snapshot is not None:
+            _snapshots.move_to_end(home_id)
+            CACHE_REQUESTS.labels("snapshot", "hit").inc()
+            return snapshot
+    
+        generation = _generations.get(home_id, 0)
+    
+    CACHE_REQUESTS.labels("snapshot", "miss").inc()
+    with STAGE_SECONDS.labels("snapshot_build").time():
+        snapshot = build_snapshot(db, home_id)
+    
+    with _lock:
+        if _generations.get(home_id, 0) != generation:
+            # Invalidated during the build, which may have read the old model: serve it once, don't cache it
+            return snapshot
+        _snapshots[home_id] = snapshot
+        _snapshots.move_to_end(home_id)
+        while len(_snapshots) > settings.SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+    
+    return snapshot
+
+
+def invalidate_snapshot(home_id: str) -> None:
+    """Drop the cached snapshot for a home so the next inference rebuilds it."""
+    with _lock:
+        _snapshots.pop(home_id, None)
+        _generations[home_id] = _generations.get(home_id, 0) + 1
+
+
+def publish_model_change(db: Session, home_id: str) -> None:
+    """
+    Announce that a home's model changed, to this and every other worker.
+    
+    Call after committing changes to rooms, calibration or centroids.
+    """
+    crud.bump_model_version(db, home_id)
+    invalidate_snapshot(home_id)
+
+
+def sync_model_versions(db: Session, force: bool = False) -> None:
+    """
+    Drop snapshots of homes whose model another process changed.
+    
+    Runs at most every SNAPSHOT_SYNC_INTERVAL_S unless forced. The first
+    call only records the current version: nothing is cached yet.
+    """
+    global _seen_version, _last_sync
+    
+    now = time.monotonic()
+    if not force and now - _last_sync < settings.SNAPSHOT_SYNC_INTERVAL_S:
+        return
+    _last_sync = now
+    
+    if _seen_version is None:
+        _seen_version = crud.get_latest_model_version(db)
+        return
+    
+    changed = crud.get_model_versions_since(db, _seen_version)
+    if not changed:
+        return
+    
+    with _lock:
+        for home_id, version in changed:
+            # Also bumps the generation: a build in flight may have read the model before this change
+            _snapshots.pop(home_id, None)
+            _generations[home_id] = _generations.get(home_id, 0) + 1
+            _seen_version = max(_seen_version, version)
+
+
+def warm_snapshots(limit: int) -> int:
+    """
+    Build snapshots for the homes whose model changed most recently.
+    
+    Run in the background after startup so the first inferences of active
+    homes don't pay for the build. Returns the number of snapshots built.
+    """
+    db = SessionLocal()
+    try:
+        home_ids = crud.get_recently_changed_homes(db, min(limit, settings.SNAPSHOT_CACHE_SIZE))
+        for home_id in reversed(home_ids):
+            # Oldest first, so the most recent homes end up last in the LRU order
+            get_snapshot(db, home_id)
+        return len(home_ids)
+    finally:
+        db.close()
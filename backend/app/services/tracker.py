@@ -0,0 +1,329 @@
+"""Temporal room tracking: a hidden Markov model over a home's rooms.
+
+Per-window classification flickers between rooms whenever two beacons are
+about as close to their means; clients used to suppress that with fixed
+confirmation timers, delaying every real room change. The tracker instead
+keeps a belief (probability per room) for each device and updates it with
+every scan by forward filtering:
+
+    prior     = belief after the time since the last scan has passed
+    posterior ∝ prior * emission(readings)
+
+- Transitions are learned from the home's location events: how long each
+  room's dwells last (the rate at which a room is left) and which room
+  follows which for the same device. With dt seconds between scans the
+  probability of staying in room i is exp(-dt / mean_dwell_i), and the rest
+  of its mass moves to other rooms in proportion to the learned transition
+  counts (Laplace-smoothed). One step is O(rooms²).
+- Emissions use the classifier's own score: the distance between a room's
+  beacon reading and its calibrated mean, as a Gaussian with
+  TRACKER_EMISSION_SCALE_DB; a beacon that wasn't heard counts as
+  TRACKER_MISSING_DB away.
+
+Learning reads TRACKER_HISTORY_DAYS of events, so it never runs inside a
+request: a model that is missing, stale (TRACKER_REFRESH_S) or of another
+snapshot is relearned by a small pool of TRACKER_LEARN_WORKERS threads
+(homes queue, so a burst of model changes doesn't scan every history at
+once; a failed model is retried after TRACKER_REFRESH_S). Meanwhile a stale
+model keeps serving, and a new snapshot gets the previous model's dynamics
+(same rooms) or the prior. Each device's belief is updated under its own lock, so
+concurrent scans of one device are folded in one after another.
+
+A clear move wins on the first or second scan (no fixed dwell threshold),
+while a single ambiguous scan doesn't flip the estimate. Device beliefs
+restart after TRACKER_RESET_S without scans or when the home's model
+changes, and the least recently seen devices are evicted beyond
+TRACKER_MAX_DEVICES.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.core.metrics import CACHE_REQUESTS, STAGE_SECONDS
+from app.db import crud
+from app.db.session import SessionLocal
+from app.schemas.common import BeaconReading
+
+settings = get_settings()
+
+# Consecutive events of a device further apart than this aren't counted as a direct move
+TRANSITION_MAX_GAP_S = 600
+
+
+class TransitionModel:
+    """
+    Learned room dynamics of a home.
+    
+    States are the home's beacons (one per room) in sorted order; `means`
+    holds their calibrated RSSI, `leave_rate` the inverse mean dwell time
+    in seconds and `jump[i, j]` the probability that leaving room i leads
+    to room j.
+    """
+    
+    __slots__ = ("home_id", "version", "beacons", "index", "means", "leave_rate", "jump", "built_at")
+    
+    def __init__(self, home_id: str, version: str, beacons: List[str], means: np.ndarray,
+                 leave_rate: np.ndarray, jump: np.ndarray):
+        self.home_id = home_id
+        self.version = version
+        self.beacons = beacons
+        self.index = {beacon_id: i for i, beacon_id in enumerate(beacons)}
+        self.means = means
+        self.leave_rate = leave_rate
+        self.jump = jump
+        self.built_at = time.monotonic()
+    
+    def predict(self, belief: np.ndarray, dt: float) -> np.ndarray:
+        """Advance a belief by dt seconds."""
+        stay = np.exp(-max(dt, 0.0) * self.leave_rate)
+        return belief * stay + (belief * (1.0 - stay)) @ self.jump
+    
+    def emission_log_likelihood(self, readings: List[BeaconReading]) -> np.ndarray:
+        """Log-likelihood of the readings in each room (up to a constant)."""
+        distances = np.full(len(self.beacons), settings.TRACKER_MISSING_DB)
+        indices = [self.index.get(reading.beacon_id) for reading in readings]
+        heard = [(i, reading.rssi) for i, reading in zip(indices, readings) if i is not None]
+        if heard:
+            rows, rssi = zip(*heard)
+            rows = np.fromiter(rows, dtype=np.intp, count=len(rows))
+            distances[rows] = np.minimum(
+                np.abs(np.fromiter(rssi, dtype=np.float64, count=len(rssi)) - self.means[rows]),
+                settings.TRACKER_MISSING_DB
+            )
+        return -0.5 * (distances / settings.TRACKER_EMISSION_SCALE_DB) ** 2
+
+
+def _jump_matrix(counts: np.ndarray) -> np.ndarray:
+    """Row-normalized transition counts."""
+    row_sums = counts.sum(axis=1, keepdims=True)
+    # A single-room home has nowhere to go: leaving mass stays put
+    return np.divide(counts, row_sums, out=np.eye(len(counts)), where=row_sums > 0)
+
+
+def prior_transitions(snapshot, previous: Optional[TransitionModel] = None) -> TransitionModel:
+    """
+    Transitions to serve for a snapshot until its learned ones are ready.
+    
+    Args:
+        snapshot: The home's ModelSnapshot
+        previous: The home's model for an earlier snapshot, whose dynamics
+            are kept if it has the same rooms (e.g. after online adaptation)
+    
+    Returns:
+        TransitionModel with the previous dynamics, or TRACKER_MEAN_DWELL_S
+        dwells and uniform moves
+    """
+    beacons = sorted(snapshot.centroids)
+    means = np.array([snapshot.centroids[beacon_id] for beacon_id in beacons], dtype=np.float64)
+    if previous is not None and previous.beacons == beacons:
+        return TransitionModel(snapshot.home_id, snapshot.version, beacons, means, previous.leave_rate, previous.jump)
+    n_rooms = len(beacons)
+    return TransitionModel(
+        snapshot.home_id, snapshot.version, beacons, means,
+        np.full(n_rooms, 1.0 / settings.TRACKER_MEAN_DWELL_S), _jump_matrix(np.ones((n_rooms, n_rooms)) - np.eye(n_rooms))
+    )
+
+
+def learn_transitions(db: Session, snapshot, now: Optional[float] = None) -> TransitionModel:
+    """
+    Estimate dwell times and room-to-room transitions from recent location events.
+    
+    Args:
+        db: Database session
+        snapshot: The home's ModelSnapshot (defines the rooms and their means)
+        now: Current time (defaults to time.time())
+    
+    Returns:
+        TransitionModel over the snapshot's beacons
+    """
+    now = time.time() if now is None else now
+    beacons = sorted(snapshot.centroids)
+    index = {beacon_id: i for i, beacon_id in enumerate(beacons)}
+    n_rooms = len(beacons)
+    
+    # One pseudo-dwell of the default length and one pseudo-transition to every other room
+    dwell_total = np.full(n_rooms, settings.TRACKER_MEAN_DWELL_S)
+    dwell_count = np.ones(n_rooms)
+    counts = np.ones((n_rooms, n_rooms)) - np.eye(n_rooms)
+    
+    last: Dict[Optional[str], Tuple[int, int]] = {}
+    since = int(now - settings.TRACKER_HISTORY_DAYS * 86400)
+    for _, _, device_id, _, beacon_id, start_ts, end_ts, _ in crud.iter_event_rows(db, snapshot.home_id, since):
+        i = index.get(beacon_id)
+        if i is None:
+            continue
+        dwell_total[i] += max(end_ts - start_ts, 0)
+        dwell_count[i] += 1
+        previous = last.get(device_id)
+        if previous is not None and previous[0] != i and start_ts - previous[1] <= TRANSITION_MAX_GAP_S:
+            counts[previous[0], i] += 1
+        last[device_id] = (i, end_ts)
+    
+    means = np.array([snapshot.centroids[beacon_id] for beacon_id in beacons], dtype=np.float64)
+    return TransitionModel(
+        snapshot.home_id, snapshot.version, beacons, means, dwell_count / dwell_total, _jump_matrix(counts)
+    )
+
+
+class _DeviceState:
+    """A device's belief; `lock` serializes its updates."""
+    
+    __slots__ = ("lock", "version", "belief", "ts")
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.version: Optional[str] = None
+        self.belief: Optional[np.ndarray] = None
+        self.ts = 0.0
+
+
+class RoomTracker:
+    """Transition models per home and beliefs per device."""
+    
+    def __init__(self, max_devices: int):
+        self.max_devices = max_devices
+        self._models: Dict[str, TransitionModel] = {}
+        self._devices: "OrderedDict[Tuple[str, str], _DeviceState]" = OrderedDict()
+        # (home_id, snapshot version) of the models queued or being learned
+        self._learning: Set[Tuple[str, str]] = set()
+        # home_id -> (snapshot version, monotonic time) of its last failed learning
+        self._failed: Dict[str, Tuple[str, float]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+    
+    def model_for(self, snapshot) -> TransitionModel:
+        """
+        Get the home's transition model without touching the database.
+        
+        A missing, stale or outdated model is relearned in the background;
+        until then the stale model, or prior_transitions, is served.
+        """
+        model = self._models.get(snapshot.home_id)
+        current = model is not None and model.version == snapshot.version
+        if current and time.monotonic() - model.built_at < settings.TRACKER_REFRESH_S:
+            CACHE_REQUESTS.labels("transitions", "hit").inc()
+            return model
+        
+        CACHE_REQUESTS.labels("transitions", "miss").inc()
+        if not current:
+            prior = prior_transitions(snapshot, model)
+            with self._lock:
+                # Installed before learning starts, so it can't replace the learned model
+                model = self._models.get(snapshot.home_id)
+                if model is None or model.version != snapshot.version:
+                    model = self._models[snapshot.home_id] = prior
+        self._learn_later(snapshot)
+        return model
+    
+    def _learn_later(self, snapshot) -> None:
+        """Queue a snapshot's transitions for learning (once at a time, not soon after a failure)."""
+        key = (snapshot.home_id, snapshot.version)
+        with self._lock:
+            if key in self._learning:
+                return
+            failed = self._failed.get(snapshot.home_id)
+            if (failed is not None and failed[0] == snapshot.version
+                    and time.monotonic() - failed[1] < settings.TRACKER_REFRESH_S):
+                return
+            self._learning.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(settings.TRACKER_LEARN_WORKERS, 1), thread_name_prefix="tracker-learn"
+                )
+            self._executor.submit(self._learn, snapshot)
+    
+    def _learn(self, snapshot) -> None:
+        with self._lock:
+            served = self._models.get(snapshot.home_id)
+            if served is not None and served.version != snapshot.version:
+                # Superseded by a newer snapshot while queued
+                self._learning.discard((snapshot.home_id, snapshot.version))
+                return
+        db = SessionLocal()
+        try:
+            with STAGE_SECONDS.labels("tracker_learn").time():
+                model = learn_transitions(db, snapshot)
+            with self._lock:
+                served = self._models.get(snapshot.home_id)
+                # Unless a newer snapshot was served meanwhile
+                if served is None or served.version == model.version:
+                    self._models[snapshot.home_id] = model
+                self._failed.pop(snapshot.home_id, None)
+        except Exception as e:
+            print(f"Tracker transitions of home '{snapshot.home_id}' failed: {e}")
+            with self._lock:
+                self._failed[snapshot.home_id] = (snapshot.version, time.monotonic())
+        finally:
+            db.close()
+            with self._lock:
+                self._learning.discard((snapshot.home_id, snapshot.version))
+    
+    def update(
+        self,
+        snapshot,
+        device_id: str,
+        readings: List[BeaconReading],
+        ts: Optional[float] = None
+    ) -> Tuple[str, float]:
+        """
+        Fold one scan into a device's belief.
+        
+        Args:
+            snapshot: The home's ModelSnapshot
+            device_id: Device that scanned the readings
+            readings: Beacon readings of the scan
+            ts: Scan time in Unix seconds (defaults to now)
+        
+        Returns:
+            Tuple of (beacon_id, probability) of the most likely room
+        """
+        model = self.model_for(snapshot)
+        ts = time.time() if ts is None else ts
+        key = (snapshot.home_id, device_id)
+        
+        with STAGE_SECONDS.labels("tracker_update").time():
+            log_likelihood = model.emission_log_likelihood(readings)
+            likelihood = np.exp(log_likelihood - log_likelihood.max())
+            
+            with self._lock:
+                state = self._devices.get(key)
+                if state is None:
+                    state = self._devices[key] = _DeviceState()
+                self._devices.move_to_end(key)
+                while len(self._devices) > self.max_devices:
+                    self._devices.popitem(last=False)
+            
+            with state.lock:
+                if state.belief is None or state.version != model.version or ts - state.ts > settings.TRACKER_RESET_S:
+                    posterior = likelihood
+                else:
+                    posterior = model.predict(state.belief, ts - state.ts) * likelihood
+                    if not posterior.sum() > 0:
+                        posterior = likelihood
+                posterior = posterior / posterior.sum()
+                state.version = model.version
+                state.belief = posterior
+                state.ts = max(ts, state.ts)
+        
+        best = int(posterior.argmax())
+        return (model.beacons[best], float(posterior[best]))
+    
+    def forget(self, home_id: str, device_id: str) -> None:
+        """Drop a device's belief (e.g. when it stops tracking)."""
+        with self._lock:
+            self._devices.pop((home_id, device_id), None)
+
+
+_tracker: Optional[RoomTracker] = None
+
+
+def get_tracker() -> RoomTracker:
+    """Get the process-wide room tracker."""
+    global _tracker
+    if _tracker is None:
+        _tracker = RoomTracker(settings.TRACKER_MAX_DEVICES)
+    return _tracker
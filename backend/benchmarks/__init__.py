@@ -0,0 +1 @@
+"""Benchmarks for the HomeSense backend hot paths (run from backend/: python -m benchmarks.run)."""
@@ -0,0 +1,64 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json current.json [--threshold 0.10]
+
+Exits with status 1 if any benchmark's p50 latency regressed by more than
+the threshold (a fraction, 0.10 = 10%).
+"""
+from typing import Dict, List
+import json
+import sys
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """
+    Compare per-benchmark p50 latency between two result documents.
+    
+    Returns:
+        One row per benchmark present in both, with the relative change and
+        whether it is a regression beyond the threshold
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["p50_ms"]:
+            continue
+        change = (result["p50_ms"] - base["p50_ms"]) / base["p50_ms"]
+        rows.append({
+            "name": name,
+            "baseline_p50_ms": base["p50_ms"],
+            "current_p50_ms": result["p50_ms"],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict]) -> None:
+    """Print a comparison table."""
+    print(f"{'benchmark':<28} {'baseline p50':>14} {'current p50':>14} {'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<28} {row['baseline_p50_ms']:>12.3f}ms {row['current_p50_ms']:>12.3f}ms "
+            f"{row['change']:>+8.1%}{flag}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed p50 slowdown (fraction)")
+    args = parser.parse_args()
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    
+    rows = compare_results(baseline, current, args.threshold)
+    print_comparison(rows)
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
@@ -0,0 +1,334 @@
+"""Load generator simulating a fleet of phones against a running backend.
+
+Each simulated device follows the Flutter client: it scans and POSTs
+/infer every few seconds, confirms room changes, logs a dwell event for
+the room it leaves (if it stayed at least 15 s), requests /suggest on each
+room change and opens the daily insights occasionally.
+
+The device count ramps through the given stages; for each stage the
+report has throughput, error counts and p50/p95/p99 latency per endpoint.
+
+    # Against a backend you started yourself (uvicorn app.main:app)
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --setup --devices 10,50,100,200
+    
+    # Spawn a local uvicorn with a throwaway database
+    python -m benchmarks.loadgen --spawn --devices 10,50,100 --stage-duration 30 --out load.json
+"""
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import synthetic
+
+# Client behaviour (FlutterApp/lib/pages/suggestions_page.dart, services/location_tracker.dart)
+SCAN_INTERVAL_S = 5.0
+DWELL_THRESHOLD_S = 15
+REQUEST_TIMEOUT_S = 5.0
+INSIGHTS_INTERVAL_S = 120.0
+
+# Probability per scan that the simulated person walks to another room
+MOVE_PROBABILITY = 0.08
+
+
+class Recorder:
+    """Collects per-endpoint latencies and errors for the current stage."""
+    
+    def __init__(self):
+        self.requests: Dict[str, int] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.started = time.perf_counter()
+    
+    def reset(self):
+        """Start a new stage."""
+        self.requests = {}
+        self.latencies = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+    
+    async def call(self, endpoint: str, request) -> Optional[httpx.Response]:
+        """Await a request, recording its latency or error kind."""
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.TimeoutException:
+            self._error(endpoint, "timeout")
+            return None
+        except httpx.HTTPError as e:
+            self._error(endpoint, type(e).__name__)
+            return None
+        
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self._error(endpoint, str(response.status_code))
+            return None
+        return response
+    
+    def _error(self, endpoint: str, kind: str):
+        errors = self.errors.setdefault(endpoint, {})
+        errors[kind] = errors.get(kind, 0) + 1
+    
+    def report(self, devices: int) -> Dict:
+        """Summarize the current stage."""
+        elapsed = time.perf_counter() - self.started
+        endpoints = {}
+        all_latencies: List[float] = []
+        total_errors = 0
+        
+        for endpoint in sorted(self.requests):
+            latencies = self.latencies.get(endpoint, [])
+            errors = self.errors.get(endpoint, {})
+            all_latencies.extend(latencies)
+            total_errors += sum(errors.values())
+            endpoints[endpoint] = {
+                "requests": self.requests[endpoint],
+                "errors": errors,
+                **_percentiles(latencies),
+            }
+        
+        requests = sum(self.requests.values())
+        return {
+            "devices": devices,
+            "duration_s": round(elapsed, 1),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+            "errors": total_errors,
+            "error_rate": round(total_errors / requests, 4) if requests else 0.0,
+            **_percentiles(all_latencies),
+            "endpoints": endpoints,
+        }
+
+
+def _percentiles(samples: List[float]) -> Dict:
+    """p50/p95/p99 latency in ms."""
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        f"p{p}_ms": round(ordered[min(int(p / 100 * n), n - 1)] * 1000, 2)
+        for p in (50, 95, 99)
+    }
+
+
+class Device:
+    """One simulated phone."""
+    
+    def __init__(self, device_id: str, prefix: str, rooms: List[str], beacons: List[str],
+                 means: List[float], scan_interval: float, insights_interval: float, seed: int):
+        self.device_id = device_id
+        self.prefix = prefix
+        self.rooms = rooms
+        self.beacons = beacons
+        self.means = means
+        self.scan_interval = scan_interval
+        self.insights_interval = insights_interval
+        self.rng = random.Random(seed)
+        self.true_room = self.rng.randrange(len(rooms))
+        self.confirmed: Optional[str] = None
+        self.confirmed_since = 0.0
+        self.confidences: List[float] = []
+        self.recent_rooms: List[str] = []
+    
+    def _readings(self) -> Dict:
+        """Scan result: the current room's beacon at its calibrated level plus weaker neighbours."""
+        visible = {self.true_room} | {self.rng.randrange(len(self.rooms)) for _ in range(2)}
+        return {
+            "readings": [
+                {
+                    "beacon_id": self.beacons[i],
+                    "rssi": round(self.rng.gauss(self.means[i] - (0 if i == self.true_room else 15), 4.0), 1),
+                }
+                for i in sorted(visible)
+            ]
+        }
+    
+    async def run(self, client: httpx.AsyncClient, recorder: Recorder, stop: asyncio.Event):
+        # Phones don't start in lockstep
+        await asyncio.sleep(self.rng.uniform(0, self.scan_interval))
+        next_insights = time.time() + self.rng.uniform(0, self.insights_interval)
+        
+        while not stop.is_set():
+            if self.rng.random() < MOVE_PROBABILITY:
+                self.true_room = self.rng.randrange(len(self.rooms))
+            
+            response = await recorder.call("infer", client.post(f"{self.prefix}/infer", json=self._readings()))
+            if response is not None:
+                result = response.json()
+                await self._on_inference(client, recorder, result["room"], result["confidence"])
+            
+            now = time.time()
+            if now >= next_insights:
+                today = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+                await recorder.call("insights", client.get(f"{self.prefix}/insights/daily", params={"date": today}))
+                next_insights = now + self.insights_interval * self.rng.uniform(0.5, 1.5)
+            
+            await asyncio.sleep(self.scan_interval * self.rng.uniform(0.8, 1.2))
+    
+    async def _on_inference(self, client: httpx.AsyncClient, recorder: Recorder, room: str, confidence: float):
+        now = time.time()
+        if room == self.confirmed:
+            self.confidences.append(confidence)
+            return
+        
+        # Room changed: log the dwell we're leaving, then ask for a suggestion
+        if self.confirmed and self.confirmed != "unknown" and now - self.confirmed_since >= DWELL_THRESHOLD_S:
+            event = synthetic.event(self.confirmed, int(self.confirmed_since), 0, self.device_id)
+            event["end_ts"] = int(now)
+            event["confidence"] = sum(self.confidences) / len(self.confidences) if self.confidences else confidence
+            await recorder.call("events", client.post(f"{self.prefix}/events/location", json=event))
+            self.recent_rooms = ([self.confirmed] + [r for r in self.recent_rooms if r != self.confirmed])[:5]
+        
+        self.confirmed = room
+        self.confirmed_since = now
+        self.confidences = [confidence]
+        
+        body = {
+            "room": room,
+            "local_time": datetime.fromtimestamp(now).strftime("%a %H:%M"),
+            "recent_rooms": self.recent_rooms or None,
+        }
+        await recorder.call("suggest", client.post(f"{self.prefix}/suggest", json=body))
+
+
+async def setup_home(client: httpx.AsyncClient, prefix: str, rooms: List[str], beacons: List[str],
+                     means: List[float], n_samples: int, seed: int) -> None:
+    """Calibrate every room of the home and fit centroids."""
+    rng = random.Random(seed)
+    for room, beacon_id, mean in zip(rooms, beacons, means):
+        window = synthetic.calibration_window(room, beacon_id, mean, n_samples, rng)
+        (await client.post(f"{prefix}/calibration/upload", json=window)).raise_for_status()
+    (await client.post(f"{prefix}/calibration/fit")).raise_for_status()
+
+
+async def run_load(args) -> List[Dict]:
+    """Ramp the device count through the stages and report each one."""
+    rng = random.Random(args.seed)
+    rooms = synthetic.room_names(args.rooms)
+    beacons = synthetic.beacon_ids(args.rooms)
+    means = synthetic.room_means(args.rooms, rng)
+    prefix = f"/homes/{args.home}"
+    stages = [int(n) for n in args.devices.split(",")]
+    
+    limits = httpx.Limits(max_connections=max(stages), max_keepalive_connections=max(stages))
+    async with httpx.AsyncClient(base_url=args.url, timeout=REQUEST_TIMEOUT_S, limits=limits) as client:
+        if args.setup:
+            await setup_home(client, prefix, rooms, beacons, means, args.samples, args.seed)
+        
+        recorder = Recorder()
+        stop = asyncio.Event()
+        tasks = []
+        reports = []
+        
+        try:
+            for n_devices in stages:
+                while len(tasks) < n_devices:
+                    device = Device(
+                        f"loadgen-{len(tasks):05d}", prefix, rooms, beacons, means,
+                        args.scan_interval, args.insights_interval, args.seed + len(tasks)
+                    )
+                    tasks.append(asyncio.create_task(device.run(client, recorder, stop)))
+                
+                recorder.reset()
+                await asyncio.sleep(args.stage_duration)
+                report = recorder.report(n_devices)
+                reports.append(report)
+                _print_stage(report)
+        finally:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    return reports
+
+
+def _print_stage(report: Dict) -> None:
+    print(
+        f"devices={report['devices']:<5} rps={report['throughput_rps']:<8} "
+        f"errors={report['errors']:<5} ({report['error_rate']:.2%}) "
+        f"p50={report['p50_ms']}ms p95={report['p95_ms']}ms p99={report['p99_ms']}ms"
+    )
+    for endpoint, stats in report["endpoints"].items():
+        errors = f" errors={stats['errors']}" if stats["errors"] else ""
+        print(
+            f"    {endpoint:<9} n={stats['requests']:<6} p50={stats['p50_ms']}ms "
+            f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms{errors}"
+        )
+
+
+def spawn_server(port: int, workers: int = 1) -> subprocess.Popen:
+    """
+    Start uvicorn on a throwaway SQLite database and wait until it's healthy.
+    
+    The LLM key is cleared so /suggest exercises the rule-based fallback
+    instead of a remote API.
+    """
+    db_dir = tempfile.mkdtemp(prefix="homesense-load-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_dir}/load.db", MODEL_DIR=f"{db_dir}/models", LLM_API_KEY="")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 30 s")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Simulate a fleet of phones against the HomeSense API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn with a throwaway database")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--setup", action="store_true", help="Calibrate and fit the home first (implied by --spawn)")
+    parser.add_argument("--home", default="loadgen", help="Home the devices belong to")
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=300, help="Calibration samples per room for --setup")
+    parser.add_argument("--devices", default="10,50,100,200", help="Comma-separated device counts to ramp through")
+    parser.add_argument("--stage-duration", type=float, default=30.0, help="Seconds per stage")
+    parser.add_argument("--scan-interval", type=float, default=SCAN_INTERVAL_S, help="Seconds between /infer calls")
+    parser.add_argument("--insights-interval", type=float, default=INSIGHTS_INTERVAL_S)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write stage reports as JSON here")
+    args = parser.parse_args()
+    
+    server = None
+    if args.spawn:
+        server = spawn_server(args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+        args.setup = True
+    
+    try:
+        reports = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"params": vars(args), "stages": reports}, f, indent=2)
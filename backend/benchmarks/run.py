@@ -0,0 +1,327 @@
+"""Reproducible benchmarks for the backend hot paths.
+
+Builds a synthetic home (N rooms/beacons, K calibration samples per beacon,
+E events per day) in a throwaway SQLite database and measures latency and
+throughput of:
+
+- infer_room (pure classifier) and the kNN classifier over a memory-mapped
+  index of --knn-samples reference samples per beacon
+- fit_centroids (service + database)
+- decoding an /infer body: JSON objects validated by pydantic vs compact
+  [beacon_id, rssi] pairs and slots
+- POST /infer, POST /calibration/upload, POST /events/location,
+  GET /insights/daily and POST /suggest through the full ASGI stack, and
+  POST /infer and /infer/batch (64 scans) in MessagePack slot form when
+  msgpack is installed (the `wire` extra)
+
+The LLM is stubbed with a local transport, so results don't depend on the
+network. Run from backend/:
+
+    python -m benchmarks.run --out results.json
+    python -m benchmarks.run --baseline results-main.json   # exit 1 on regression
+"""
+import os
+import sys
+import tempfile
+
+# Benchmarks run against a throwaway database and a stubbed LLM; this must
+# happen before app settings are first loaded
+_DB_DIR = tempfile.mkdtemp(prefix="homesense-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/bench.db"
+os.environ["LLM_API_KEY"] = "benchmark-stub"
+os.environ["MODEL_DIR"] = f"{_DB_DIR}/models"
+
+from typing import Awaitable, Callable, Dict, List
+from datetime import datetime
+from pathlib import Path
+import asyncio
+import itertools
+import json
+import platform
+import random
+import struct
+import subprocess
+import time
+
+import httpx
+
+from app.api.routes.infer import parse_scan
+from app.db.init_db import init_db
+from app.db.session import SessionLocal
+from app.schemas.common import BeaconReading
+from app.services import llm
+from app.services.centroid import fit_centroids
+from app.services.classifier import infer_room
+from app.services.fingerprint import FingerprintIndex
+from app.services.snapshot import get_snapshot
+from benchmarks import synthetic
+from benchmarks.compare import compare_results, print_comparison
+
+HOME_ID = "bench"
+BENCH_DATE = "2025-11-10"
+
+
+# ============================================================================
+# LLM stub
+# ============================================================================
+
+def _llm_handler(request: httpx.Request) -> httpx.Response:
+    """Answer LLM calls locally in both provider response shapes."""
+    text = '{"likely_activity": "Benchmarking", "suggestion": "Stubbed suggestion."}'
+    return httpx.Response(200, json={
+        "candidates": [{"content": {"parts": [{"text": text}]}}],
+        "choices": [{"message": {"content": text}}],
+    })
+
+
+def _stub_async_client(**kwargs) -> httpx.AsyncClient:
+    """Stands in for app.services.llm._async_client."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(_llm_handler), **kwargs)
+
+
+# ============================================================================
+# Timing harness
+# ============================================================================
+
+def _summarize(samples: List[float]) -> Dict:
+    """Latency percentiles (ms) and throughput from per-call durations (s)."""
+    ordered = sorted(samples)
+    n = len(ordered)
+    
+    def pct(p: float) -> float:
+        return ordered[min(int(p * n), n - 1)] * 1000
+    
+    total = sum(ordered)
+    return {
+        "iterations": n,
+        "ops_per_s": round(n / total, 1) if total else None,
+        "mean_ms": round(total / n * 1000, 4),
+        "p50_ms": round(pct(0.50), 4),
+        "p95_ms": round(pct(0.95), 4),
+        "p99_ms": round(pct(0.99), 4),
+    }
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 5) -> Dict:
+    """Time a synchronous callable."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return _summarize(samples)
+
+
+async def measure_async(fn: Callable[[], Awaitable[object]], iterations: int, warmup: int = 5) -> Dict:
+    """Time an async callable, sequentially."""
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return _summarize(samples)
+
+
+# ============================================================================
+# Benchmarks
+# ============================================================================
+
+async def run_benchmarks(n_rooms: int, n_samples: int, events_per_day: int, iterations: int, seed: int,
+                         knn_samples: int = 20000) -> Dict:
+    """Populate a synthetic home and run every benchmark against it."""
+    from app.main import app
+    
+    init_db()
+    llm._async_client = _stub_async_client
+    
+    rng = random.Random(seed)
+    day_start = int(datetime.strptime(BENCH_DATE, "%Y-%m-%d").timestamp())
+    
+    db = SessionLocal()
+    try:
+        home = synthetic.populate_home(db, HOME_ID, n_rooms, n_samples, events_per_day, day_start, seed=seed)
+    finally:
+        db.close()
+    
+    beacons, means, rooms = home["beacons"], home["means"], home["rooms"]
+    centroids = dict(zip(beacons, means))
+    results = {}
+    
+    # Pure classifier
+    readings = [BeaconReading(**r) for r in synthetic.readings(beacons, means, rng)["readings"]]
+    results["infer_room"] = measure(lambda: infer_room(readings, centroids), iterations * 10)
+    
+    # kNN classifier over a large memory-mapped index (knn_samples reference samples per beacon)
+    index_dir = Path(_DB_DIR) / "knn"
+    index_dir.mkdir(exist_ok=True)
+    FingerprintIndex.build(
+        {beacon_id: [rng.gauss(mean, 3.0) for _ in range(knn_samples)] for beacon_id, mean in centroids.items()},
+        "bench"
+    ).save(index_dir)
+    index = FingerprintIndex.load(index_dir, "bench")
+    results["infer_room_knn"] = measure(lambda: index.classify(readings, 15, 10.0), iterations * 10)
+    
+    # Fit (reads all calibration windows, upserts every centroid)
+    def fit():
+        db = SessionLocal()
+        try:
+            fit_centroids(db, HOME_ID)
+        finally:
+            db.close()
+    results["fit_centroids"] = measure(fit, max(iterations // 10, 5), warmup=1)
+    
+    # Body decoding (what each /infer request pays before classifying)
+    db = SessionLocal()
+    try:
+        snapshot = get_snapshot(db, HOME_ID)
+    finally:
+        db.close()
+    scan = synthetic.readings(beacons, means, rng)
+    scan_json = json.dumps(scan).encode()
+    pairs = {"readings": [[r["beacon_id"], r["rssi"]] for r in scan["readings"]]}
+    rssi = {r["beacon_id"]: r["rssi"] for r in scan["readings"]}
+    slots = {"version": snapshot.version, "slots": [rssi.get(beacon_id) for beacon_id in snapshot.beacons]}
+    results["parse_infer_json"] = measure(lambda: parse_scan(json.loads(scan_json), snapshot), iterations * 10)
+    results["parse_infer_pairs"] = measure(lambda: parse_scan(pairs, snapshot), iterations * 10)
+    results["parse_infer_slots"] = measure(lambda: parse_scan(slots, snapshot), iterations * 10)
+    
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        prefix = f"/homes/{HOME_ID}"
+        bodies = itertools.cycle([synthetic.readings(beacons, means, rng) for _ in range(64)])
+        
+        async def post_infer():
+            response = await client.post(f"{prefix}/infer", json=next(bodies))
+            response.raise_for_status()
+        results["api_infer"] = await measure_async(post_infer, iterations)
+        
+        if msgpack is not None:
+            # Slots in GET /infer/slots order
+            slot_means = [centroids[beacon_id] for beacon_id in snapshot.beacons]
+            packed = itertools.cycle([
+                msgpack.packb({
+                    "version": snapshot.version,
+                    "slots": struct.pack(f"<{len(slot_means)}f", *(rng.gauss(mean, 4.0) for mean in slot_means)),
+                })
+                for _ in range(64)
+            ])
+            headers = {"content-type": "application/msgpack"}
+            
+            async def post_infer_msgpack():
+                response = await client.post(f"{prefix}/infer", content=next(packed), headers=headers)
+                response.raise_for_status()
+            results["api_infer_msgpack"] = await measure_async(post_infer_msgpack, iterations)
+            
+            batch = msgpack.packb({"version": snapshot.version, "scans": [msgpack.unpackb(next(packed)) for _ in range(64)]})
+            
+            async def post_infer_batch():
+                response = await client.post(f"{prefix}/infer/batch", content=batch, headers=headers)
+                response.raise_for_status()
+            results["api_infer_batch_64"] = await measure_async(post_infer_batch, max(iterations // 10, 5))
+        
+        # Re-upload existing beacons so the home's shape doesn't change
+        windows = itertools.cycle([
+            synthetic.calibration_window(room, beacon_id, mean, n_samples, rng)
+            for room, beacon_id, mean in zip(rooms, beacons, means)
+        ])
+        
+        async def upload():
+            response = await client.post(f"{prefix}/calibration/upload", json=next(windows))
+            response.raise_for_status()
+        results["api_calibration_upload"] = await measure_async(upload, max(iterations // 4, 5))
+        
+        # Ingest events on the day after the insights day so the latter stays fixed
+        next_start = itertools.count(day_start + 86400, 30)
+        
+        async def ingest():
+            event = synthetic.event(rng.choice(rooms), next(next_start), 25, "device-bench")
+            response = await client.post(f"{prefix}/events/location", json=event)
+            response.raise_for_status()
+        results["api_event_ingest"] = await measure_async(ingest, iterations)
+        
+        async def insights():
+            response = await client.get(f"{prefix}/insights/daily", params={"date": BENCH_DATE})
+            response.raise_for_status()
+        results["api_insights_daily"] = await measure_async(insights, max(iterations // 4, 5))
+        
+        async def suggest():
+            response = await client.post(f"{prefix}/suggest", json={"room": rooms[0], "local_time": "Tue 08:15"})
+            response.raise_for_status()
+        results["api_suggest"] = await measure_async(suggest, iterations)
+    
+    return results
+
+
+def _git_commit() -> str:
+    """Short hash of the checked-out commit, if available."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark HomeSense backend hot paths")
+    parser.add_argument("--rooms", type=int, default=12, help="Rooms (and beacons) in the synthetic home")
+    parser.add_argument("--samples", type=int, default=600, help="Calibration samples per beacon")
+    parser.add_argument("--events", type=int, default=2000, help="Location events in the benchmark day")
+    parser.add_argument("--knn-samples", type=int, default=20000, help="Reference samples per beacon in the kNN index")
+    parser.add_argument("--iterations", type=int, default=200, help="Base iteration count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed p50 slowdown vs baseline")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run_benchmarks(
+        args.rooms, args.samples, args.events, args.iterations, args.seed, args.knn_samples
+    ))
+    document = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "rooms": args.rooms,
+                "samples": args.samples,
+                "events": args.events,
+                "knn_samples": args.knn_samples,
+                "iterations": args.iterations,
+                "seed": args.seed,
+            },
+        },
+        "results": results,
+    }
+    
+    print(f"{'benchmark':<28} {'ops/s':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<28} {result['ops_per_s']:>10} {result['p50_ms']:>8.3f}ms "
+            f"{result['p95_ms']:>8.3f}ms {result['p99_ms']:>8.3f}ms"
+        )
+    
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(document, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, document, args.threshold)
+        print()
+        print_comparison(rows)
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
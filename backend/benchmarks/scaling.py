@@ -0,0 +1,145 @@
+"""Throughput scaling of /infer with the number of uvicorn workers.
+
+For each worker count, spawns a local uvicorn (see benchmarks.loadgen) on
+a throwaway database, calibrates one home, then drives closed-loop /infer
+traffic from several client processes (so the load generator itself isn't
+the bottleneck) and reports requests per second, speedup and parallel
+efficiency relative to the first worker count.
+
+    python -m benchmarks.scaling --workers 1,2,4 --clients 4 --concurrency 16 --duration 15
+
+Scaling is bounded by the machine's cores: client processes compete with
+the workers for CPU, so run it on a host with more cores than workers plus
+clients for meaningful numbers.
+"""
+from multiprocessing import get_context
+from typing import Dict, List
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+
+from benchmarks import loadgen, synthetic
+
+
+def _client_process(url: str, prefix: str, beacons: List[str], means: List[float],
+                    concurrency: int, duration: float, seed: int, results) -> None:
+    """Run `concurrency` closed loops of /infer for `duration` seconds and report counts."""
+    
+    async def main():
+        requests = 0
+        errors = 0
+        latencies: List[float] = []
+        deadline = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        
+        async def loop(rng: random.Random):
+            nonlocal requests, errors
+            while time.perf_counter() < deadline:
+                body = synthetic.readings(beacons, means, rng)
+                start = time.perf_counter()
+                try:
+                    response = await client.post(f"{prefix}/infer", json=body)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                requests += 1
+                errors += not ok
+        
+        async with httpx.AsyncClient(base_url=url, timeout=loadgen.REQUEST_TIMEOUT_S, limits=limits) as client:
+            await asyncio.gather(*(loop(random.Random(seed * 1000 + i)) for i in range(concurrency)))
+        return requests, errors, latencies
+    
+    results.put(asyncio.run(main()))
+
+
+def measure(port: int, workers: int, args) -> Dict:
+    """Spawn a server with `workers` processes and measure closed-loop /infer throughput."""
+    rng = random.Random(args.seed)
+    rooms = synthetic.room_names(args.rooms)
+    beacons = synthetic.beacon_ids(args.rooms)
+    means = synthetic.room_means(args.rooms, rng)
+    prefix = "/homes/scaling"
+    url = f"http://127.0.0.1:{port}"
+    
+    server = loadgen.spawn_server(port, workers=workers)
+    try:
+        async def setup():
+            async with httpx.AsyncClient(base_url=url, timeout=30.0) as client:
+                await loadgen.setup_home(client, prefix, rooms, beacons, means, args.samples, args.seed)
+        asyncio.run(setup())
+        
+        context = get_context("spawn")
+        results = context.Queue()
+        clients = [
+            context.Process(
+                target=_client_process,
+                args=(url, prefix, beacons, means, args.concurrency, args.duration, args.seed + i, results),
+            )
+            for i in range(args.clients)
+        ]
+        for process in clients:
+            process.start()
+        outcomes = [results.get() for _ in clients]
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    
+    requests = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    latencies = [latency for outcome in outcomes for latency in outcome[2]]
+    return {
+        "workers": workers,
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / args.duration, 1),
+        **loadgen._percentiles(latencies),
+    }
+
+
+def add_speedup(results: List[Dict]) -> List[Dict]:
+    """Speedup and efficiency of each run relative to the first one."""
+    base = results[0]
+    for result in results:
+        speedup = result["rps"] / base["rps"] if base["rps"] else 0.0
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(speedup * base["workers"] / result["workers"], 2)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Measure /infer throughput against the number of uvicorn workers")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests per client process")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=300, help="Calibration samples per room")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write results as JSON here")
+    args = parser.parse_args()
+    
+    print(f"cores={os.cpu_count()} clients={args.clients} concurrency={args.concurrency}")
+    results = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        results.append(measure(args.port, workers, args))
+    
+    for result in add_speedup(results):
+        print(
+            f"workers={result['workers']:<3} rps={result['rps']:<8} speedup={result['speedup']:<5} "
+            f"efficiency={result['efficiency']:<5} errors={result['errors']} "
+            f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms"
+        )
+    
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"params": vars(args), "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
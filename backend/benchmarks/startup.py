@@ -0,0 +1,161 @@
+"""Import and startup time of the backend.
+
+Measures, each in fresh interpreter processes:
+- import: `import app.main` (wall time inside the process), plus the
+  slowest modules from `python -X importtime`
+- restart: from launching uvicorn on an existing database until /healthz
+  answers, and until the first /infer of a calibrated home answers, with
+  FAST_START on and off
+
+    python -m benchmarks.startup --runs 5 --out startup.json
+"""
+from typing import Dict, List
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import loadgen, synthetic
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def _stats(samples: List[float]) -> Dict:
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+def measure_import(env: Dict[str, str], runs: int) -> Dict:
+    """Wall time of `import app.main` in fresh interpreters."""
+    samples = [
+        float(subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1])
+        for _ in range(runs)
+    ]
+    return _stats(samples)
+
+
+def import_profile(env: Dict[str, str], top: int) -> List[Dict]:
+    """Slowest modules (cumulative import time) according to -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=True
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        modules.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(modules, key=lambda module: module["cumulative_ms"], reverse=True)[:top]
+
+
+def _wait_for(url: str, deadline: float, method: str = "GET", body: Dict = None) -> float:
+    """Poll an endpoint until it answers 200; returns the time it did."""
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.request(method, url, json=body, timeout=1.0).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer within the deadline")
+
+
+def measure_restart(env: Dict[str, str], port: int, infer_body: Dict, runs: int) -> Dict:
+    """Time from launching uvicorn to the first healthy response and the first inference."""
+    healthy: List[float] = []
+    first_infer: List[float] = []
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            deadline = started + 30
+            healthy.append((_wait_for(f"{base_url}/healthz", deadline) - started) * 1000)
+            first_infer.append(
+                (_wait_for(f"{base_url}/homes/startup/infer", deadline, "POST", infer_body) - started) * 1000
+            )
+        finally:
+            process.terminate()
+            process.wait()
+    return {"healthy": _stats(healthy), "first_infer": _stats(first_infer)}
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Measure backend import and restart time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to report")
+    parser.add_argument("--out", default=None, help="Write results as JSON here")
+    args = parser.parse_args()
+    
+    db_dir = tempfile.mkdtemp(prefix="homesense-startup-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_dir}/startup.db", MODEL_DIR=f"{db_dir}/models", LLM_API_KEY="")
+    
+    # Create and calibrate the database once; every restart below reuses it
+    rng = random.Random(0)
+    rooms = synthetic.room_names(args.rooms)
+    beacons = synthetic.beacon_ids(args.rooms)
+    means = synthetic.room_means(args.rooms, rng)
+    infer_body = synthetic.readings(beacons, means, rng)
+    
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{args.port}/healthz", time.perf_counter() + 30)
+        
+        async def setup():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=30.0) as client:
+                await loadgen.setup_home(client, "/homes/startup", rooms, beacons, means, 100, 0)
+        asyncio.run(setup())
+    finally:
+        server.terminate()
+        server.wait()
+    
+    results = {
+        "import": measure_import(env, args.runs),
+        "import_profile": import_profile(env, args.top),
+        "restart": {
+            "fast_start": measure_restart(dict(env, FAST_START="true"), args.port, infer_body, args.runs),
+            "no_warmup": measure_restart(dict(env, FAST_START="false"), args.port, infer_body, args.runs),
+        },
+    }
+    
+    print(f"import app.main: median {results['import']['median_ms']} ms")
+    for module in results["import_profile"]:
+        print(f"    {module['cumulative_ms']:>8.1f} ms  {module['module']}")
+    for mode, timings in results["restart"].items():
+        print(
+            f"restart ({mode}): healthy after {timings['healthy']['median_ms']} ms, "
+            f"first /infer after {timings['first_infer']['median_ms']} ms"
+        )
+    
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
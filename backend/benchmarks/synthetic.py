@@ -0,0 +1,108 @@
+"""Synthetic homes for benchmarks: rooms, beacons, calibration samples and events."""
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from app.db import crud
+import random
+
+
+def room_names(n_rooms: int) -> List[str]:
+    """Room names Room-00, Room-01, ..."""
+    return [f"Room-{i:02d}" for i in range(n_rooms)]
+
+
+def beacon_ids(n_beacons: int) -> List[str]:
+    """Beacon ids B000, B001, ..."""
+    return [f"B{i:03d}" for i in range(n_beacons)]
+
+
+def room_means(n_rooms: int, rng: random.Random) -> List[float]:
+    """Calibrated mean RSSI per room, spread over a realistic range."""
+    return [rng.uniform(-85.0, -55.0) for _ in range(n_rooms)]
+
+
+def calibration_window(room: str, beacon_id: str, mean: float, n_samples: int, rng: random.Random) -> Dict:
+    """A /calibration/upload body with normally distributed samples."""
+    return {
+        "beacon_id": beacon_id,
+        "room": room,
+        "rssi_samples": [round(rng.gauss(mean, 3.0), 1) for _ in range(n_samples)],
+        "window_start": 1731090000,
+        "window_end": 1731090000 + max(n_samples // 2, 1),
+    }
+
+
+def readings(beacons: List[str], means: List[float], rng: random.Random) -> Dict:
+    """An /infer body with one noisy reading per beacon."""
+    return {
+        "readings": [
+            {"beacon_id": beacon_id, "rssi": round(rng.gauss(mean, 4.0), 1)}
+            for beacon_id, mean in zip(beacons, means)
+        ]
+    }
+
+
+def event(room: str, start_ts: int, duration: int, device_id: str) -> Dict:
+    """A /events/location body."""
+    return {
+        "room": room,
+        "start_ts": start_ts,
+        "end_ts": start_ts + duration,
+        "confidence": 0.9,
+        "device_id": device_id,
+    }
+
+
+def populate_home(
+    db: Session,
+    home_id: str,
+    n_rooms: int,
+    n_samples: int,
+    events_per_day: int,
+    day_start_ts: int,
+    n_devices: int = 2,
+    seed: int = 0
+) -> Dict:
+    """
+    Fill a home with calibration windows and one day of events, then fit it.
+    
+    Rooms and beacons are 1:1, matching the 1-beacon-per-room model.
+    
+    Returns:
+        Dictionary with rooms, beacons and calibrated means
+    """
+    from app.services.centroid import fit_centroids
+    
+    rng = random.Random(seed)
+    rooms = room_names(n_rooms)
+    beacons = beacon_ids(n_rooms)
+    means = room_means(n_rooms, rng)
+    
+    room_ids = []
+    for room, beacon_id, mean in zip(rooms, beacons, means):
+        window = calibration_window(room, beacon_id, mean, n_samples, rng)
+        db_room = crud.get_or_create_room(db, home_id, room, beacon_id)
+        crud.create_calibration_window(
+            db, home_id, db_room.id, window["window_start"], window["window_end"],
+            beacon_id, window["rssi_samples"]
+        )
+        room_ids.append(db_room.id)
+    
+    fit_centroids(db, home_id)
+    
+    # Spread each device's dwells evenly across the day
+    per_device = max(events_per_day // n_devices, 1)
+    step = 86400 // per_device
+    for device in range(n_devices):
+        for i in range(per_device):
+            start = day_start_ts + i * step
+            db.add(crud.models.LocationEvent(
+                home_id=home_id,
+                room_id=rng.choice(room_ids),
+                device_id=f"device-{device}",
+                start_ts=start,
+                end_ts=start + max(step - 5, 1),
+                confidence=0.9,
+            ))
+    db.commit()
+    
+    return {"rooms": rooms, "beacons": beacons, "means": means}
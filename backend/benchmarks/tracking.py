@@ -0,0 +1,168 @@
+"""Room tracking quality: per-scan decisions, dwell thresholds, RSSI filters and the HMM tracker.
+
+Simulates devices walking through a synthetic home (exponential dwell per
+room, one scan every --interval seconds, noisy RSSI with occasional
+outliers) and scores each decision policy by:
+
+- accuracy: fraction of scans whose estimate is the true room
+- switches_per_hour: estimated room changes (true changes are reported too)
+- latency_s: median and p90 seconds from a real room change until the
+  estimate first shows the new room
+
+Policies are the raw classifier (infer_room per scan), fixed confirmation
+thresholds (a new room is accepted after K consecutive scans agree, what
+clients did before), per-scan decisions on readings smoothed by
+services/rssi_filter.py, and services/tracker.py (on raw and on Kalman-smoothed
+readings). Runs in-process, no server:
+
+    python -m benchmarks.tracking --rooms 6 --hours 24 --out tracking.json
+"""
+from typing import Dict, List, Tuple
+import json
+import random
+import statistics
+
+import numpy as np
+
+from app.schemas.common import BeaconReading
+from app.services.classifier import infer_room
+from app.services.rssi_filter import RssiFilter
+from app.services.snapshot import ModelSnapshot
+from app.services.tracker import RoomTracker, TransitionModel
+from benchmarks import synthetic
+
+
+Scan = Tuple[float, int, List[BeaconReading]]
+
+
+def simulate(n_rooms: int, hours: float, interval: float, mean_dwell: float, noise: float,
+             outlier_rate: float, rng: random.Random) -> Tuple[List[str], List[float], List[Scan]]:
+    """A walk through the home: (beacons, means, [(ts, true room index, readings), ...])."""
+    beacons = synthetic.beacon_ids(n_rooms)
+    means = synthetic.room_means(n_rooms, rng)
+    scans = []
+    ts, room = 0.0, rng.randrange(n_rooms)
+    leave_at = rng.expovariate(1.0 / mean_dwell)
+    while ts < hours * 3600:
+        if ts >= leave_at:
+            room = rng.choice([i for i in range(n_rooms) if i != room])
+            leave_at = ts + rng.expovariate(1.0 / mean_dwell)
+        readings = []
+        for i, (beacon_id, mean) in enumerate(zip(beacons, means)):
+            # Beacons of other rooms are heard attenuated by walls, or not at all
+            expected = mean if i == room else mean - rng.uniform(6.0, 20.0)
+            if i != room and rng.random() < 0.3:
+                continue
+            rssi = rng.gauss(expected, noise)
+            if rng.random() < outlier_rate:
+                rssi += rng.choice((-1, 1)) * rng.uniform(10.0, 20.0)
+            readings.append(BeaconReading(beacon_id=beacon_id, rssi=round(rssi, 1)))
+        scans.append((ts, room, readings))
+        ts += interval
+    return beacons, means, scans
+
+
+def score(estimates: List[int], truth: List[int], times: List[float]) -> Dict:
+    """Accuracy, switch rate and latency of a sequence of room estimates."""
+    hours = (times[-1] - times[0] + (times[1] - times[0])) / 3600
+    latencies = []
+    for k in range(1, len(truth)):
+        if truth[k] == truth[k - 1]:
+            continue
+        for j in range(k, len(truth)):
+            if truth[j] != truth[k]:
+                break
+            if estimates[j] == truth[k]:
+                latencies.append(times[j] - times[k])
+                break
+    latencies.sort()
+    return {
+        "accuracy": round(sum(e == t for e, t in zip(estimates, truth)) / len(truth), 4),
+        "switches_per_hour": round(sum(a != b for a, b in zip(estimates, estimates[1:])) / hours, 2),
+        "latency_median_s": round(statistics.median(latencies), 1) if latencies else None,
+        "latency_p90_s": round(latencies[int(0.9 * (len(latencies) - 1))], 1) if latencies else None,
+        "changes_detected": f"{len(latencies)}/{sum(a != b for a, b in zip(truth, truth[1:]))}",
+    }
+
+
+def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    beacons, means, scans = simulate(
+        args.rooms, args.hours, args.interval, args.mean_dwell, args.noise, args.outliers, rng
+    )
+    centroids = dict(zip(beacons, means))
+    index = {beacon_id: i for i, beacon_id in enumerate(beacons)}
+    times = [ts for ts, _, _ in scans]
+    truth = [room for _, room, _ in scans]
+    raw = [index.get(infer_room(readings, centroids)[0], -1) for _, _, readings in scans]
+    
+    results = {"true_switches_per_hour": score(truth, truth, times)["switches_per_hour"], "policies": {}}
+    results["policies"]["raw"] = score(raw, truth, times)
+    
+    for k in args.confirmations:
+        estimates, current, candidate, streak = [], raw[0], None, 0
+        for decision in raw:
+            if decision == current:
+                candidate, streak = None, 0
+            elif decision == candidate:
+                streak += 1
+            else:
+                candidate, streak = decision, 1
+            if candidate is not None and streak >= k:
+                current, candidate, streak = candidate, None, 0
+            estimates.append(current)
+        results["policies"][f"dwell_{k}"] = score(estimates, truth, times)
+    
+    snapshot = ModelSnapshot("tracking", centroids, {b: f"Room-{i:02d}" for i, b in enumerate(beacons)})
+    smoothed = {}
+    for kind in ("ema", "kalman"):
+        rssi_filter = RssiFilter(kind, max_devices=1, idle_s=float("inf"))
+        smoothed[kind] = [rssi_filter.apply(snapshot, "device", readings, ts) for ts, _, readings in scans]
+        estimates = [index.get(infer_room(readings, centroids)[0], -1) for readings in smoothed[kind]]
+        results["policies"][kind] = score(estimates, truth, times)
+    
+    # Transitions as the tracker would learn them from this home's events: uniform
+    # jumps (the simulation picks the next room uniformly) and the true mean dwell
+    n_rooms = len(beacons)
+    jump = (np.ones((n_rooms, n_rooms)) - np.eye(n_rooms)) / max(n_rooms - 1, 1)
+    for name, stream in (("tracker", [readings for _, _, readings in scans]), ("kalman+tracker", smoothed["kalman"])):
+        tracker = RoomTracker(max_devices=1)
+        tracker._models[snapshot.home_id] = TransitionModel(
+            snapshot.home_id, snapshot.version, sorted(beacons), np.array([centroids[b] for b in sorted(beacons)]),
+            np.full(n_rooms, 1.0 / args.mean_dwell), jump
+        )
+        tracked = [
+            index[tracker.update(snapshot, "device", readings, ts)[0]] for ts, readings in zip(times, stream)
+        ]
+        results["policies"][name] = score(tracked, truth, times)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Compare room decision policies on simulated walks")
+    parser.add_argument("--rooms", type=int, default=6)
+    parser.add_argument("--hours", type=float, default=24.0, help="Simulated time")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between scans")
+    parser.add_argument("--mean-dwell", type=float, default=300.0, help="Mean seconds spent in a room")
+    parser.add_argument("--noise", type=float, default=5.0, help="RSSI standard deviation (dB)")
+    parser.add_argument("--outliers", type=float, default=0.05, help="Fraction of readings off by 10-20 dB")
+    parser.add_argument("--confirmations", type=int, nargs="+", default=[2, 3, 4],
+                        help="Consecutive agreeing scans required by the dwell-threshold policies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write results as JSON here")
+    args = parser.parse_args()
+    
+    results = run(args)
+    print(f"true room changes: {results['true_switches_per_hour']}/h")
+    print(f"{'policy':<15} {'accuracy':>9} {'switches/h':>11} {'latency p50':>12} {'p90':>6}  detected")
+    for name, row in results["policies"].items():
+        print(
+            f"{name:<15} {row['accuracy']:>9.4f} {row['switches_per_hour']:>11} "
+            f"{row['latency_median_s']!s:>12} {row['latency_p90_s']!s:>6}  {row['changes_detected']}"
+        )
+    
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)